@@ -0,0 +1,161 @@
+'''
+Records which lines of which project files each test executes (its
+'footprint'), and uses that to run only the tests affected by the changes
+made since a given git revision.
+
+Footprints are gathered using the code coverage runner, which labels the
+coverage data recorded during each test with the test's name. They are kept
+between runs, in the runner's cache, and each test's footprint is replaced
+whenever it is run again with footprints being recorded.
+
+See also tests.utils.testrunner, which uses this.
+'''
+
+from collections import defaultdict
+from os.path import relpath
+import re
+import subprocess
+import sys
+
+from . import cache
+from .all_dirs_runner import AllDirsTestRunner, _label_matches
+
+
+FOOTPRINTS_NAME = 'footprints.json'
+
+# the start and size of a hunk's old lines, and the size of its new ones
+HUNK = re.compile(r'^@@ -(\d+)(?:,(\d+))? \+\d+(?:,(\d+))? @@')
+
+
+def load_footprints():
+    '''
+    Return a dict of {test name: {relative filename: [line numbers]}}
+    '''
+    return cache.load(FOOTPRINTS_NAME, {})
+
+
+def save_footprints(data):
+    '''
+    Update the saved footprints from the given coverage data, in which the
+    lines executed by each test are labelled with the test's name.
+    '''
+    footprints = load_footprints()
+    fresh = defaultdict(dict)
+    for fname in data.measured_files():
+        name = relpath(fname)
+        if name.startswith('..'):
+            continue
+        tests = defaultdict(list)
+        for lineno, contexts in data.contexts_by_lineno(fname).items():
+            for context in contexts:
+                if context:
+                    tests[context].append(lineno)
+        for test, lines in tests.items():
+            fresh[test][name] = sorted(lines)
+
+    footprints.update(fresh)
+    cache.save(FOOTPRINTS_NAME, footprints)
+
+
+def _hunk_size(count):
+    return 1 if count is None else int(count)
+
+
+def parse_diff(diff):
+    '''
+    Return a dict of {relative filename: set(line numbers)} of the lines
+    changed by the given 'git diff -U0' output, numbered as they were before
+    the change. Where lines have been inserted, the lines on either side of
+    the insertion count as changed.
+    '''
+    changed = defaultdict(set)
+    fname = None
+    # the old and new lines of the current hunk still to come, which might
+    # look like headers themselves, eg. a removed SQL comment '-- ...'
+    old_left = new_left = 0
+    for line in diff.splitlines():
+        if old_left > 0 or new_left > 0:
+            if line.startswith('-'):
+                old_left -= 1
+            elif line.startswith('+'):
+                new_left -= 1
+            elif line.startswith(' '):
+                old_left -= 1
+                new_left -= 1
+            continue
+
+        if line.startswith('--- '):
+            fname = line[6:] if line.startswith('--- a/') else None
+            continue
+        match = HUNK.match(line)
+        if match:
+            start = int(match.group(1))
+            old_left = _hunk_size(match.group(2))
+            new_left = _hunk_size(match.group(3))
+            if fname is None:
+                continue
+            if old_left == 0:
+                changed[fname].update([start, start + 1])
+            else:
+                changed[fname].update(range(start, start + old_left))
+    return changed
+
+
+def changed_lines(revision):
+    '''
+    Return the lines which have changed since the given git revision, as
+    returned by parse_diff.
+    '''
+    try:
+        process = subprocess.Popen(
+            ['git', 'diff', '-U0', '--no-color', '--no-renames', '--relative',
+             revision, '--'],
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        )
+    except OSError as error:
+        sys.exit("can't run git diff: %s" % error)
+    diff, errors = process.communicate()
+    if process.returncode != 0:
+        sys.exit("can't find the changes since %s: %s" % (
+            revision, errors.strip(),
+        ))
+    return parse_diff(diff)
+
+
+def affected(footprint, changed):
+    '''
+    Returns True if the given footprint executes any of the changed lines
+    '''
+    return any(
+        not changed[fname].isdisjoint(lines)
+        for fname, lines in footprint.items()
+        if fname in changed
+    )
+
+
+
+class ChangedSinceTestRunner(AllDirsTestRunner):
+    '''
+    Only runs the tests whose footprints include lines changed since the
+    given git revision, plus any tests which have no recorded footprint,
+    such as new ones.
+    '''
+
+    # the git revision to compare against, set by testrunner.main
+    changed_since = None
+
+    def _test_matches(self, testname, command_line):
+        if not _label_matches(testname, command_line):
+            return False
+        footprint = self.footprints.get(testname)
+        return footprint is None or affected(footprint, self.changed)
+
+
+    def _select_labels(self, test_labels):
+        '''
+        Search every module for affected tests, rather than adding Django's
+        suite of every test.
+        '''
+        self.footprints = load_footprints()
+        self.changed = changed_lines(self.changed_since)
+        return test_labels or ['']
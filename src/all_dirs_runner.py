@@ -4,24 +4,58 @@ unittest.TestCase no matter where they are located in the project, even in
 directories which are not django apps. (the default test runner only looks in
 particular modules within each django app.)
 
+The TestCase classes and test methods found in each module are remembered in
+a discovery index, kept between runs, so modules that haven't changed since
+the last run don't need to be imported just to find out what tests they
+contain. Only modules containing tests that are actually going to be run get
+imported.
+
+A module which was already imported before it was scanned, such as in a test
+server's forked child, may be older than its file. Such a scan is used for
+that run, but isn't kept in the index, so the module is scanned again next
+time rather than trusted.
+
 See also tests.utils.testrunner, which uses this.
 '''
 
-from inspect import getmembers, isclass
+from inspect import getmembers, getmro, getsourcefile, isclass
 import os
 from os.path import join, relpath, splitext
+import re
 import sys
+import time
 from unittest import TestCase, TestLoader, TestSuite
 
 from django.test.simple import reorder_suite, DjangoTestSuiteRunner
 from django.test.testcases import TestCase as DjangoTestCase
 
+from . import cache
+
 
 
 SKIP_TEST_CLASSES = set([
     TestCase, DjangoTestCase,
 ])
 
+# labels starting with this are regular expressions
+REGEX_PREFIX = 're:'
+
+# labels containing any of these are globs
+GLOB_CHARS = re.compile(r'[*?[]')
+
+# around when this process started, and began importing project modules
+_started = time.time()
+
+# {module name: time} of modules reloaded since, eg. by '--watch'
+_reloaded = {}
+
+
+def _is_skipped_dir(directory):
+    '''
+    Returns True for directories which are never searched for modules
+    '''
+    return directory.startswith('.') or directory == 'talk'
+
 
 def _get_module_names(root):
     '''
@@ -31,7 +65,7 @@ def _get_module_names(root):
         for fname in fnames:
 
             for directory in dirs:
-                if directory.startswith('.') or directory == 'talk':
+                if _is_skipped_dir(directory):
                     dirs.remove(directory)
 
             if fname.endswith('.py'):
@@ -60,7 +94,8 @@ def _import(modname):
 
 def _get_testcases(module):
     '''
-    Yield all the TestCase subclasses defined in the given module.
+    Yield (name, class) for all the TestCase subclasses defined in the given
+    module.
     '''
     for name, value in getmembers(module):
         if (
@@ -68,20 +103,221 @@ def _get_testcases(module):
             issubclass(value, TestCase) and
             value not in SKIP_TEST_CLASSES
         ):
-            yield value
+            yield name, value
+
+
+def _glob_to_regex(label):
+    '''
+    Convert a glob label, e.g. 'orders.*.test_cancel?', into an unanchored
+    regex, since labels match anywhere within a test name.
+    '''
+    parts = []
+    index = 0
+    while index < len(label):
+        char = label[index]
+        end = label.find(']', index + 2) if char == '[' else -1
+        if char == '*':
+            parts.append('.*')
+        elif char == '?':
+            parts.append('.')
+        elif end != -1:
+            chars = label[index + 1:end]
+            if chars.startswith('!'):
+                chars = '^' + chars[1:]
+            parts.append('[%s]' % chars.replace('\\', '\\\\'))
+            index = end
+        else:
+            parts.append(re.escape(char))
+        index += 1
+    return ''.join(parts)
+
+
+def _label_to_regex(label):
+    '''
+    Convert a command-line label into a regex. Labels starting with 're:'
+    are regexes, those containing '*', '?' or '[' are globs, and anything
+    else is a plain substring.
+    '''
+    if label.startswith(REGEX_PREFIX):
+        return label[len(REGEX_PREFIX):]
+    if GLOB_CHARS.search(label):
+        return _glob_to_regex(label)
+    return re.escape(label)
+
+
+def compile_labels(test_labels):
+    '''
+    Return a single compiled pattern which finds any of the given labels
+    within a test name.
+    '''
+    try:
+        return re.compile('|'.join(
+            '(?:%s)' % _label_to_regex(label) for label in test_labels
+        ))
+    except re.error as error:
+        sys.exit('invalid test label: %s' % error)
+
+
+# the labels most recently matched against, and their compiled pattern
+_compiled_labels = (None, None)
+
+
+def _label_matches(testname, test_labels):
+    '''
+    Returns True if the named test is matched by the command-line labels
+    '''
+    global _compiled_labels
+    if not test_labels:
+        return True
+    labels, pattern = _compiled_labels
+    # the same list of labels is passed for every test, so only compile once
+    if labels is not test_labels:
+        pattern = compile_labels(test_labels)
+        _compiled_labels = (test_labels, pattern)
+    return pattern.search(testname) is not None
+
+
+def _file_stamp(fname):
+    '''
+    Return something which changes whenever the given file is modified
+    '''
+    stat = os.stat(fname)
+    return [stat.st_mtime, stat.st_size]
+
+
+def _project_source(klass):
+    '''
+    Return the relative filename of the source of the given class, or None if
+    it is not defined in a file within the project.
+    '''
+    try:
+        fname = getsourcefile(klass)
+    except TypeError:
+        return None
+    if fname is None:
+        return None
+    fname = relpath(fname)
+    if fname.startswith('..'):
+        return None
+    return fname
+
+
+def _imported_stamp(fname, modname, imported):
+    '''
+    Return the stamp of the given file, as scanned by importing its module.
+    If the module had already been imported, and the file might have been
+    modified since then, return None instead, since what was scanned may
+    not match the file.
+    '''
+    if modname in imported:
+        loaded = _reloaded.get(modname, _started)
+        if os.stat(fname).st_mtime >= loaded:
+            return None
+    return _file_stamp(fname)
+
+
+def _scan_by_import(fname, loader):
+    '''
+    Import the given module, and return a dict mapping the name of each of
+    its TestCase subclasses to a list of their test method names, and a dict
+    of the stamps of all project files the test methods come from.
+    '''
+    imported = set(sys.modules)
+    modname = _to_importable_name(fname)
+    module = _import(modname)
+    classes = {}
+    depends = {fname: _imported_stamp(fname, modname, imported)}
+    for name, test_class in _get_testcases(module):
+        classes[name] = list(loader.getTestCaseNames(test_class))
+        for klass in getmro(test_class):
+            source = _project_source(klass)
+            if source is not None:
+                depends[source] = _imported_stamp(
+                    source, klass.__module__, imported
+                )
+    return classes, depends
+
+
+
+class DiscoveryIndex(object):
+    '''
+    Remembers which TestCase subclasses and test methods each module
+    contains, so that unchanged modules don't need to be imported and scanned
+    again on the next run. An entry is discarded when the module, or any
+    project module defining one of its test classes' base classes, changes.
+    Entries with a stamp of None, from scans which might not match the
+    files, are never fresh, and aren't saved.
+    '''
+
+    def __init__(self, name):
+        self.name = name
+        self.entries = cache.load(name, {})
+
+
+    def is_fresh(self, fname):
+        entry = self.entries.get(fname)
+        if entry is None:
+            return False
+        try:
+            return all(
+                _file_stamp(depend) == stamp
+                for depend, stamp in entry['depends'].items()
+            )
+        except OSError:
+            return False
+
+
+    def get(self, fname):
+        '''
+        Return a dict of {class name: [test method names]} for the module
+        '''
+        return self.entries[fname]['classes']
+
+
+    def update(self, fname, classes, depends):
+        self.entries[fname] = dict(classes=classes, depends=depends)
+
+
+    def save(self, fnames):
+        '''
+        Persist the index, forgetting any modules not in 'fnames', i.e. those
+        which have been deleted since the last run, and any untrusted scans.
+        '''
+        fnames = set(fnames)
+        for fname, entry in list(self.entries.items()):
+            if fname not in fnames or None in entry['depends'].values():
+                del self.entries[fname]
+        cache.save(self.name, self.entries)
 
 
 
 class AllDirsTestRunner(DjangoTestSuiteRunner):
 
+    index_name = 'discovery_index.json'
+
+    def scan_module(self, fname, loader):
+        '''
+        Return the TestCase subclasses and test methods in the given module,
+        as a dict of {class name: [method names]}, and the stamps of the files
+        that result depends upon. Used to refresh stale discovery index
+        entries.
+        '''
+        return _scan_by_import(fname, loader)
+
+
     def _test_matches(self, testname, command_line):
         '''
         Returns True if the named test should be included in the suite
         '''
-        return (
-            not command_line or
-            any(arg in testname for arg in command_line)
-        )
+        return _label_matches(testname, command_line)
+
+
+    def _select_labels(self, test_labels):
+        '''
+        Returns the labels to look for tests with, given those from the
+        command-line
+        '''
+        return test_labels
 
 
     def build_suite(self, test_labels, extra_tests=None, **kwargs):
@@ -89,6 +325,7 @@ class AllDirsTestRunner(DjangoTestSuiteRunner):
         Override the base class method to return a suite consisting of all
         TestCase subclasses throughought the whole project.
         '''
+        test_labels = self._select_labels(test_labels)
         if test_labels:
             suite = TestSuite()
         else:
@@ -98,20 +335,32 @@ class AllDirsTestRunner(DjangoTestSuiteRunner):
         added_test_classes = set(t.__class__ for t in suite)
 
         loader = TestLoader()
-        for fname in _get_module_names(os.getcwd()):
-            module = _import(_to_importable_name(fname))
-            for test_class in _get_testcases(module):
+        index = DiscoveryIndex(self.index_name)
+        fnames = list(_get_module_names(os.getcwd()))
+        for fname in fnames:
+            if not index.is_fresh(fname):
+                index.update(fname, *self.scan_module(fname, loader))
+
+            modname = _to_importable_name(fname)
+            for class_name, method_names in sorted(index.get(fname).items()):
+                test_class = None
+                prefix = '%s.%s.' % (modname, class_name)
+                for method_name in method_names:
+                    name = prefix + method_name
+                    if not self._test_matches(name, test_labels):
+                        continue
+
+                    # only import the module once we know it has a test to run
+                    if test_class is None:
+                        test_class = getattr(_import(modname), class_name)
+                        if test_class in added_test_classes:
+                            break
 
-                if test_class in added_test_classes:
-                    continue
+                    suite.addTest(test_class(method_name))
 
-                for method_name in loader.getTestCaseNames(test_class):
-                    testname = '.'.join([
-                        module.__name__, test_class.__name__, method_name
-                    ])
-                    if self._test_matches(testname, test_labels):
-                        suite.addTest(loader.loadTestsFromName(testname))
-                        added_test_classes.add(test_class)
+                if test_class is not None:
+                    added_test_classes.add(test_class)
 
+        index.save(fnames)
         return reorder_suite(suite, (TestCase,))
 
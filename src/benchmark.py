@@ -0,0 +1,543 @@
+'''
+Measures the overhead the test runner itself adds to a test run.
+
+Run it from the project's root directory, with Django's settings available:
+
+    DJANGO_SETTINGS_MODULE=settings python -m tests.utils.benchmark
+
+Discovery is measured on a synthetic project, generated in a temporary
+directory. Add '--json' to print the measurements as JSON instead, and
+'--compare=<file>' to compare them with those saved by an earlier run, eg.
+from before a change. This exits with an error if anything got more than
+'--threshold=<percent>' slower (10% by default):
+
+    python -m tests.utils.benchmark --json > before.json
+    ... make changes ...
+    python -m tests.utils.benchmark --compare=before.json
+
+See also tests.utils.testrunner.
+'''
+
+from collections import OrderedDict
+import json
+import os
+from os.path import join
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from unittest import TestCase, TextTestResult
+from unittest.runner import _WritelnDecorator
+
+from .filtered_runner import FILTERS, FilteredStream
+from .listening_result import ListeningResult
+
+
+# how many times each benchmark is run. The fastest is reported.
+REPEAT = 5
+
+# the measurements made, as {name: (value, unit)}. Smaller is better for all
+# of them.
+results = OrderedDict()
+
+# the name of the package containing the test runner, e.g. 'tests.utils'
+PACKAGE = __package__ or __name__.rpartition('.')[0]
+
+# modules which only some of the test runner's options need
+OPTIONAL_MODULES = ['coverage', 'multiprocessing', 'termcolor']
+
+# run in a fresh interpreter to time importing Django's test runner, which
+# is always needed, and then the test runner named on the command line, and
+# composing its classes for the options given. Then lists which of the test
+# runner's own modules, and the optional modules, ended up being imported.
+IMPORT_TIMER = '''
+import sys, time
+package, optional = sys.argv[1], sys.argv[2:]
+for name in ['django.test.simple', package + '.testrunner']:
+    start = time.time()
+    __import__(name)
+    print '%f %s' % (time.time() - start, name)
+start = time.time()
+sys.modules[package + '.testrunner'].main()
+print '%f %s' % (time.time() - start, package + '.testrunner.main()')
+for name in sorted(sys.modules):
+    if sys.modules[name] and (
+        name.startswith(package + '.') or name in optional
+    ):
+        print 'imported', name
+'''
+
+# run in a fresh interpreter to find the peak memory use of running a suite
+# of the given number of tests, each of which keeps some data on itself,
+# using either a plain TestSuite or the test runner's ReleasingTestSuite
+PEAK_MEMORY = '''
+import resource, sys, unittest
+package, suite_class, size = sys.argv[1], sys.argv[2], int(sys.argv[3])
+__import__(package + '.releasing_suite')
+releasing_suite = sys.modules[package + '.releasing_suite']
+
+class MemoryTest(unittest.TestCase):
+    def setUp(self):
+        self.data = 'x' * 100000
+
+for number in range(size):
+    setattr(MemoryTest, 'test_%d' % number, lambda self: None)
+
+suite = unittest.TestLoader().loadTestsFromTestCase(MemoryTest)
+if suite_class == 'ReleasingTestSuite':
+    suite = releasing_suite.ReleasingTestSuite(suite)
+suite.run(unittest.TestResult())
+print resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+'''
+
+
+def record(name, value, unit='s'):
+    results[name] = (value, unit)
+
+
+def best_of(func, repeat=REPEAT):
+    '''
+    Return the fewest wall clock seconds that 'repeat' calls of func took
+    '''
+    timings = []
+    for _ in range(repeat):
+        start = time.time()
+        func()
+        timings.append(time.time() - start)
+    return min(timings)
+
+
+def syncdb_output(models):
+    '''
+    Return a list of the fragments written to stdout while syncdb creates
+    the tables for the given number of models, as 'print' would write them.
+    '''
+    fragments = []
+    for number in range(models):
+        model = 'catalog.Model%d' % number
+        for line in [
+            'Processing %s model' % model,
+            'Creating table catalog_model%d' % number,
+            'Installing index for %s model' % model,
+            'No custom SQL for %s model' % model,
+            "Adding permission 'catalog | model%d | Can add'" % number,
+            'Unfiltered message about %s' % model,
+        ]:
+            fragments.extend([line, '\n'])
+    return fragments
+
+
+
+class UnbufferedFilteredStream(object):
+    '''
+    FilteredStream as it was originally written, trying each filter in turn,
+    for comparison.
+    '''
+
+    def __init__(self, wrapped, quiet):
+        self.wrapped = wrapped
+        self.filter_next_cr = False
+        self.quiet = quiet
+
+
+    def write(self, text):
+        if text == '\n':
+            if not self.filter_next_cr:
+                self.wrapped.write('\n')
+            self.filter_next_cr = False
+            return
+
+        filtr = any(
+            test.match(text) and level <= self.quiet
+            for test, level in FILTERS.items()
+        )
+        if not filtr:
+            self.wrapped.write(text)
+            self.wrapped.flush()
+        self.filter_next_cr = filtr and text[-1] != '\n'
+
+
+    def flush(self):
+        self.wrapped.flush()
+
+
+
+def bench_filtered_stream(models=500, quiet=3):
+    '''
+    Return the seconds taken to filter the syncdb output for the given
+    number of models, by the original and the current FilteredStream.
+    '''
+    fragments = syncdb_output(models)
+    devnull = open(os.devnull, 'w')
+
+    def write_all(stream):
+        for fragment in fragments:
+            stream.write(fragment)
+        stream.flush()
+
+    orig_quiet = FilteredStream.quiet
+    FilteredStream.quiet = quiet
+    try:
+        before = best_of(
+            lambda: write_all(UnbufferedFilteredStream(devnull, quiet))
+        )
+        after = best_of(lambda: write_all(FilteredStream(devnull)))
+    finally:
+        FilteredStream.quiet = orig_quiet
+        devnull.close()
+    return before, after
+
+
+def import_times(options):
+    '''
+    Import the test runner with the given TEST_RUNNER_OPTIONS in a fresh
+    interpreter. Return a list of (seconds, name) for importing Django's test
+    runner and then ours, and composing ours, and a list of the names of the
+    modules that imported.
+    '''
+    env = dict(os.environ, TEST_RUNNER_OPTIONS=options)
+    output = subprocess.Popen(
+        [sys.executable, '-c', IMPORT_TIMER, PACKAGE] + OPTIONAL_MODULES,
+        stdout=subprocess.PIPE, env=env,
+    ).communicate()[0]
+    times = []
+    imported = []
+    for line in output.splitlines():
+        first, _, name = line.partition(' ')
+        if first == 'imported':
+            imported.append(name)
+        else:
+            times.append((float(first), name))
+    return times, imported
+
+
+def report_import_times(options):
+    '''
+    Print how long importing the test runner takes with the given options
+    '''
+    times, imported = import_times(options)
+    print 'Startup with TEST_RUNNER_OPTIONS=%r:' % (options,)
+    for seconds, name in times:
+        print '    %.4fs %s' % (seconds, name)
+        record('import %s %s' % (name, options or '(no options)'), seconds)
+    print '    imported: %s' % (', '.join(imported),)
+
+
+def peak_memory(suite_class, size):
+    '''
+    Return the peak RSS, in kilobytes, of a fresh interpreter running 'size'
+    tests in a suite of the given class, 'TestSuite' or 'ReleasingTestSuite'
+    '''
+    output = subprocess.Popen(
+        [sys.executable, '-c', PEAK_MEMORY, PACKAGE, suite_class, str(size)],
+        stdout=subprocess.PIPE,
+    ).communicate()[0]
+    return int(output)
+
+
+def report_peak_memory(sizes):
+    '''
+    Print the peak memory use of running suites of each of the given sizes
+    '''
+    print 'Peak memory running tests which keep 100KB each:'
+    for suite_class in ['TestSuite', 'ReleasingTestSuite']:
+        peaks = [peak_memory(suite_class, size) for size in sizes]
+        print '    %s: %s' % (suite_class, ', '.join(
+            '%d tests %.1fMB' % (size, peak / 1024.0)
+            for size, peak in zip(sizes, peaks)
+        ))
+        for size, peak in zip(sizes, peaks):
+            record('peak memory %s %d tests' % (suite_class, size), peak, 'KB')
+
+
+def make_project(root, packages, classes, methods):
+    '''
+    Write a synthetic project into the given directory, with the given
+    number of packages, each with a models module and a tests module, with
+    'classes' TestCase classes of 'methods' test methods each. Every fifth
+    test is skipped, the rest do nothing. Returns the number of tests.
+    '''
+    for package in range(packages):
+        package_dir = join(root, 'benchpkg%d' % package)
+        os.makedirs(join(package_dir, 'tests'))
+        for fname in ['__init__.py', 'tests/__init__.py']:
+            open(join(package_dir, fname), 'w').close()
+        with open(join(package_dir, 'models.py'), 'w') as stream:
+            stream.write('VALUE = %d\n' % (package,))
+        with open(join(package_dir, 'tests', 'test_bench.py'), 'w') as stream:
+            stream.write('from unittest import TestCase, skip\n')
+            for number in range(classes):
+                stream.write('\n\nclass Bench%dTest(TestCase):\n' % number)
+                for method in range(methods):
+                    if method % 5 == 4:
+                        stream.write("\n    @skip('benchmark')")
+                    stream.write(
+                        '\n    def test_method_%d(self):\n        pass\n'
+                        % (method,)
+                    )
+    return packages * classes * methods
+
+
+def bench_discovery(packages=20, classes=10, methods=10):
+    '''
+    Time AllDirsTestRunner.build_suite on a synthetic project: finding all
+    the tests the first time, when every module is scanned, and again once
+    they are in the discovery index, and selecting some of them by labels.
+    '''
+    from .all_dirs_runner import AllDirsTestRunner
+
+    root = tempfile.mkdtemp(prefix='testrunner_benchmark')
+    cwd = os.getcwd()
+    try:
+        tests = make_project(root, packages, classes, methods)
+        os.chdir(root)
+        sys.path.insert(0, root)
+        runner = AllDirsTestRunner(verbosity=0)
+
+        start = time.time()
+        runner.build_suite(['benchpkg'])
+        first = time.time() - start
+        print 'Discovery of %d tests: first %.4fs' % (tests, first)
+        record('discovery first', first)
+
+        for name, labels in [
+            ('all', ['benchpkg']),
+            ('substring', ['benchpkg1.tests', 'Bench3Test']),
+            ('glob', ['benchpkg1*.Bench?Test.test_method_[0-4]']),
+            ('regex', ['re:Bench[0-4]Test\\.test_method_[13]$']),
+        ]:
+            seconds = best_of(lambda: runner.build_suite(labels))
+            print '    indexed, %s labels %.4fs (%d tests)' % (
+                name, seconds, runner.build_suite(labels).countTestCases(),
+            )
+            record('discovery %s labels' % (name,), seconds)
+    finally:
+        os.chdir(cwd)
+        sys.path.remove(root)
+        shutil.rmtree(root)
+
+
+
+class _TerminalSink(object):
+    '''
+    Discards everything written to it, while claiming to be a terminal, so
+    that colors are used
+    '''
+
+    def write(self, text):
+        pass
+
+    def flush(self):
+        pass
+
+    def isatty(self):
+        return True
+
+
+
+def bench_colored_stream(writes=20000):
+    '''
+    Return the seconds taken to write the given number of test results
+    through a ColoredStream, on top of the ConsoleStream which batches up
+    the output
+    '''
+    from .colored_runner import ColoredStream, ConsoleStream
+
+    def write_all():
+        console = ConsoleStream(_TerminalSink())
+        stream = ColoredStream(console, 'red')
+        for number in xrange(writes):
+            if number % 10:
+                stream.write('F')
+            else:
+                stream.writeln('FAIL')
+        console.flush_all()
+
+    return best_of(write_all)
+
+
+
+def result_features():
+    '''
+    Return (name, result mixin, listener classes) for each of the features
+    which can be composed into the test result, and which are importable
+    '''
+    features = [('baseline', None, [])]
+    for name, module, mixin, listeners in [
+        ('color', 'colored_runner', 'ColoredTextTestResult', []),
+        ('readable', 'human_readable_result', 'HumanReadableTextTestResult',
+            []),
+        ('show-skip', 'show_skipped_result', 'ShowSkippedResult', []),
+        ('parallel', 'parallel_runner', 'ParallelTestResult', []),
+        ('compact', 'compact_result', 'CompactTextTestResult',
+            ['CompactResultListener']),
+        ('last-failed', 'last_failed', None, ['FailureRecordingListener']),
+        ('durations', 'durations_result', None, ['DurationsListener']),
+        ('schedule', 'scheduling', None, ['DurationHistoryListener']),
+        ('jsonl', 'streaming_report', None, ['StreamingReportListener']),
+        ('memory', 'memory_result', None, ['MemoryListener']),
+        ('profile', 'profiling', None, ['ProfilingListener']),
+    ]:
+        try:
+            __import__(PACKAGE + '.' + module)
+        except ImportError:
+            print 'Skipping %s, which needs a missing module' % (name,)
+            continue
+        module = sys.modules[PACKAGE + '.' + module]
+        features.append((
+            name,
+            getattr(module, mixin) if mixin else None,
+            [getattr(module, listener) for listener in listeners],
+        ))
+    return features
+
+
+def bench_dispatch(mixin, listeners, tests=200):
+    '''
+    Return the seconds the test result, with the given mixin and listeners,
+    takes to record the outcome of one test, with every fifth test skipped
+    '''
+    from .testrunner import update_class
+
+    klass = type('BenchResult', (TextTestResult, ListeningResult), dict(
+        listener_classes=listeners,
+    ))
+    if mixin is not None:
+        update_class(klass, mixin)
+    # defined here, since a TestCase at module level would be found, and
+    # run, as one of the project's tests
+    class DispatchTest(TestCase):
+        def test_nothing(self):
+            pass
+
+    stream = _WritelnDecorator(open(os.devnull, 'w'))
+    test = DispatchTest('test_nothing')
+
+    def run():
+        result = klass(stream, True, 1)
+        result.startTestRun()
+        for number in xrange(tests):
+            result.startTest(test)
+            if number % 5 == 4:
+                result.addSkip(test, 'benchmark')
+            else:
+                result.addSuccess(test)
+            result.stopTest(test)
+
+    try:
+        return best_of(run) / tests
+    finally:
+        stream.close()
+
+
+def report_dispatch():
+    '''
+    Print the time each test result feature adds to recording each test
+    '''
+    from .profiling import ProfilingListener
+    from .streaming_report import StreamingReportListener
+
+    directory = tempfile.mkdtemp(prefix='testrunner_benchmark')
+    StreamingReportListener.jsonl = join(directory, 'report.jsonl')
+    ProfilingListener.directory = directory
+    try:
+        print 'Recording each test result, and the extra for each feature:'
+        baseline = None
+        for name, mixin, listeners in result_features():
+            seconds = bench_dispatch(mixin, listeners)
+            if baseline is None:
+                baseline = seconds
+            print '    %s: %.1fus (%+.1fus)' % (
+                name, seconds * 1e6, (seconds - baseline) * 1e6,
+            )
+            record('dispatch %s' % (name,), seconds)
+    finally:
+        StreamingReportListener.jsonl = None
+        ProfilingListener.directory = None
+        shutil.rmtree(directory)
+
+
+def report(name, before, after, items, unit):
+    print '%s: %.4fs -> %.4fs (%.1fx), %d -> %d %s/s' % (
+        name, before, after, before / after,
+        items / before, items / after, unit,
+    )
+
+
+def compare(old, new, threshold):
+    '''
+    Print how each measurement has changed between the given results.
+    Returns the names of those which got more than 'threshold' worse.
+    '''
+    worse = []
+    for name, (value, unit) in new.items():
+        if name not in old or not old[name][0]:
+            continue
+        ratio = float(value) / old[name][0]
+        flag = ''
+        if ratio > 1 + threshold:
+            worse.append(name)
+            flag = '  WORSE'
+        print '%-60s %10.4g -> %10.4g %-2s %5.2fx%s' % (
+            name, old[name][0], value, unit, ratio, flag,
+        )
+    return worse
+
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+    as_json = '--json' in argv
+    compare_with = None
+    threshold = 0.1
+    for word in argv:
+        if word.startswith('--compare='):
+            compare_with = word.partition('=')[2]
+        elif word.startswith('--threshold='):
+            threshold = float(word.partition('=')[2]) / 100
+        elif word != '--json':
+            sys.exit('unknown argument: %s' % (word,))
+
+    # the measurements alone go to stdout, as JSON, if asked for
+    stdout = sys.stdout
+    if as_json:
+        sys.stdout = sys.stderr
+    try:
+        models = 500
+        before, after = bench_filtered_stream(models)
+        report(
+            'FilteredStream', before, after, len(syncdb_output(models)),
+            'writes',
+        )
+        record('FilteredStream original', before)
+        record('FilteredStream', after)
+
+        writes = 20000
+        seconds = bench_colored_stream(writes)
+        print 'ColoredStream: %.4fs, %d writes/s' % (
+            seconds, writes / seconds,
+        )
+        record('ColoredStream', seconds)
+
+        bench_discovery()
+        report_dispatch()
+        for options in ['', '--color --coverage --parallel=2 --durations=10']:
+            report_import_times(options)
+        report_peak_memory([100, 1000, 5000])
+    finally:
+        sys.stdout = stdout
+
+    if as_json:
+        json.dump(results, sys.stdout, indent=2)
+        print
+    if compare_with:
+        with open(compare_with) as stream:
+            old = json.load(stream)
+        worse = compare(old, results, threshold)
+        if worse:
+            sys.exit('%d measurements got worse' % (len(worse),))
+
+
+if __name__ == '__main__':
+    main()
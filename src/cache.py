@@ -0,0 +1,50 @@
+'''
+Helpers to persist small amounts of data between test runs, such as the
+discovery index used by all_dirs_runner. Everything is stored as JSON in
+files under CACHE_DIR, in the directory the tests are run from.
+
+See also tests.utils.testrunner, which uses this.
+'''
+
+import json
+import os
+from os.path import dirname, isdir, join
+from tempfile import mkstemp
+
+
+CACHE_DIR = '.testrunner_cache'
+
+
+def cache_path(name):
+    '''
+    Return the absolute filename used to store the named cache entry
+    '''
+    return join(os.getcwd(), CACHE_DIR, name)
+
+
+def load(name, default=None):
+    '''
+    Return the data previously stored under the given name, or 'default' if
+    there isn't any, or it can't be read.
+    '''
+    try:
+        with open(cache_path(name)) as stream:
+            return json.load(stream)
+    except (IOError, ValueError):
+        return default
+
+
+def save(name, data):
+    '''
+    Store the given data under the given name. The file is written to a
+    temporary name first and then renamed, so an interrupted test run can't
+    leave a half-written cache behind.
+    '''
+    path = cache_path(name)
+    directory = dirname(path)
+    if not isdir(directory):
+        os.makedirs(directory)
+    handle, temp_path = mkstemp(dir=directory)
+    with os.fdopen(handle, 'w') as stream:
+        json.dump(data, stream)
+    os.rename(temp_path, path)
@@ -1,26 +1,211 @@
 """ A test runner/result which alters Djangos test runner by making it
 record code coverage information
 
+The coverage data recorded during each test is labelled with the test's name,
+(a coverage 'dynamic context') so "coverage html --show-contexts" can show
+which tests ran each line. Optionally, this is also used to record each test's
+footprint. See affected_tests.
+
+Only the project's packages and modules (or those given by --coverage-source)
+are measured, listed explicitly as coverage's 'source', rather than measuring
+everything and omitting files by pattern. The test runner's own package is left
+out, since it lives inside the project, and otherwise every test's footprint
+would include it. So are tests and migrations, unless recording footprints. A
+warning is printed if coverage's C tracer, which is several times faster than
+its Python one, isn't installed.
+
+In parallel runs, each worker process writes its own data file, with a unique
+suffix. These are merged at the end, in pairs, in parallel, and then handed
+to coverage to produce the usual single '.coverage' file. Only a couple of
+data files are ever held in memory by each process doing the merging.
+
 See also test.utils.testrunner which uses this
 
 """
 
-from coverage import coverage
+from glob import glob
+import multiprocessing
+import os
+from os.path import abspath, dirname, isdir, join
+import sys
+
+from coverage import coverage, CoverageData
 from django.test.simple import DjangoTestSuiteRunner
 
-filepath_regexes_to_exclude = [
-    r"[A-z_\.]*test[A-z_\.]*", # tests
-    r"[0-9]{4}[A-z_\.]*", # south migrations
-    ]
+from .affected_tests import save_footprints
+from .all_dirs_runner import _is_skipped_dir, _to_importable_name
+from .listening_result import ResultListener
+
+# directories and modules left out of the measured source, unless recording
+# footprints
+TEST_DIRS = ['tests', 'migrations']
+
+# the directory of the test runner's own package
+RUNNER_DIR = dirname(abspath(__file__))
+
+def _is_test_module(fname):
+    return fname == 'tests.py' or fname.startswith('test_')
+
+def _sources(directory, include_tests):
+    """Return (whole, sources) for the given directory within the project.
+    'whole' is True if everything in it is measured, so the directory itself
+    can be the source. Otherwise 'sources' lists the subdirectories and the
+    names of the modules within it which are measured."""
+    if abspath(directory) == RUNNER_DIR:
+        return False, []
+    whole = True
+    sources = []
+    for name in sorted(os.listdir(directory)):
+        path = join(directory, name) if directory != '.' else name
+        if isdir(path):
+            if _is_skipped_dir(name):
+                continue
+            if not include_tests and name in TEST_DIRS:
+                whole = False
+                continue
+            sub_whole, sub_sources = _sources(path, include_tests)
+            if sub_whole:
+                sources.append(path)
+            else:
+                whole = False
+                sources.extend(sub_sources)
+        elif name.endswith('.py'):
+            if not include_tests and _is_test_module(name):
+                whole = False
+            # a package's name would take in all of its modules
+            elif name != '__init__.py':
+                sources.append(_to_importable_name(path))
+    return whole, sources
+
+def project_sources(include_tests=False):
+    """Return the directories and module names to give coverage as the
+    'source' for the project in the current directory. This leaves out the
+    test runner's own package, and unless 'include_tests' is set, tests and
+    migrations."""
+    whole, sources = _sources('.', include_tests)
+    return [os.getcwd()] if whole else sources
+
+def make_coverage(**args):
+    """Return a coverage object, which doesn't warn about any of the modules
+    named in its source which are never imported, since project_sources
+    names many modules individually"""
+    cov = coverage(**args)
+    cov.set_option('run:disable_warnings', ['module-not-imported'])
+    return cov
+
+def _check_c_tracer():
+    """Warn if coverage's C tracer isn't installed, since measuring coverage
+    is several times slower without it"""
+    try:
+        from coverage.tracer import CTracer
+    except ImportError:
+        sys.stderr.write(
+            'warning: coverage C extension not installed, '
+            'measuring coverage will be slow\n'
+        )
+
+def _merge_pair(paths):
+    """Merge the second of the given coverage data files into the first"""
+    target, source = paths
+    data = CoverageData(target)
+    data.read()
+    other = CoverageData(source)
+    other.read()
+    data.update(other)
+    os.remove(source)
+
+def combine_data_files(args, processes):
+    """Merge all the data files written by parallel workers into a single
+    '.coverage' file, and return a coverage object with the merged data.
+    Pairs of files are merged in parallel, halving the number of files
+    each round, before coverage itself combines what's left."""
+    paths = sorted(glob(coverage(**args).config.data_file + '.*'))
+    pool = multiprocessing.Pool(processes)
+    try:
+        while len(paths) > 2:
+            pairs = list(zip(paths[0::2], paths[1::2]))
+            pool.map(_merge_pair, pairs)
+            paths = [target for target, _ in pairs] + paths[len(pairs) * 2:]
+    finally:
+        pool.close()
+        pool.join()
+
+    cov = make_coverage(**args)
+    cov.erase()
+    cov.combine(data_paths=paths)
+    cov.save()
+    return cov
+
+class CoverageContextListener(ResultListener):
+    """Labels the coverage data recorded during each test with its name"""
+
+    # parallel workers measure coverage of the tests they run themselves
+    in_worker = True
+
+    # the coverage being measured, and the arguments used to create it, set
+    # by the test runner
+    coverage = None
+    coverage_args = {}
+
+    def startWorker(self, number):
+        """Replace the coverage inherited from the parent process with one
+        which writes to its own data file"""
+        if self.coverage is not None:
+            self.coverage.stop()
+            self.coverage = make_coverage(
+                data_suffix=True, **self.coverage_args
+            )
+            self.coverage.start()
+
+    def stopWorker(self):
+        if self.coverage is not None:
+            self.coverage.stop()
+            self.coverage.save()
+
+    def startTest(self, test):
+        if self.coverage is not None:
+            self.coverage.switch_context(test.id())
+
+    def stopTest(self, test):
+        if self.coverage is not None:
+            self.coverage.switch_context('')
+
 
 class CodeCoverageMeasuringTestRunner(DjangoTestSuiteRunner):
+
+    # set by testrunner.main
+    coverage_source = None
+    record_footprints = False
+
     def run_tests(self, *args, **kwargs):
         """Runs the test suite, but write code coverage information to
         '.coverage' for reuse with the python coverage package."""
-        cov = coverage(omit=filepath_regexes_to_exclude)
+        _check_c_tracer()
+        # footprints need the tests themselves measured too
+        cov_args = dict(
+            source=self.coverage_source or project_sources(
+                include_tests=self.record_footprints
+            ),
+        )
+        processes = getattr(self, 'parallel', 1)
+        # in parallel runs, every process writes its own data file
+        suffix = True if processes > 1 else None
+        cov = make_coverage(data_suffix=suffix, **cov_args)
+        CoverageContextListener.coverage = cov
+        CoverageContextListener.coverage_args = cov_args
         cov.erase()
+        # don't merge any data files left behind by an interrupted run
+        for path in glob(cov.config.data_file + '.*'):
+            os.remove(path)
         cov.start()
-        result = DjangoTestSuiteRunner.run_tests(self, *args, **kwargs)
-        cov.stop()
+        try:
+            result = DjangoTestSuiteRunner.run_tests(self, *args, **kwargs)
+        finally:
+            cov.stop()
+            CoverageContextListener.coverage = None
         cov.save()
+        if processes > 1:
+            cov = combine_data_files(cov_args, processes)
+        if self.record_footprints:
+            save_footprints(cov.get_data())
         return result
@@ -6,13 +6,104 @@ See also tests.utils.testrunner, which uses this.
 '''
 
 from functools import wraps
+import os
 import time
 import signal
 from unittest import TextTestResult
 from unittest.signals import registerResult
 
 from django.test.simple import DjangoTestRunner
-from termcolor import colored
+from termcolor import ATTRIBUTES, COLORS, RESET
+
+
+def _escape(color, attrs=()):
+    '''
+    Return the ANSI escape sequence which starts text in the given color
+    and attributes (names as defined by termcolor)
+    '''
+    codes = [COLORS[color]] + [ATTRIBUTES[attr] for attr in attrs]
+    return ''.join('\033[%dm' % code for code in codes)
+
+
+# escape sequences for each color, plain and bold, computed just once
+ESCAPES = dict(
+    ((color, attrs), _escape(color, attrs))
+    for color in COLORS
+    for attrs in [(), ('bold',)]
+)
+
+
+# set by test_server when the output it sends back to its client will end up
+# on a terminal, even though it's written to a socket
+remote_tty = False
+
+
+def supports_color(stream):
+    '''
+    Returns True if the stream is a terminal, and colors haven't been turned
+    off using termcolor's ANSI_COLORS_DISABLED environment variable. Output
+    redirected to a file, such as a Jenkins log, is left uncolored.
+    '''
+    isatty = getattr(stream, 'isatty', None)
+    return (
+        (remote_tty or isatty is not None and isatty()) and
+        os.getenv('ANSI_COLORS_DISABLED') is None
+    )
+
+
+class ConsoleStream(object):
+    '''
+    Wraps the test runner's output stream. When 'batch' is set, as it is
+    when only a dot is printed for each test, the text written to it is
+    batched up, and calls to 'flush' only write the batch out if the last
+    write-out was more than 'flush_interval' seconds ago, rather than once for
+    every test. Otherwise each 'flush' writes everything out, so the name of
+    the test which is running is shown as soon as it starts.
+    '''
+
+    flush_interval = 0.1
+
+    def __init__(self, wrapped, batch=True):
+        self.wrapped = wrapped
+        self.batch = batch
+        self.color = supports_color(wrapped)
+        self.pending = []
+        self.last_flush = time.time()
+
+    def __getattr__(self, name):
+        return getattr(self.wrapped, name)
+
+    def paint(self, text, color, attrs=()):
+        '''
+        Return the text in the given color, if the stream supports it
+        '''
+        if not self.color:
+            return text
+        return ESCAPES[color, tuple(attrs)] + text + RESET
+
+    def write(self, text):
+        self.pending.append(text)
+
+    def writeln(self, text=None):
+        if text:
+            self.pending.append(text)
+        self.pending.append('\n')
+
+    def flush(self):
+        if (not self.batch or
+                time.time() - self.last_flush > self.flush_interval):
+            self.flush_all()
+
+    def flush_all(self):
+        '''
+        Write out everything batched up so far, however recently the last
+        batch was written.
+        '''
+        if self.pending:
+            self.wrapped.write(''.join(self.pending))
+            self.pending = []
+        self.wrapped.flush()
+        self.last_flush = time.time()
 
 
 class ColoredStream(object):
@@ -26,13 +117,16 @@ class ColoredStream(object):
         as defined by termcolor, e.g. 'red')
         '''
         self.wrapped = wrapped
-        self.color = color
+        if supports_color(wrapped):
+            self.start, self.end = ESCAPES[color, ()], RESET
+        else:
+            self.start = self.end = ''
 
     def write(self, text):
-        self.wrapped.write(colored(text, self.color))
+        self.wrapped.write(self.start + text + self.end)
 
     def writeln(self, text):
-        self.wrapped.writeln(colored(text, self.color))
+        self.wrapped.writeln(self.start + text + self.end)
 
     def flush(self):
         self.wrapped.flush()
@@ -41,7 +135,7 @@ class ColoredStream(object):
 def color(clr):
     '''
     Returns a decorator which patches out self.stream with a wrapper which
-    colors the text written to it.
+    colors the text written to it. The wrappers are kept for reuse.
     '''
 
     def decorator(func):
@@ -49,7 +143,11 @@ def color(clr):
         @wraps(func)
         def inner(self, *args):
             orig = self.stream
-            self.stream = ColoredStream(self.stream, clr)
+            streams = self.__dict__.setdefault('colored_streams', {})
+            stream = streams.get(clr)
+            if stream is None or stream.wrapped is not orig:
+                stream = streams[clr] = ColoredStream(orig, clr)
+            self.stream = stream
             try:
                 retval = func(self, *args)
             finally:
@@ -100,12 +198,17 @@ class ColoredTextTestRunner(DjangoTestRunner):
         Runs the test suite after registering a custom signal handler
         that triggers a graceful exit when Ctrl-C is pressed.
         '''
+        if not isinstance(self.stream, ConsoleStream):
+            self.stream = ConsoleStream(
+                self.stream, batch=self.verbosity == 1,
+            )
         self._default_keyboard_interrupt_handler = signal.signal(signal.SIGINT,
             self._keyboard_interrupt_handler)
         try:
             result = self.run_inner(*args, **kwargs)
         finally:
             signal.signal(signal.SIGINT, self._default_keyboard_interrupt_handler)
+            self.stream.flush_all()
         return result
 
 
@@ -125,6 +228,7 @@ class ColoredTextTestRunner(DjangoTestRunner):
             stopTestRun = getattr(result, 'stopTestRun', None)
             if stopTestRun is not None:
                 stopTestRun()
+            self.stream.flush_all()
         stopTime = time.time()
         timeTaken = stopTime - startTime
         result.printErrors()
@@ -147,25 +251,25 @@ class ColoredTextTestRunner(DjangoTestRunner):
 
         infos = []
         if result.wasSuccessful():
-            self.stream.write(colored("OK", 'green', attrs=['bold']))
+            self.stream.write(self.stream.paint("OK", 'green', ['bold']))
         else:
-            self.stream.write(colored("FAILED", 'red', attrs=['bold']))
+            self.stream.write(self.stream.paint("FAILED", 'red', ['bold']))
             failed, errored = map(len, (result.failures, result.errors))
             if failed:
-                infos.append(colored("failures=%d" % failed, 'red'))
+                infos.append(self.stream.paint("failures=%d" % failed, 'red'))
             if errored:
-                infos.append(colored("errors=%d" % errored, 'magenta'))
+                infos.append(self.stream.paint("errors=%d" % errored, 'magenta'))
 
         if skipped:
-            infos.append(colored(
+            infos.append(self.stream.paint(
                 "skipped=%d" % skipped,
                 'yellow'))
         if expectedFails:
-            infos.append(colored(
+            infos.append(self.stream.paint(
                 "expected failures=%d" % expectedFails,
                 'cyan'))
         if unexpectedSuccesses:
-            infos.append(colored(
+            infos.append(self.stream.paint(
                 "unexpected successes=%d" % unexpectedSuccesses,
                 'cyan'))
 
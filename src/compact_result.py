@@ -0,0 +1,204 @@
+'''
+Keeps the errors, failures and skips of a test run as compact records, rather
+than holding on to every failing TestCase object, and every traceback, until
+the end of the run. When a bad change breaks thousands of tests, this keeps
+the runner's memory use in check.
+
+Each record holds just the test's id, its description as it will be printed,
+how long it took, and its traceback or skip reason. Skip reasons are interned,
+since many tests usually share each one. Tracebacks are kept in memory until
+they add up to 'memory_limit' bytes, after which they are written to a
+temporary file, and read back one at a time as the errors are printed.
+
+See also tests.utils.testrunner, which uses this.
+'''
+
+from tempfile import TemporaryFile
+from unittest import TextTestResult
+
+from .durations_result import wall_clock
+from .listening_result import ResultListener
+
+
+# the TestResult attributes which list tests with their traceback or reason,
+# and those which list just the tests
+TEXT_LISTS = ['errors', 'failures', 'skipped', 'expectedFailures']
+TEST_LISTS = ['unexpectedSuccesses']
+
+
+class CompactTest(object):
+    '''
+    Stands in for a finished test in the result's lists
+    '''
+
+    __slots__ = ['test_id', 'name', 'description', 'duration']
+
+    def __init__(self, test_id, name, description, duration):
+        self.test_id = test_id
+        self.name = name
+        self.description = description
+        self.duration = duration
+
+    def id(self):
+        return self.test_id
+
+    def __str__(self):
+        return self.name
+
+    def shortDescription(self):
+        return None
+
+
+
+class TracebackStore(object):
+    '''
+    Holds text in memory up to a limit, and in a temporary file after that
+    '''
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.size = 0
+        self.spill = None
+        self.interned = {}
+
+
+    def intern(self, text):
+        return self.interned.setdefault(text, text)
+
+
+    def add(self, text):
+        '''
+        Store the given text, returning the key to get it back with
+        '''
+        if self.size + len(text) <= self.limit:
+            self.size += len(text)
+            return text
+        if self.spill is None:
+            self.spill = TemporaryFile(prefix='testrunner')
+        self.spill.seek(0, 2)
+        offset = self.spill.tell()
+        is_unicode = isinstance(text, unicode)
+        data = text.encode('utf-8') if is_unicode else text
+        self.spill.write(data)
+        return (offset, len(data), is_unicode)
+
+
+    def get(self, key):
+        if not isinstance(key, tuple):
+            return key
+        offset, length, is_unicode = key
+        self.spill.seek(offset)
+        data = self.spill.read(length)
+        return data.decode('utf-8') if is_unicode else data
+
+
+
+class CompactList(object):
+    '''
+    Replaces one of a TestResult's lists of tests, such as 'failures',
+    storing compact records of what is appended to it.
+    '''
+
+    def __init__(self, listener, has_text, is_reason=False):
+        self.listener = listener
+        self.has_text = has_text
+        self.is_reason = is_reason
+        self.records = []
+
+
+    def append(self, item):
+        store = self.listener.store
+        if not self.has_text:
+            self.records.append(self.listener.compact(item))
+            return
+        test, text = item
+        if self.is_reason:
+            key = store.intern(text)
+        else:
+            key = store.add(text)
+        self.records.append((self.listener.compact(test), key))
+
+
+    def __len__(self):
+        return len(self.records)
+
+
+    def __iter__(self):
+        '''
+        Yield the items appended, with tests replaced by CompactTests,
+        reading back any text which has been written out to disk.
+        '''
+        store = self.listener.store
+        for record in self.records:
+            if self.has_text:
+                test, key = record
+                yield test, store.get(key)
+            else:
+                yield record
+
+
+
+class CompactResultListener(ResultListener):
+
+    # how many bytes of tracebacks to keep in memory
+    memory_limit = 1024 * 1024
+
+    def __init__(self, result):
+        ResultListener.__init__(self, result)
+        self.store = None
+        self.started = None
+
+
+    def startTestRun(self):
+        self.store = TracebackStore(self.memory_limit)
+        for name in TEXT_LISTS:
+            setattr(self.result, name, CompactList(
+                self, has_text=True, is_reason=(name == 'skipped'),
+            ))
+        for name in TEST_LISTS:
+            setattr(self.result, name, CompactList(self, has_text=False))
+
+
+    def startTest(self, test):
+        self.started = wall_clock()
+
+
+    def stopTest(self, test):
+        self.started = None
+
+
+    def compact(self, test):
+        '''
+        Return a CompactTest standing in for the given test, which is either
+        running now, or is a stand-in for an error outside any test.
+        '''
+        # tests run in another process are timed there instead
+        timing = getattr(self.result, 'worker_timing', None)
+        if timing is not None:
+            duration = timing[0]
+        elif self.started is not None:
+            duration = wall_clock() - self.started
+        else:
+            duration = 0.0
+        return CompactTest(
+            test.id(), str(test), self.result.getDescription(test), duration,
+        )
+
+
+
+class CompactTextTestResult(TextTestResult):
+
+    def printErrorList(self, flavour, errors):
+        '''
+        As TextTestResult's, but with the descriptions recorded as each test
+        finished, since the tests themselves are gone.
+        '''
+        for test, err in errors:
+            if isinstance(test, CompactTest):
+                description = test.description
+            else:
+                description = self.getDescription(test)
+            self.stream.writeln(self.separator1)
+            self.stream.writeln('%s: %s' % (flavour, description))
+            self.stream.writeln(self.separator2)
+            self.stream.writeln('%s' % err)
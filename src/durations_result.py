@@ -0,0 +1,156 @@
+'''
+A test result listener which records how long each test takes, in both wall
+clock and CPU time, and at the end of the test run prints the slowest tests
+and the slowest TestCase classes.
+
+See also tests.utils.testrunner, which uses this.
+'''
+
+from ctypes import (
+    CDLL, POINTER, Structure, byref, c_int, c_long, get_errno,
+)
+from ctypes.util import find_library
+import os
+import sys
+import time
+
+from .listening_result import ResultListener
+
+
+# CLOCK_MONOTONIC, from <time.h>, which differs between platforms
+MONOTONIC_CLOCK_IDS = [('linux', 1), ('darwin', 6), ('freebsd', 4)]
+
+
+class _Timespec(Structure):
+    _fields_ = [('tv_sec', c_long), ('tv_nsec', c_long)]
+
+
+def _monotonic_clock():
+    '''
+    Return a function giving the seconds on the C library's monotonic clock,
+    which, unlike time.time, isn't stepped when the system clock is set, eg.
+    by NTP. Returns None if there isn't one.
+    '''
+    clock_ids = [
+        clock_id for name, clock_id in MONOTONIC_CLOCK_IDS
+        if sys.platform.startswith(name)
+    ]
+    if not clock_ids:
+        return None
+    clock_id = clock_ids[0]
+    # older versions of glibc keep clock_gettime in librt
+    for library in ['c', 'rt']:
+        try:
+            clock_gettime = CDLL(
+                find_library(library), use_errno=True
+            ).clock_gettime
+            break
+        except (OSError, AttributeError, TypeError):
+            continue
+    else:
+        return None
+    clock_gettime.argtypes = [c_int, POINTER(_Timespec)]
+
+    def monotonic():
+        spec = _Timespec()
+        if clock_gettime(clock_id, byref(spec)) != 0:
+            errno = get_errno()
+            raise OSError(errno, os.strerror(errno))
+        return spec.tv_sec + spec.tv_nsec * 1e-9
+
+    try:
+        monotonic()
+    except OSError:
+        return None
+    return monotonic
+
+
+def _never_backwards(clock):
+    '''
+    Wrap the given clock so it never goes backwards, so at worst a step
+    back of the system clock gives durations of zero, not negative ones.
+    '''
+    latest = [clock()]
+
+    def clamped():
+        latest[0] = max(latest[0], clock())
+        return latest[0]
+
+    return clamped
+
+
+# Python 2 has no time.monotonic, so the C library's is used if it can be,
+# and time.clock measures CPU time on Unix
+wall_clock = (
+    getattr(time, 'monotonic', None) or
+    _monotonic_clock() or
+    _never_backwards(time.time)
+)
+cpu_clock = getattr(time, 'process_time', time.clock)
+
+
+def class_name(test):
+    '''
+    Return the fully qualified name of the given test's class
+    '''
+    return '.'.join([test.__class__.__module__, test.__class__.__name__])
+
+
+def slowest(durations, count):
+    '''
+    Return the 'count' (name, (wall, cpu)) pairs from the given dict with
+    the largest wall clock times.
+    '''
+    return sorted(
+        durations.items(), key=lambda item: item[1][0], reverse=True
+    )[:count]
+
+
+
+class DurationsListener(ResultListener):
+
+    # how many of the slowest tests and classes to report
+    count = 10
+    has_report = True
+
+    def __init__(self, result):
+        ResultListener.__init__(self, result)
+        self.durations = {}
+        self.class_durations = {}
+        self.started = None
+
+
+    def startTest(self, test):
+        self.started = (wall_clock(), cpu_clock())
+
+
+    def stopTest(self, test):
+        # tests run in another process are timed there instead
+        timing = getattr(self.result, 'worker_timing', None)
+        if timing is None:
+            if self.started is None:
+                return
+            wall, cpu = self.started
+            timing = (wall_clock() - wall, cpu_clock() - cpu)
+        self.started = None
+
+        self.durations[test.id()] = timing
+        wall, cpu = self.class_durations.get(class_name(test), (0.0, 0.0))
+        self.class_durations[class_name(test)] = (
+            wall + timing[0], cpu + timing[1]
+        )
+
+
+    def printReport(self, stream):
+        if not self.durations:
+            return
+        stream.writeln(self.result.separator1)
+        for label, durations in [
+            ('SLOW', self.durations),
+            ('SLOW CLASS', self.class_durations),
+        ]:
+            for name, (wall, cpu) in slowest(durations, self.count):
+                stream.writeln(
+                    '%s: %.3fs (cpu %.3fs) %s' % (label, wall, cpu, name)
+                )
+        stream.writeln()
@@ -5,55 +5,46 @@ output produced while setting up test databases.
 See also test_utils.testrunner, which uses this class.
 '''
 
-import os
 import re
 import sys
 
 from django.test.simple import DjangoTestSuiteRunner
 
 
-ENV_VAR = 'TEST_RUNNER_OPTIONS'
-
-
 class FilteredStream(object):
+    '''
+    Wraps a stream, dropping text matched by any of the FILTERS at or below
+    the quiet level. Whatever gets through is written out at once, since it
+    may be a prompt, such as Django's offer to delete a test database left
+    over from an earlier run, which raw_input then waits for an answer to.
+    '''
+
+    # set by testrunner.main
+    quiet = 0
 
     def __init__(self, wrapped):
         self.wrapped = wrapped
         self.filter_next_cr = False
-        self.quiet = self.get_quiet_level()
-
-
-    def get_quiet_level(self):
-        if ENV_VAR not in os.environ:
-            return 0
-
-        for word in os.environ[ENV_VAR].split():
-            if word == '--quiet':
-                return 3
-            if word.startswith('--quiet='):
-                try:
-                    _, value = word.split('=')
-                    return int(value)
-                except ValueError:
-                    return 0
-            return 0
+        self.matcher = get_matcher(self.quiet)
 
 
     def write(self, text):
         if text == '\n':
             if not self.filter_next_cr:
                 self.wrapped.write('\n')
+                self.wrapped.flush()
             self.filter_next_cr = False
             return
 
-        filtr = any(
-            test.match(text) and level <= self.quiet
-            for test, level in FILTERS.items()
-        )
+        filtr = self.matcher is not None and self.matcher(text) is not None
         if not filtr:
             self.wrapped.write(text)
             self.wrapped.flush()
-        self.filter_next_cr = filtr and text[-1] != '\n'
+        self.filter_next_cr = filtr and not text.endswith('\n')
+
+
+    def flush(self):
+        self.wrapped.flush()
 
 
 FILTERS = {
@@ -76,6 +67,9 @@ FILTERS = {
     re.compile("reporting$"): 4,
     re.compile("south$"): 4,
     re.compile("^Creating test database '"): 4,
+    re.compile("^Cloning test database '"): 4,
+    re.compile("^Restoring test database '"): 4,
+    re.compile("^Saving test database '"): 4,
     re.compile("^Processing \S+ model$"): 2,
     re.compile("^Creating table "): 3,
     re.compile("^Adding permission '"): 2,
@@ -93,6 +87,27 @@ FILTERS = {
 }
 
 
+# the match method of the combined pattern for each quiet level
+_matchers = {}
+
+
+def get_matcher(quiet):
+    '''
+    Return the match method of a single pattern combining all the FILTERS
+    which apply at the given quiet level, or None if there are none.
+    '''
+    if quiet not in _matchers:
+        patterns = [
+            '(?:%s)' % test.pattern
+            for test, level in FILTERS.items()
+            if level <= quiet
+        ]
+        _matchers[quiet] = (
+            re.compile('|'.join(patterns)).match if patterns else None
+        )
+    return _matchers[quiet]
+
+
 class FilteredTestRunner(DjangoTestSuiteRunner):
 
     def setup_databases(self, *args, **kwargs):
@@ -106,6 +121,7 @@ class FilteredTestRunner(DjangoTestSuiteRunner):
         try:
             ret = DjangoTestSuiteRunner.setup_databases(self, *args, **kwargs)
         finally:
+            sys.stdout.flush()
             sys.stdout = orig
         return ret
 
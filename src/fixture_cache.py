@@ -0,0 +1,302 @@
+'''
+Speeds up loading test fixtures, in two ways.
+
+Firstly, the objects deserialized from each set of fixtures loaded by the
+'loaddata' command, including the 'initial_data' loaded whenever a database
+is flushed, are kept in a snapshot, pickled, in the runner's cache. Loading
+the same fixtures again just saves the pickled objects, skipping the search
+through every app's fixture directories, and the parsing of the fixture
+files. A snapshot is discarded when the models or fixture files change, using
+the same schema fingerprint as reusable_databases.
+
+Secondly, on databases which support savepoints, the fixtures of each
+django.test.TestCase class are loaded just once, at the start of its first
+test, inside a transaction which lasts until the class's tests are done. Each
+test is then isolated by rolling back to a savepoint taken before it, rather
+than by rolling back and reloading all the fixtures.
+
+See also tests.utils.testrunner, which uses this.
+'''
+
+from glob import glob
+from hashlib import sha1
+import json
+import os
+from os.path import abspath, exists
+import cPickle as pickle
+
+from django.core import serializers
+from django.core.management.color import no_style
+from django.core.management.commands.loaddata import Command as Loaddata
+from django.db import DEFAULT_DB_ALIAS, connections, router, transaction
+from django.test.simple import DjangoTestSuiteRunner
+from django.test.testcases import (
+    TestCase, TransactionTestCase, connections_support_transactions,
+    real_savepoint_rollback, restore_transaction_methods,
+)
+
+from . import cache
+from .all_dirs_runner import _file_stamp
+from .listening_result import ResultListener
+from .reusable_databases import schema_fingerprint
+
+
+# the original methods which the mixins below replace
+_original_handle = Loaddata.__dict__['handle']
+_original_fixture_setup = TestCase.__dict__['_fixture_setup']
+_original_fixture_teardown = TestCase.__dict__['_fixture_teardown']
+_original_post_teardown = TransactionTestCase.__dict__['_post_teardown']
+_original_transaction_fixture_setup = (
+    TransactionTestCase.__dict__['_fixture_setup']
+)
+
+
+def snapshot_name(fixture_labels, using):
+    '''
+    Return the cache name of the snapshot for the given fixtures, which
+    changes whenever the models or fixtures do.
+    '''
+    # fixtures can also be named by a path, or found in the current directory
+    stamps = [
+        (fname, _file_stamp(fname))
+        for label in fixture_labels
+        for fname in sorted(set(glob(label + '.*') + [abspath(label)]))
+        if exists(fname)
+    ]
+    key = json.dumps([
+        fixture_labels, schema_fingerprint(connections[using]), stamps,
+    ])
+    return 'fixtures/%s.pickle' % (sha1(key).hexdigest(),)
+
+
+def read_snapshot(name):
+    try:
+        with open(cache.cache_path(name), 'rb') as stream:
+            return pickle.load(stream)
+    except (IOError, EOFError, pickle.UnpicklingError):
+        return None
+
+
+def write_snapshot(name, objects):
+    path = cache.cache_path(name)
+    if not os.path.isdir(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+    with open(path, 'wb') as stream:
+        pickle.dump(objects, stream, pickle.HIGHEST_PROTOCOL)
+
+
+class _ErrorRecorder(object):
+    '''
+    Wraps a stream, remembering whether anything was written to it
+    '''
+
+    def __init__(self, wrapped):
+        self.wrapped = wrapped
+        self.written = False
+
+    def write(self, text):
+        self.written = True
+        self.wrapped.write(text)
+
+
+
+class SnapshotLoaddata(object):
+    '''
+    Mixed in to Django's loaddata command
+    '''
+
+    def handle(self, *fixture_labels, **options):
+        '''
+        Load the fixtures from their snapshot, if there is one. Otherwise
+        load them as usual, and record the objects loaded in a new snapshot.
+        '''
+        using = options.get('database', DEFAULT_DB_ALIAS)
+        name = snapshot_name(fixture_labels, using)
+        objects = read_snapshot(name)
+        if objects is not None:
+            return self.load_snapshot(objects, using, options)
+
+        recorded = []
+        deserialize = serializers.deserialize
+
+        def recording_deserialize(*args, **kwargs):
+            for obj in deserialize(*args, **kwargs):
+                recorded.append(obj)
+                yield obj
+
+        self.stderr = _ErrorRecorder(self.stderr)
+        serializers.deserialize = recording_deserialize
+        try:
+            _original_handle(self, *fixture_labels, **options)
+        finally:
+            serializers.deserialize = deserialize
+        # loaddata reports problems, such as bad fixtures, on stderr
+        if not self.stderr.written:
+            write_snapshot(name, recorded)
+
+
+    def load_snapshot(self, objects, using, options):
+        '''
+        Save the snapshot's objects, just as loaddata would have done
+        '''
+        connection = connections[using]
+        verbosity = int(options.get('verbosity', 1))
+        commit = options.get('commit', True)
+        cursor = connection.cursor()
+        if commit:
+            transaction.commit_unless_managed(using=using)
+            transaction.enter_transaction_management(using=using)
+            transaction.managed(True, using=using)
+
+        models = set()
+        for obj in objects:
+            if router.allow_syncdb(using, obj.object.__class__):
+                models.add(obj.object.__class__)
+                obj.save(using=using)
+        if models:
+            for line in connection.ops.sequence_reset_sql(no_style(), models):
+                cursor.execute(line)
+
+        if commit:
+            transaction.commit(using=using)
+            transaction.leave_transaction_management(using=using)
+            connection.close()
+
+        if verbosity > 0:
+            if objects:
+                self.stdout.write(
+                    'Installed %d object(s) from fixture snapshot\n'
+                    % (len(objects),)
+                )
+            else:
+                self.stdout.write('No fixtures found.\n')
+
+
+
+def _databases(test):
+    if getattr(test, 'multi_db', False):
+        return list(connections)
+    return [DEFAULT_DB_ALIAS]
+
+
+def _supports_savepoints(aliases):
+    for alias in aliases:
+        connection = connections[alias]
+        # some backends only find out once they have connected
+        connection.cursor()
+        if not connection.features.uses_savepoints:
+            return False
+    return True
+
+
+# the TestCase class whose fixtures are currently loaded, and the databases
+# they are loaded into, or None
+_loaded = None
+
+
+def end_class_fixtures():
+    '''
+    Roll back the transaction containing the current class's fixtures
+    '''
+    global _loaded
+    if _loaded is None:
+        return
+    _, aliases = _loaded
+    _loaded = None
+    restore_transaction_methods()
+    for alias in aliases:
+        transaction.rollback(using=alias)
+        transaction.leave_transaction_management(using=alias)
+
+
+
+class ClassFixturesTestCase(object):
+    '''
+    Mixed in to django.test.TestCase, to load each class's fixtures once
+    '''
+
+    def _fixture_setup(self):
+        global _loaded
+        aliases = _databases(self)
+        if (
+            not connections_support_transactions() or
+            not _supports_savepoints(aliases)
+        ):
+            end_class_fixtures()
+            return _original_fixture_setup(self)
+
+        if _loaded != (type(self), aliases):
+            end_class_fixtures()
+            _loaded = (type(self), aliases)
+            try:
+                _original_fixture_setup(self)
+            except Exception:
+                end_class_fixtures()
+                raise
+        else:
+            from django.contrib.sites.models import Site
+            Site.objects.clear_cache()
+
+        self._savepoints = [
+            (alias, transaction.savepoint(using=alias)) for alias in aliases
+        ]
+
+
+    def _fixture_teardown(self):
+        if not getattr(self, '_savepoints', None):
+            return _original_fixture_teardown(self)
+        # the real rollback, since the test's transaction methods are nops
+        for alias, savepoint in self._savepoints:
+            real_savepoint_rollback(savepoint, using=alias)
+        self._savepoints = None
+
+
+    def _post_teardown(self):
+        '''
+        As TransactionTestCase's, but without closing the connections while
+        the class's fixtures are still needed.
+        '''
+        if _loaded is None:
+            return _original_post_teardown(self)
+        self._fixture_teardown()
+        self._urlconf_teardown()
+
+
+
+class EndClassFixturesTestCase(object):
+    '''
+    Mixed in to django.test.TransactionTestCase, which expects to find the
+    database as it was left by the previous test, so can't run inside the
+    transaction holding some TestCase's fixtures.
+    '''
+
+    def _fixture_setup(self):
+        end_class_fixtures()
+        return _original_transaction_fixture_setup(self)
+
+
+
+class EndClassFixturesListener(ResultListener):
+    '''
+    Ends the transaction holding a TestCase class's fixtures when a test of
+    any other class starts, such as a plain unittest.TestCase, which would
+    otherwise run inside it. Django's TestCases start their own transaction
+    in _fixture_setup, which runs before startTest, so this leaves theirs
+    alone.
+    '''
+
+    in_worker = True
+
+    def startTest(self, test):
+        if _loaded is not None and type(test) is not _loaded[0]:
+            end_class_fixtures()
+
+
+
+class FixtureCacheTestRunner(DjangoTestSuiteRunner):
+
+    def teardown_databases(self, old_config, **kwargs):
+        end_class_fixtures()
+        return DjangoTestSuiteRunner.teardown_databases(
+            self, old_config, **kwargs
+        )
@@ -53,6 +53,9 @@ class HumanReadableTextTestResult(TextTestResult):
         not the docstring. Also, split the method name and the qualification
         onto separate lines
         '''
+        if not hasattr(test, '_testMethodName'):
+            # errors in setUpClass and the like are not part of any test
+            return TextTestResult.getDescription(self, test)
         return  test._testMethodName + '\n' + '.'.join([
             test.__class__.__module__,
             test.__class__.__name__,
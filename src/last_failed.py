@@ -0,0 +1,129 @@
+'''
+Remembers which tests failed or errored on previous runs, so that they can be
+rerun on their own, or before all the other tests.
+
+Tests are remembered by their full name, as matched by AllDirsTestRunner. An
+error in setUpClass or setUpModule is remembered as the name of the class or
+module, which then matches all of its tests.
+
+See also tests.utils.testrunner, which uses this.
+'''
+
+from itertools import chain
+import re
+from unittest import TestSuite
+
+from . import cache
+from .all_dirs_runner import AllDirsTestRunner, _label_matches
+from .listening_result import ResultListener
+from .releasing_suite import flatten, group_by_class
+
+
+FAILED_NAME = 'last_failed.json'
+
+# the description of errors which occur outside of a test, such as
+# 'setUpClass (package.module.Class)'
+ERROR_HOLDER = re.compile(r'^\w+ \((\S+)\)$')
+
+
+def load_failed():
+    '''
+    Return the set of names of tests which failed on previous runs
+    '''
+    return set(cache.load(FAILED_NAME, []))
+
+
+def _names(testname):
+    '''
+    Yield the given test name, and the names of its class and module,
+    any of which a remembered failure might be recorded as.
+    '''
+    while testname:
+        yield testname
+        testname = testname.rpartition('.')[0]
+
+
+def has_failed(testname, failed):
+    return any(name in failed for name in _names(testname))
+
+
+def _failure_name(test):
+    # identified by id, since the result may only keep stand-ins for tests
+    test_id = test.id()
+    match = ERROR_HOLDER.match(test_id)
+    if match:
+        return match.group(1)
+    if ' ' in test_id:
+        return None
+    return test_id
+
+
+def failed_first(suite, failed=None):
+    '''
+    Return a new suite containing the same tests, with the previously failed
+    tests first. Each class's tests are kept together, so setUpClass is still
+    only run once per class.
+    '''
+    if failed is None:
+        failed = load_failed()
+    groups = group_by_class(flatten(suite)).values()
+    ordered = TestSuite()
+    for failing in [True, False]:
+        for tests in groups:
+            if any(has_failed(test.id(), failed) for test in tests) == failing:
+                ordered.addTests(sorted(
+                    tests, key=lambda test: not has_failed(test.id(), failed)
+                ))
+    return ordered
+
+
+
+class FailureRecordingListener(ResultListener):
+    '''
+    Saves the names of the failed and errored tests at the end of each run.
+    Failures remembered from earlier runs are kept, unless the test was run
+    again this time.
+    '''
+
+    def __init__(self, result):
+        ResultListener.__init__(self, result)
+        self.ran = set()
+
+
+    def startTest(self, test):
+        self.ran.update(_names(test.id()))
+
+
+    def stopTestRun(self):
+        failed = set(
+            name for name in load_failed() if name not in self.ran
+        )
+        for test, _ in chain(self.result.errors, self.result.failures):
+            name = _failure_name(test)
+            if name is not None:
+                failed.add(name)
+        cache.save(FAILED_NAME, sorted(failed))
+
+
+
+class LastFailedTestRunner(AllDirsTestRunner):
+    '''
+    Only runs the tests which failed last time, or all of them if none did.
+    '''
+
+    def _test_matches(self, testname, command_line):
+        return (
+            _label_matches(testname, command_line) and
+            (not self.failed or has_failed(testname, self.failed))
+        )
+
+
+    def _select_labels(self, test_labels):
+        '''
+        Look for the failed tests by name, rather than building Django's
+        suite of every test.
+        '''
+        self.failed = load_failed()
+        if self.failed and not test_labels:
+            return sorted(self.failed)
+        return test_labels
@@ -0,0 +1,149 @@
+'''
+A test result which passes every event (startTest, addFailure, etc) on to a
+list of listeners.
+
+The test result mixins are merged into ComposedTestResult by copying their
+attributes, so two mixins which both override, say, startTest, can't both
+work at once. ListeningResult avoids this by sitting beneath TextTestResult in
+ComposedTestResult's bases. Every mixin's version of these methods ends up
+calling the base class version, so they all pass through here, and each
+feature which just needs to observe the test run can be written as a
+listener instead of as another mixin.
+
+Listeners are told of each test stopping in the reverse of the order they were
+told of it starting, so each listener's startTest and stopTest bracket those
+of the listeners after it. A listener measuring the test itself, such as the
+profiler, is added last, so the others' work falls outside what it measures.
+
+See also tests.utils.testrunner, which uses this.
+'''
+
+from unittest import TestResult
+
+
+class ResultListener(object):
+    '''
+    Base class for listeners, which ignores every event. Subclasses override
+    the events they are interested in.
+    '''
+
+    # set True by listeners which override printReport
+    has_report = False
+
+    # set True by listeners which need to see tests as they actually run.
+    # In parallel runs, these are run in each worker process, rather than in
+    # the parent process. See parallel_runner.
+    in_worker = False
+
+    def __init__(self, result):
+        self.result = result
+
+    def startTestRun(self):
+        pass
+
+    def stopTestRun(self):
+        pass
+
+    def startTest(self, test):
+        pass
+
+    def stopTest(self, test):
+        pass
+
+    def addSuccess(self, test):
+        pass
+
+    def addError(self, test, err):
+        pass
+
+    def addFailure(self, test, err):
+        pass
+
+    def addSkip(self, test, reason):
+        pass
+
+    def addExpectedFailure(self, test, err):
+        pass
+
+    def addUnexpectedSuccess(self, test):
+        pass
+
+    def startWorker(self, number):
+        '''
+        Called in each parallel worker process as it starts, for listeners
+        which are 'in_worker'.
+        '''
+        pass
+
+    def stopWorker(self):
+        pass
+
+    def printReport(self, stream):
+        '''
+        Called at the end of the test run, to print anything the listener
+        has to say about it.
+        '''
+        pass
+
+
+
+def _notify(name, reverse=False):
+    '''
+    Return a method which calls the TestResult method of the given name,
+    and then the method of the same name on every listener, last first if
+    'reverse'.
+    '''
+    base = getattr(TestResult, name)
+
+    def method(self, *args):
+        base(self, *args)
+        listeners = reversed(self.listeners) if reverse else self.listeners
+        for listener in listeners:
+            getattr(listener, name)(*args)
+
+    method.__name__ = name
+    return method
+
+
+
+class ListeningResult(TestResult):
+
+    # listener classes, to be instantiated for each result
+    listener_classes = ()
+
+    def __init__(self, *args, **kwargs):
+        TestResult.__init__(self, *args, **kwargs)
+        self.listeners = [klass(self) for klass in self.listener_classes]
+
+
+    startTest = _notify('startTest')
+    stopTest = _notify('stopTest', reverse=True)
+    addSuccess = _notify('addSuccess')
+    addError = _notify('addError')
+    addFailure = _notify('addFailure')
+    addSkip = _notify('addSkip')
+    addExpectedFailure = _notify('addExpectedFailure')
+    addUnexpectedSuccess = _notify('addUnexpectedSuccess')
+    startTestRun = _notify('startTestRun')
+
+
+    def stopTestRun(self):
+        '''
+        Tell the listeners the run has finished, and let each print its
+        report. This happens just before the test runner prints the list of
+        errors and failures.
+        '''
+        TestResult.stopTestRun(self)
+        for listener in self.listeners:
+            listener.stopTestRun()
+
+        reporters = [
+            listener for listener in self.listeners if listener.has_report
+        ]
+        stream = getattr(self, 'stream', None)
+        if stream is None or not reporters:
+            return
+        if getattr(self, 'dots', False):
+            stream.writeln()
+        for listener in reporters:
+            listener.printReport(stream)
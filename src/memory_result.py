@@ -0,0 +1,158 @@
+'''
+A test result listener which measures how much memory each test leaves
+behind, eg. in caches, signal receivers or module globals, and at the end of
+the test run prints the tests and TestCase classes which grew the process
+the most.
+
+Growth is measured as the change in the process's resident set size across
+each test, after collecting garbage. If tracemalloc is available, and
+'trace' is set, the Python memory allocations still alive after each test
+are compared instead, which is more precise, and shows where they were
+made.
+
+See also tests.utils.testrunner, which uses this.
+'''
+
+from ctypes import CDLL
+from ctypes.util import find_library
+import gc
+import heapq
+import os
+import resource
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+from .durations_result import class_name
+from .listening_result import ResultListener
+
+
+# how many allocation sites to show for each test reported
+SITES = 3
+
+# glibc's malloc keeps freed memory for reuse, which would otherwise count
+# as growth of whichever test happened to free it
+try:
+    malloc_trim = CDLL(find_library('c')).malloc_trim
+except (OSError, AttributeError):
+    malloc_trim = None
+
+
+def collect():
+    '''
+    Free everything which is no longer used, as far as possible
+    '''
+    gc.collect()
+    if malloc_trim is not None:
+        malloc_trim(0)
+
+
+def current_rss():
+    '''
+    Return the process's resident set size, in bytes
+    '''
+    try:
+        with open('/proc/self/statm') as stream:
+            pages = int(stream.read().split()[1])
+        return pages * resource.getpagesize()
+    except (IOError, IndexError, ValueError):
+        # elsewhere, only the peak is available, which still shows growth
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # which is in kilobytes, except on macOS
+        return maxrss if os.uname()[0] == 'Darwin' else maxrss * 1024
+
+
+def format_size(size):
+    for unit in ['B', 'KB', 'MB']:
+        if abs(size) < 1024:
+            return '%+.1f%s' % (size, unit)
+        size /= 1024.0
+    return '%+.1fGB' % (size,)
+
+
+
+class MemoryListener(ResultListener):
+
+    # how many of the tests and classes which grew most to report
+    count = 10
+    has_report = True
+
+    # whether to compare tracemalloc snapshots, set by testrunner.main
+    trace = False
+
+    def __init__(self, result):
+        ResultListener.__init__(self, result)
+        # (growth, test id, allocation sites) of the tests which grew most
+        self.largest = []
+        self.class_growth = {}
+        self.started = None
+        self.snapshot = None
+
+
+    def startTestRun(self):
+        if self.trace and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+
+    def _snapshot(self):
+        snapshot = tracemalloc.take_snapshot()
+        return snapshot.filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, os.path.splitext(__file__)[0] + '.py'),
+        ])
+
+
+    def startTest(self, test):
+        collect()
+        if self.trace:
+            self.snapshot = self._snapshot()
+        self.started = current_rss()
+
+
+    def stopTest(self, test):
+        if self.started is None:
+            return
+        collect()
+        growth = current_rss() - self.started
+        sites = []
+        if self.snapshot is not None:
+            stats = self._snapshot().compare_to(self.snapshot, 'lineno')
+            growth = sum(stat.size_diff for stat in stats)
+            sites = [
+                (stat.size_diff, str(stat.traceback))
+                for stat in sorted(
+                    stats, key=lambda stat: stat.size_diff, reverse=True
+                )[:SITES]
+                if stat.size_diff > 0
+            ]
+        self.started = self.snapshot = None
+
+        name = class_name(test)
+        self.class_growth[name] = self.class_growth.get(name, 0) + growth
+        if growth > 0:
+            item = (growth, test.id(), sites)
+            if len(self.largest) < self.count:
+                heapq.heappush(self.largest, item)
+            else:
+                heapq.heappushpop(self.largest, item)
+
+
+    def printReport(self, stream):
+        if not self.class_growth:
+            return
+        stream.writeln(self.result.separator1)
+        for growth, test_id, sites in sorted(self.largest, reverse=True):
+            stream.writeln('MEMORY: %s %s' % (format_size(growth), test_id))
+            for size, site in sites:
+                stream.writeln('  %s %s' % (format_size(size), site))
+        classes = sorted(
+            self.class_growth.items(), key=lambda item: item[1], reverse=True
+        )
+        for name, growth in classes[:self.count]:
+            if growth > 0:
+                stream.writeln(
+                    'MEMORY CLASS: %s %s' % (format_size(growth), name)
+                )
+        stream.writeln()
@@ -0,0 +1,362 @@
+'''
+Runs the test suite across several worker processes, and feeds the outcome of
+each test back into the single test result in the parent process, so that all
+the usual output (colors, readable test names, the skipped test report) still
+works on the merged result.
+
+Tests are handed out to workers a whole TestCase class at a time, so that each
+class's setUpClass and tearDownClass are only run once, in one worker. The
+classes a worker runs make up one suite, so setUpModule and tearDownModule run
+once for each module whose classes a worker runs in a row, as in a serial run,
+rather than once per class. Each worker runs against its own clone of the test
+databases.
+
+If a worker dies, eg. because a test crashed the interpreter, each test it
+hadn't finished, and each test no worker was left to run, is reported as an
+error.
+
+Result listeners marked 'in_worker' (such as the one labelling coverage data
+with test names) need to see tests as they actually run, so they are run in
+the workers instead of in this process.
+
+See also tests.utils.testrunner, which uses this.
+'''
+
+import multiprocessing
+from Queue import Empty
+from unittest import TestResult, TestSuite, TextTestResult
+from unittest.suite import _ErrorHolder
+
+from .durations_result import cpu_clock, wall_clock
+from .releasing_suite import group_indexes_by_class, take_tests
+from .worker_databases import (
+    check_clonable, clone_databases, close_connections, destroy_databases,
+)
+
+
+class RemoteTraceback(Exception):
+    '''
+    Stands in for an exception raised in a worker process, carrying the
+    already formatted traceback text.
+    '''
+
+
+
+class QueueResult(TestResult):
+    '''
+    Used in worker processes. Sends the outcome of each test back to the
+    parent. All the calls made for one test are sent together when it stops,
+    so the parent can replay them without interleaving output from
+    different workers, along with how long the test took.
+    '''
+
+    def __init__(self, tests, events, stop, listener_classes):
+        TestResult.__init__(self)
+        self.listeners = [klass(self) for klass in listener_classes]
+        self.indexes = dict(
+            (id(test), index) for index, test in enumerate(tests)
+        )
+        self.events = events
+        self.stop_event = stop
+        self.calls = []
+        self.started = None
+
+
+    def _record(self, name, test, *args):
+        if id(test) in self.indexes:
+            self.calls.append((name, args))
+        else:
+            # errors in setUpClass and the like are not part of any test
+            self.events.put(('holder', test.description, [(name, args)]))
+
+
+    def startTest(self, test):
+        TestResult.startTest(self, test)
+        self.calls = []
+        self.started = (wall_clock(), cpu_clock())
+        for listener in self.listeners:
+            listener.startTest(test)
+
+
+    def stopTest(self, test):
+        TestResult.stopTest(self, test)
+        wall, cpu = self.started
+        timing = (wall_clock() - wall, cpu_clock() - cpu)
+        # in the reverse order, as in ListeningResult
+        for listener in reversed(self.listeners):
+            listener.stopTest(test)
+        self.events.put(
+            ('test', self.indexes[id(test)], (self.calls, timing))
+        )
+        if self.stop_event.is_set():
+            self.stop()
+
+
+    def addSuccess(self, test):
+        self._record('addSuccess', test)
+
+
+    def addError(self, test, err):
+        self._record('addError', test, self._exc_info_to_string(err, test))
+
+
+    def addFailure(self, test, err):
+        self._record('addFailure', test, self._exc_info_to_string(err, test))
+
+
+    def addSkip(self, test, reason):
+        self._record('addSkip', test, reason)
+
+
+    def addExpectedFailure(self, test, err):
+        self._record(
+            'addExpectedFailure', test, self._exc_info_to_string(err, test)
+        )
+
+
+    def addUnexpectedSuccess(self, test):
+        self._record('addUnexpectedSuccess', test)
+
+
+def _replay(result, test, calls):
+    '''
+    Make the calls recorded by a QueueResult on the given result
+    '''
+    for name, args in calls:
+        if name in ['addError', 'addFailure', 'addExpectedFailure']:
+            text, = args
+            args = ((RemoteTraceback, RemoteTraceback(text), None),)
+        getattr(result, name)(test, *args)
+
+
+def _report_lost(result, tests, indexes, message):
+    '''
+    Report an error with the given message against each of the tests at the
+    given indexes, which never finished, and let go of them
+    '''
+    for index in indexes:
+        test = tests[index]
+        tests[index] = None
+        result.startTest(test)
+        _replay(result, test, [('addError', (message,))])
+        result.stopTest(test)
+
+
+def _end_fixtures(result):
+    '''
+    Tear down the last class and module run, as a top level suite does once
+    all its tests have run
+    '''
+    suite = TestSuite()
+    suite._tearDownPreviousClass(None, result)
+    suite._handleModuleTearDown(result)
+    result._testRunEntered = False
+
+
+def _run_worker(number, tests, groups, tasks, events, stop, options):
+    '''
+    The body of each worker process. Runs the groups of tests whose numbers
+    are taken from the 'tasks' queue until it is exhausted.
+    '''
+    buffer, verbosity, listener_classes, running = options
+    result = QueueResult(tests, events, stop, listener_classes)
+    result.buffer = buffer
+    try:
+        for listener in result.listeners:
+            listener.startWorker(number)
+        clones = clone_databases(number, verbosity)
+        # each group's suite is run as part of one suite, so the module and
+        # class fixtures are only torn down when the next group's module or
+        # class differs, or at the end
+        result._testRunEntered = True
+        try:
+            while not result.shouldStop:
+                group = tasks.get()
+                if group is None:
+                    break
+                # so the parent knows which tests were lost if this dies.
+                # Shared memory is written at once, whereas anything queued
+                # is lost if the process dies before sending it.
+                running[number] = group
+                TestSuite([tests[index] for index in groups[group]])(result)
+                running[number] = -1
+        finally:
+            try:
+                _end_fixtures(result)
+            finally:
+                destroy_databases(clones)
+            for listener in result.listeners:
+                listener.stopWorker()
+    finally:
+        events.put(('done', number, None))
+
+
+
+class ParallelTestSuite(object):
+    '''
+    Wraps a suite, so that running it runs its tests in worker processes
+    '''
+
+    def __init__(self, suite, processes, verbosity=1):
+        self.suite = suite
+        self.processes = processes
+        self.verbosity = verbosity
+
+
+    def __iter__(self):
+        return iter(self.suite)
+
+
+    def countTestCases(self):
+        return self.suite.countTestCases()
+
+
+    def __call__(self, result):
+        return self.run(result)
+
+
+    def run(self, result):
+        # each test is let go of once its outcome has been replayed
+        tests = take_tests(self.suite)
+        tasks = multiprocessing.Queue()
+        events = multiprocessing.Queue()
+        stop = multiprocessing.Event()
+
+        groups = group_indexes_by_class(tests)
+        for group in range(len(groups)):
+            tasks.put(group)
+        for _ in range(self.processes):
+            tasks.put(None)
+
+        check_clonable()
+        close_connections()
+
+        # output is captured in the workers, don't capture it again here
+        buffer, result.buffer = result.buffer, False
+        # and listeners which need to see tests actually running are run there
+        listeners = getattr(result, 'listeners', [])
+        result.listeners = [
+            listener for listener in listeners if not listener.in_worker
+        ]
+        # the number of the group each worker is running, or -1
+        running = multiprocessing.Array('i', [-1] * self.processes)
+        options = (
+            buffer,
+            self.verbosity,
+            [type(listener) for listener in listeners if listener.in_worker],
+            running,
+        )
+        workers = [
+            multiprocessing.Process(
+                target=_run_worker,
+                args=(number, tests, groups, tasks, events, stop, options),
+            )
+            for number in range(self.processes)
+        ]
+        for worker in workers:
+            worker.start()
+        try:
+            self._collect(
+                result, tests, groups, workers, events, stop, running,
+            )
+        except:
+            for worker in workers:
+                worker.terminate()
+            raise
+        finally:
+            stop.set()
+            for worker in workers:
+                worker.join()
+            result.buffer = buffer
+            result.listeners = listeners
+        return result
+
+
+    def _collect(self, result, tests, groups, workers, events, stop, running):
+        '''
+        Replay the events sent by the workers onto the result, until all the
+        workers have finished.
+        '''
+        unfinished = set(range(len(workers)))
+        while unfinished:
+            try:
+                kind, key, payload = events.get(timeout=1)
+            except Empty:
+                self._check_crashes(
+                    result, tests, groups, workers, unfinished, running,
+                )
+                continue
+
+            if kind == 'done':
+                unfinished.discard(key)
+            elif kind == 'holder':
+                _replay(result, _ErrorHolder(key), payload)
+            else:
+                test = tests[key]
+                calls, result.worker_timing = payload
+                try:
+                    result.startTest(test)
+                    _replay(result, test, calls)
+                    result.stopTest(test)
+                finally:
+                    result.worker_timing = None
+                    tests[key] = test = None
+
+            if result.shouldStop:
+                stop.set()
+
+        # tests still queued when the last worker died
+        if not result.shouldStop:
+            unrun = [
+                index for index, test in enumerate(tests) if test is not None
+            ]
+            _report_lost(
+                result, tests, unrun,
+                'not run, since the worker processes died\n',
+            )
+
+
+    def _check_crashes(
+        self, result, tests, groups, workers, unfinished, running,
+    ):
+        '''
+        Report an error for each unfinished test of any worker which died
+        without saying it was done, eg. because a test segfaulted, and stop
+        waiting for it.
+        '''
+        for number in list(unfinished):
+            exitcode = workers[number].exitcode
+            if exitcode is not None and exitcode != 0:
+                unfinished.discard(number)
+                message = 'worker process %d died with exit code %d' % (
+                    number, exitcode,
+                )
+                group = running[number]
+                lost = [] if group == -1 else [
+                    index for index in groups[group]
+                    if tests[index] is not None
+                ]
+                if lost:
+                    _report_lost(
+                        result, tests, lost,
+                        message + ", before this test's outcome was sent\n",
+                    )
+                else:
+                    # it died between tests, eg. cloning the databases
+                    _replay(
+                        result,
+                        _ErrorHolder('worker %d' % number),
+                        [('addError', (message + '\n',))],
+                    )
+
+
+
+class ParallelTestResult(TextTestResult):
+    '''
+    Displays the tracebacks of failures that happened in worker processes
+    '''
+
+    def _exc_info_to_string(self, err, test):
+        if err[0] is RemoteTraceback:
+            return str(err[1])
+        return TextTestResult._exc_info_to_string(self, err, test)
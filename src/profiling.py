@@ -0,0 +1,204 @@
+'''
+Profiles each phase of a test run separately: finding the tests (build_suite),
+creating the test databases (setup_databases), and running the tests. Each
+phase's profile is saved as a pstats file, and the functions with the
+largest cumulative times in each are printed at the end of the test run.
+
+The tests are profiled from the start of each test's setUp to the end of its
+tearDown, in whichever process runs them, leaving out the other test result
+listeners' work as each test starts and stops. In parallel runs, each worker
+saves its own profile, and these are merged at the end. Optionally, each
+test's profile is also saved on its own.
+
+The saved files can be explored further with pstats, or tools such as
+snakeviz, eg:
+
+    python -m pstats .testrunner_cache/profile/tests.pstats
+
+See also tests.utils.testrunner, which uses this.
+'''
+
+import cProfile
+from functools import wraps
+from glob import glob
+import os
+from os.path import exists, join
+import pstats
+import re
+
+from .listening_result import ResultListener
+
+
+# the test runner methods profiled as phases of their own, in the order they
+# happen, and the name of the phase the tests are profiled as
+PHASES = ['build_suite', 'setup_databases']
+TESTS = 'tests'
+
+# characters which can't be used in the filename of a test's profile
+UNSAFE = re.compile(r'[^\w.-]')
+
+
+def profile_path(directory, name):
+    return join(directory, name + '.pstats')
+
+
+def save_stats(stats, path):
+    directory = os.path.dirname(path)
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    stats.dump_stats(path)
+
+
+def _profiled(phase, method):
+    '''
+    Return a version of the given test runner method which profiles it
+    '''
+    @wraps(method)
+    def profiled(self, *args, **kwargs):
+        profile = cProfile.Profile()
+        try:
+            return profile.runcall(method, self, *args, **kwargs)
+        finally:
+            save_stats(
+                profile, profile_path(ProfilingListener.directory, phase)
+            )
+
+    return profiled
+
+
+def profile_phases(klass):
+    '''
+    Wrap the phases' methods of the given, fully composed, test runner class
+    '''
+    for phase in PHASES:
+        method = getattr(klass, phase).__func__
+        setattr(klass, phase, _profiled(phase, method))
+
+
+def hotspots(stats, count):
+    '''
+    Return the (cumulative seconds, own seconds, calls, function) of the
+    'count' functions with the largest cumulative time in the given stats
+    '''
+    spots = [
+        (cumulative, own, calls, pstats.func_std_string(function))
+        for function, (_, calls, own, cumulative, _) in stats.stats.items()
+    ]
+    return sorted(spots, reverse=True)[:count]
+
+
+
+class ProfilingListener(ResultListener):
+
+    # where to save the profiles, and whether to save each test's as well,
+    # set by testrunner.main
+    directory = None
+    per_test = False
+
+    # how many hotspots to report for each phase
+    count = 10
+    has_report = True
+
+    # tests are profiled in whichever process runs them
+    in_worker = True
+
+    def __init__(self, result):
+        ResultListener.__init__(self, result)
+        self.worker = None
+        self.profile = None
+        self.stats = None
+
+
+    def _partial_paths(self):
+        return glob(profile_path(self.directory, TESTS + '.*'))
+
+
+    def startTestRun(self):
+        # the last run's profiles, including any left behind by the workers
+        # of an interrupted run
+        stale = self._partial_paths() + glob(
+            profile_path(join(self.directory, TESTS), '*')
+        )
+        if exists(profile_path(self.directory, TESTS)):
+            stale.append(profile_path(self.directory, TESTS))
+        for path in stale:
+            os.remove(path)
+        if not self.per_test:
+            self.profile = cProfile.Profile()
+
+
+    def startWorker(self, number):
+        self.worker = number
+        self.stats = None
+        if not self.per_test:
+            self.profile = cProfile.Profile()
+
+
+    def startTest(self, test):
+        if self.per_test:
+            self.profile = cProfile.Profile()
+        self.profile.enable()
+
+
+    def stopTest(self, test):
+        self.profile.disable()
+        if not self.per_test:
+            return
+        name = UNSAFE.sub('_', test.id())
+        save_stats(
+            self.profile, profile_path(join(self.directory, TESTS), name)
+        )
+        if self.stats is None:
+            self.stats = pstats.Stats(self.profile)
+        else:
+            self.stats.add(self.profile)
+        self.profile = None
+
+
+    def _save(self, name):
+        '''
+        Save the tests' profile, if any tests were run
+        '''
+        stats = self.stats
+        if stats is None and self.profile is not None:
+            self.profile.create_stats()
+            if self.profile.stats:
+                stats = pstats.Stats(self.profile)
+        if stats is not None:
+            save_stats(stats, profile_path(self.directory, name))
+
+
+    def stopWorker(self):
+        self._save('%s.%d' % (TESTS, self.worker))
+
+
+    def stopTestRun(self):
+        '''
+        Save the tests' profile, merged with those of any parallel workers
+        '''
+        self._save(TESTS)
+        paths = self._partial_paths()
+        if not paths:
+            return
+        save_stats(pstats.Stats(*paths), profile_path(self.directory, TESTS))
+        for path in paths:
+            os.remove(path)
+
+
+    def printReport(self, stream):
+        stream.writeln(self.result.separator1)
+        for phase in PHASES + [TESTS]:
+            path = profile_path(self.directory, phase)
+            if not exists(path):
+                continue
+            stats = pstats.Stats(path)
+            stream.writeln('PROFILE: %s %.3fs, saved in %s' % (
+                phase, stats.total_tt, path,
+            ))
+            spots = hotspots(stats, self.count)
+            for cumulative, own, calls, function in spots:
+                stream.writeln(
+                    '  %.3fs cumulative, %.3fs own, %d calls: %s'
+                    % (cumulative, own, calls, function)
+                )
+        stream.writeln()
@@ -0,0 +1,126 @@
+'''
+A test suite which lets go of each test as soon as it has finished, so that
+anything a test attaches to itself in setUp, or to its class in setUpClass,
+can be freed while the rest of the suite runs, rather than at the very end.
+The runner's memory use then stays flat, however many tests there are.
+
+Also has the helpers used to take suites apart and group their tests by
+TestCase class, which need nothing more than unittest, so that modules which
+reorder or select tests can use them without importing the parallel runner.
+
+See also tests.utils.testrunner, which uses this.
+'''
+
+from collections import OrderedDict
+from unittest import TestSuite
+
+
+def flatten(suite):
+    '''
+    Yield all the individual tests in the given (possibly nested) suite
+    '''
+    for test in suite:
+        if isinstance(test, TestSuite):
+            for subtest in flatten(test):
+                yield subtest
+        else:
+            yield test
+
+
+def group_by_class(tests):
+    '''
+    Return an OrderedDict of {TestCase class: [tests]}, in the order the
+    classes first appear.
+    '''
+    groups = OrderedDict()
+    for test in tests:
+        groups.setdefault(test.__class__, []).append(test)
+    return groups
+
+
+def group_indexes_by_class(tests):
+    '''
+    Return a list of lists of indexes into 'tests', one list per TestCase
+    class, in the order the classes first appear.
+    '''
+    groups = OrderedDict()
+    for index, test in enumerate(tests):
+        groups.setdefault(test.__class__, []).append(index)
+    return list(groups.values())
+
+
+def take_tests(suite):
+    '''
+    Return a list of the individual tests in the given suite, removing them
+    from it, and from any plain TestSuites nested inside it.
+    '''
+    tests = []
+    for test in suite:
+        if type(test) is TestSuite:
+            tests.extend(take_tests(test))
+        else:
+            tests.append(test)
+    if isinstance(suite, TestSuite):
+        suite._tests = []
+    return tests
+
+
+
+class ReleasingTestSuite(TestSuite):
+    '''
+    Each test is removed from the suite as it is run. Once all the tests of
+    a class have finished, any attributes its setUpClass added to the class
+    are removed too.
+    '''
+
+    def __init__(self, tests=()):
+        # nested suites would hold on to their tests, so they are flattened
+        TestSuite.__init__(self, take_tests(tests))
+        self.running = False
+        # the class whose tests are running, and its attributes beforehand
+        self.class_attrs = None
+
+
+    def __iter__(self):
+        if not self.running:
+            return TestSuite.__iter__(self)
+        return self._release_each()
+
+
+    def _release_each(self):
+        for index in xrange(len(self._tests)):
+            yield self._tests[index]
+            # the next test is only asked for once this one has finished.
+            # TestSuite.run may then stop, eg. after failfast, before running
+            # it, which is why it isn't released until it has run too.
+            self._tests[index] = None
+
+
+    def run(self, result, debug=False):
+        self.running = True
+        try:
+            return TestSuite.run(self, result, debug)
+        finally:
+            self.running = False
+            # any tests left unrun, eg. after failfast
+            self._tests = [test for test in self._tests if test is not None]
+
+
+    def _handleClassSetUp(self, test, result):
+        cls = test.__class__
+        if cls is not getattr(result, '_previousTestClass', None):
+            self.class_attrs = (cls, set(vars(cls)))
+        TestSuite._handleClassSetUp(self, test, result)
+
+
+    def _tearDownPreviousClass(self, test, result):
+        TestSuite._tearDownPreviousClass(self, test, result)
+        if self.class_attrs is None:
+            return
+        cls, before = self.class_attrs
+        if cls is getattr(result, '_previousTestClass', None) and (
+            cls is not test.__class__
+        ):
+            for name in set(vars(cls)) - before:
+                delattr(cls, name)
+            self.class_attrs = None
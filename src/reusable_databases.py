@@ -0,0 +1,204 @@
+'''
+Saves a copy of each freshly created test database, as a template, and
+restores the test database from that template on later runs, rather than
+creating all the tables, indexes, permissions and initial data from scratch.
+
+A template is only used if the schema fingerprint it was saved with is still
+current. The fingerprint covers the installed apps, their models, migrations,
+custom SQL and fixtures, any FIXTURE_DIRS, the database settings and the
+Django version. Templates are copied using the same cloning as is used for
+parallel workers, so PostgreSQL, MySQL and file-based SQLite databases are
+supported. In-memory SQLite databases are always created from scratch.
+
+See also tests.utils.testrunner, which uses this.
+'''
+
+from functools import partial
+from hashlib import sha1
+import json
+import os
+from os.path import dirname, isdir, isfile, join, splitext
+
+import django
+from django.conf import settings
+from django.db import connections
+from django.db.backends.creation import TEST_DATABASE_PREFIX
+from django.test.simple import DjangoTestSuiteRunner
+from django.utils.importlib import import_module
+
+from . import cache
+from .worker_databases import CLONERS, _engine
+
+
+FINGERPRINTS_NAME = 'test_databases.json'
+
+# the parts of each app which determine the test database's contents
+SCHEMA_FILES = ['models.py']
+SCHEMA_DIRS = ['models', 'migrations', 'sql', 'fixtures']
+
+
+def _walk_files(directory):
+    for subdir, _, fnames in os.walk(directory):
+        for fname in fnames:
+            if not fname.endswith(('.pyc', '.pyo')):
+                yield join(subdir, fname)
+
+
+def schema_files():
+    '''
+    Yield the filenames of every file which the test databases' contents
+    depend upon.
+    '''
+    for app in settings.INSTALLED_APPS:
+        app_dir = dirname(import_module(app).__file__)
+        for fname in SCHEMA_FILES:
+            if isfile(join(app_dir, fname)):
+                yield join(app_dir, fname)
+        for directory in SCHEMA_DIRS:
+            if isdir(join(app_dir, directory)):
+                for fname in _walk_files(join(app_dir, directory)):
+                    yield fname
+    for directory in getattr(settings, 'FIXTURE_DIRS', ()):
+        for fname in _walk_files(directory):
+            yield fname
+
+
+# the digest of the schema files' contents, which only needs computing once
+_files_digest = None
+
+
+def schema_fingerprint(connection):
+    '''
+    Return a hash of everything that determines the contents of the given
+    connection's freshly created test database.
+    '''
+    global _files_digest
+    if _files_digest is None:
+        digest = sha1()
+        for fname in sorted(set(schema_files())):
+            digest.update(fname)
+            with open(fname, 'rb') as stream:
+                digest.update(stream.read())
+        _files_digest = digest.hexdigest()
+
+    database = dict(
+        (key, value) for key, value in connection.settings_dict.items()
+        if key != 'NAME' and isinstance(value, (basestring, int))
+    )
+    return sha1(json.dumps([
+        _files_digest, database, list(settings.INSTALLED_APPS),
+        django.VERSION,
+    ], sort_keys=True)).hexdigest()
+
+
+def _test_name(connection):
+    '''
+    Return the name of the connection's test database, as Django names it
+    '''
+    settings_dict = connection.settings_dict
+    if _engine(connection) == 'sqlite3':
+        return settings_dict['TEST_NAME'] or ':memory:'
+    return (
+        settings_dict['TEST_NAME'] or
+        TEST_DATABASE_PREFIX + settings_dict['NAME']
+    )
+
+
+def _template_name(test_name):
+    root, ext = splitext(test_name)
+    return '%s_template%s' % (root, ext)
+
+
+def _restore(connection, fingerprint, verbosity):
+    '''
+    Recreate the connection's test database from its saved template, if the
+    template is current. Returns the test database's name, or None if it
+    has to be created from scratch instead.
+    '''
+    test_name = _test_name(connection)
+    template = _template_name(test_name)
+    if cache.load(FINGERPRINTS_NAME, {}).get(template) != fingerprint:
+        return None
+
+    clone, destroy = CLONERS[_engine(connection)]
+    if verbosity >= 1:
+        print "Restoring test database '%s' from template..." % (
+            connection.alias,
+        )
+    try:
+        clone(connection, template, test_name)
+    except Exception as error:
+        print 'Failed to restore test database (%s), creating it.' % (error,)
+        try:
+            destroy(connection, test_name)
+        except Exception:
+            pass
+        return None
+
+    # as Django's create_test_db does, once the database has been created
+    connection.close()
+    connection.settings_dict['NAME'] = test_name
+    connection.settings_dict['SUPPORTS_TRANSACTIONS'] = (
+        connection.creation._rollback_works()
+    )
+    connection.cursor()
+    return test_name
+
+
+def _save_template(connection, fingerprint, test_name, verbosity):
+    '''
+    Save a copy of the freshly created test database as a template
+    '''
+    template = _template_name(test_name)
+    clone, _ = CLONERS[_engine(connection)]
+    if verbosity >= 1:
+        print "Saving test database '%s' as a template..." % (
+            connection.alias,
+        )
+    try:
+        # the clone is made from outside the test database
+        connection.close()
+        clone(connection, test_name, template)
+    except Exception as error:
+        print 'Failed to save test database template: %s' % (error,)
+        return
+    fingerprints = cache.load(FINGERPRINTS_NAME, {})
+    fingerprints[template] = fingerprint
+    cache.save(FINGERPRINTS_NAME, fingerprints)
+
+
+def _create_test_db(connection, original, verbosity=1, autoclobber=False):
+    '''
+    Replaces create_test_db on a connection's DatabaseCreation.
+    '''
+    fingerprint = schema_fingerprint(connection)
+    test_name = _restore(connection, fingerprint, verbosity)
+    if test_name is None:
+        test_name = original(verbosity, autoclobber)
+        _save_template(connection, fingerprint, test_name, verbosity)
+    return test_name
+
+
+def reuse_test_databases():
+    '''
+    Make each connection create its test database from a template where
+    possible.
+    '''
+    for connection in connections.all():
+        creation = connection.creation
+        if (
+            _engine(connection) in CLONERS and
+            _test_name(connection) != ':memory:' and
+            'create_test_db' not in vars(creation)
+        ):
+            creation.create_test_db = partial(
+                _create_test_db, connection, creation.create_test_db
+            )
+
+
+
+class ReusableDatabaseTestRunner(DjangoTestSuiteRunner):
+
+    def setup_test_environment(self, **kwargs):
+        DjangoTestSuiteRunner.setup_test_environment(self, **kwargs)
+        reuse_test_databases()
@@ -0,0 +1,89 @@
+'''
+Orders the test suite so that the TestCase classes expected to take longest
+run first, using how long each test took on previous runs. In parallel runs,
+the workers take classes from the front of this order as they become free, so
+the long classes are spread across the workers early on, and the short ones
+fill in the gaps at the end, so all the workers finish at about the same time.
+
+See also tests.utils.testrunner, which uses this.
+'''
+
+from unittest import TestSuite
+
+from . import cache
+from .durations_result import DurationsListener
+from .releasing_suite import flatten, group_by_class
+
+
+HISTORY_NAME = 'test_durations.json'
+
+# seconds assumed for each test when there's no history at all
+DEFAULT_ESTIMATE = 0.1
+
+
+def load_history():
+    '''
+    Return a dict of {test id: wall clock seconds} from previous runs
+    '''
+    return cache.load(HISTORY_NAME, {})
+
+
+def _estimator(history):
+    '''
+    Return a function which gives the expected duration of a test. Tests
+    with no history are assumed to take the average of those that do.
+    '''
+    if history:
+        default = sum(history.values()) / len(history)
+    else:
+        default = DEFAULT_ESTIMATE
+    return lambda test: history.get(test.id(), default)
+
+
+def class_estimates(suite, history):
+    '''
+    Return a list of (expected seconds, [tests]) for each TestCase class in
+    the suite.
+    '''
+    estimate = _estimator(history)
+    return [
+        (sum(estimate(test) for test in tests), tests)
+        for tests in group_by_class(flatten(suite)).values()
+    ]
+
+
+def schedule_suite(suite, history=None):
+    '''
+    Return a new suite containing the same tests, with the TestCase classes
+    expected to take longest first. Each class's tests stay together, in
+    their original order.
+    '''
+    if history is None:
+        history = load_history()
+    scheduled = TestSuite()
+    # sorted is stable, so classes with equal estimates keep their order
+    for _, tests in sorted(
+        class_estimates(suite, history), key=lambda item: -item[0]
+    ):
+        scheduled.addTests(tests)
+    return scheduled
+
+
+
+class DurationHistoryListener(DurationsListener):
+    '''
+    Remembers how long each test took, for scheduling future runs. Each new
+    duration is averaged with the old one, to smooth out noisy timings.
+    '''
+
+    has_report = False
+
+    def stopTestRun(self):
+        if not self.durations:
+            return
+        history = load_history()
+        for test_id, (wall, _) in self.durations.items():
+            if test_id in history:
+                wall = (history[test_id] + wall) / 2
+            history[test_id] = wall
+        cache.save(HISTORY_NAME, history)
@@ -0,0 +1,75 @@
+'''
+Splits the test suite into shards, to be run on separate machines, such as
+CI nodes, each of which is told which one to run. Each shard is chosen the
+same way on every machine, without them having to talk to each other, so
+every test is run by exactly one of them.
+
+Whole TestCase classes are assigned to shards, so setUpClass still only runs
+once per class. The classes are balanced across the shards using how long
+their tests took, given a file of recorded durations, or otherwise using how
+many tests each class has. Every machine must be given the same durations
+file, if any, or their shards will overlap.
+
+See also tests.utils.testrunner, which uses this.
+'''
+
+import json
+import sys
+
+from .durations_result import class_name
+from .releasing_suite import group_by_class
+from .scheduling import _estimator
+
+
+def load_durations(path):
+    '''
+    Return the {test id: seconds} recorded in the given file, as written to
+    .testrunner_cache/test_durations.json by '--schedule'
+    '''
+    try:
+        with open(path) as stream:
+            return json.load(stream)
+    except (IOError, ValueError) as error:
+        sys.exit("can't read test durations from %s: %s" % (path, error))
+
+
+def assign_classes(tests, count, history):
+    '''
+    Return a dict of {TestCase class: shard number, from 0}, and a list of
+    each shard's expected seconds. Classes are assigned longest first, each
+    to the shard with the least work so far. The result depends only on the
+    tests and the history, not on the order of the tests.
+    '''
+    estimate = _estimator(history)
+    classes = []
+    for klass, class_tests in group_by_class(tests).items():
+        # summed in a fixed order, so rounding is the same everywhere
+        seconds = sum(sorted(estimate(test) for test in class_tests))
+        classes.append((-seconds, class_name(class_tests[0]), klass))
+    classes.sort(key=lambda item: item[:2])
+
+    loads = [0.0] * count
+    shards = {}
+    for seconds, _, klass in classes:
+        shard = min(range(count), key=lambda number: (loads[number], number))
+        loads[shard] -= seconds
+        shards[klass] = shard
+    return shards, loads
+
+
+def select_shard(tests, shard, history=None, verbosity=1):
+    '''
+    Return those of the given tests which are in the given shard, a tuple of
+    (shard number, from 1, number of shards), in their original order.
+    '''
+    number, count = shard
+    shards, loads = assign_classes(tests, count, history or {})
+    selected = [test for test in tests if shards[test.__class__] == number - 1]
+    if verbosity >= 1:
+        expected = ''
+        if history:
+            expected = ', about %.1fs' % (loads[number - 1],)
+        print 'Shard %d/%d: %d of %d tests%s' % (
+            number, count, len(selected), len(tests), expected,
+        )
+    return selected
@@ -11,25 +11,22 @@ class ShowSkippedResult(TextTestResult):
 
     def printErrors(self):
         TextTestResult.printErrors(self)
+        # just the test names are kept, not the tests
         reasons = {}
         for test, reason in self.skipped:
-            tests = reasons.get(reason, [])
-            tests.append(test)
-            reasons[reason] = tests
+            reasons.setdefault(reason, []).append(test.id())
 
         if reasons:
             self.stream.writeln(self.separator1)
 
-        for reason, tests in reasons.iteritems():
+        for reason, test_ids in reasons.iteritems():
             self.stream.write('SKIP: ')
-            self.stream.writeln('%dx %s' % (len(tests), reason))
+            self.stream.writeln('%dx %s' % (len(test_ids), reason))
             if self.showAll:
-                for test in tests:
-                    self.stream.writeln('  ' + '.'.join([
-                        test.__class__.__module__.split('.')[-1],
-                        test.__class__.__name__,
-                        test._testMethodName
-                    ]))
+                for test_id in test_ids:
+                    # module name, class name and method name
+                    name = '.'.join(test_id.split('.')[-3:])
+                    self.stream.writeln('  ' + name)
 
         if reasons:
             self.stream.writeln()
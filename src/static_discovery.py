@@ -0,0 +1,287 @@
+'''
+A test runner that augments AllDirsTestRunner by finding TestCase subclasses
+and their test methods by parsing each module's source with the 'ast' module,
+instead of importing it. So discovery no longer imports (and triggers the
+side-effects of) every model, migration and script in the project. Only the
+modules containing tests which are going to be run get imported.
+
+A class is considered to be a TestCase if any of its bases is one of
+TESTCASE_NAMES, or any other class from outside the project whose name ends
+in 'TestCase', or a class within the project which is itself a TestCase.
+
+See also tests.utils.testrunner, which uses this.
+'''
+
+import ast
+from os.path import exists, join
+
+from .all_dirs_runner import (
+    AllDirsTestRunner, _file_stamp, _to_importable_name,
+)
+
+
+TESTCASE_NAMES = set([
+    'unittest.TestCase',
+    'unittest.case.TestCase',
+    'django.test.TestCase',
+    'django.test.TransactionTestCase',
+    'django.test.testcases.TestCase',
+    'django.test.testcases.TransactionTestCase',
+    'django.utils.unittest.TestCase',
+    'django.utils.unittest.case.TestCase',
+])
+
+
+def _is_testcase_name(dotted):
+    '''
+    Returns True if the given name of a class from outside the project looks
+    like a TestCase
+    '''
+    return dotted in TESTCASE_NAMES or dotted.endswith('TestCase')
+
+
+def _module_file(modname):
+    '''
+    Return the relative filename of the named project module, or None if it
+    is not part of the project.
+    '''
+    path = join(*modname.split('.'))
+    for fname in [path + '.py', join(path, '__init__.py')]:
+        if exists(fname):
+            return fname
+    return None
+
+
+def _dotted_name(node):
+    '''
+    Convert an ast expression like 'a.b.C' into the string 'a.b.C', or None
+    if it is something more complicated.
+    '''
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute):
+        value = _dotted_name(node.value)
+        if value is not None:
+            return value + '.' + node.attr
+    return None
+
+
+def _statements(body):
+    '''
+    Yield the given statements, and those nested inside any 'if' or 'try'
+    blocks, which is where module-level classes and imports sometimes live.
+    '''
+    for node in body:
+        yield node
+        if isinstance(node, ast.If) or type(node).__name__.startswith('Try'):
+            for attr in ['body', 'orelse', 'finalbody']:
+                for child in _statements(getattr(node, attr, [])):
+                    yield child
+            for handler in getattr(node, 'handlers', []):
+                for child in _statements(handler.body):
+                    yield child
+
+
+def _unchanged(depends):
+    '''
+    Returns True if none of the files in the given {fname: stamp} have
+    changed, or been deleted, since they were stamped
+    '''
+    try:
+        return all(
+            _file_stamp(depend) == stamp for depend, stamp in depends.items()
+        )
+    except OSError:
+        return False
+
+
+
+class ModuleSource(object):
+    '''
+    The class definitions and imported names found by parsing one module,
+    and the stamp the file had when it was read
+    '''
+
+    def __init__(self, fname):
+        self.fname = fname
+        self.stamp = _file_stamp(fname)
+        modname = _to_importable_name(fname)
+        if fname.endswith('__init__.py'):
+            self.package = modname
+        else:
+            self.package = modname.rpartition('.')[0]
+
+        with open(fname) as stream:
+            tree = ast.parse(stream.read(), fname)
+
+        self.classes = {}
+        self.imports = {}
+        for node in _statements(tree.body):
+            if isinstance(node, ast.ClassDef):
+                self.classes[node.name] = node
+            elif isinstance(node, ast.Import):
+                for alias in node.names:
+                    if alias.asname:
+                        self.imports[alias.asname] = alias.name
+                    else:
+                        name = alias.name.split('.')[0]
+                        self.imports[name] = name
+            elif isinstance(node, ast.ImportFrom):
+                base = self._absolute(node.module, node.level)
+                for alias in node.names:
+                    if alias.name != '*':
+                        self.imports[alias.asname or alias.name] = (
+                            base + '.' + alias.name if base else alias.name
+                        )
+
+
+    def _absolute(self, module, level):
+        '''
+        Convert the module named in a (possibly relative) 'from' import into
+        an absolute module name.
+        '''
+        if not level:
+            return module
+        parts = self.package.split('.') if self.package else []
+        if level > 1:
+            parts = parts[:1 - level]
+        if module:
+            parts.append(module)
+        return '.'.join(parts)
+
+
+
+class StaticScanner(object):
+    '''
+    Finds TestCase subclasses by parsing source code. Parsed modules and
+    classes are remembered for the lifetime of the scanner, since base
+    classes tend to be shared by many test modules. Under '--watch' or
+    '--serve' the scanner is kept between runs, so each is checked against
+    the stamps of the files it came from, and worked out again if any of
+    them has changed.
+    '''
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self.sources = {}
+        self.described = {}
+
+
+    def source(self, fname):
+        source = self.sources.get(fname)
+        if source is None or source.stamp != _file_stamp(fname):
+            source = self.sources[fname] = ModuleSource(fname)
+        return source
+
+
+    def resolve(self, dotted, seen=()):
+        '''
+        Find where an absolute dotted name is defined. Returns a tuple of
+        (fname, class name) for a class within the project, or the dotted
+        name itself for something outside the project, or None if it can't
+        be found.
+        '''
+        if dotted in seen:
+            return None
+        seen = seen + (dotted,)
+        parts = dotted.split('.')
+        for length in range(len(parts) - 1, 0, -1):
+            fname = _module_file('.'.join(parts[:length]))
+            if fname is not None:
+                source = self.source(fname)
+                return self.resolve_in(source, parts[length:], seen)
+        return dotted
+
+
+    def resolve_in(self, source, parts, seen=()):
+        '''
+        Find where the given dotted name, as seen from within the given
+        module, is defined. Returns the same things as 'resolve'.
+        '''
+        first, rest = parts[0], parts[1:]
+        if first in source.classes:
+            return None if rest else (source.fname, first)
+        if first in source.imports:
+            return self.resolve(
+                '.'.join([source.imports[first]] + rest), seen
+            )
+        # a builtin, or something from a 'from x import *'
+        return '.'.join(parts)
+
+
+    def describe(self, fname, class_name):
+        '''
+        Returns (is_testcase, test method names, {file depended upon: stamp})
+        for the given project class, following its bases within the project.
+        '''
+        key = (fname, class_name)
+        described = self.described.get(key)
+        if described is None or not _unchanged(described[2]):
+            # guard against inheritance cycles while we work this one out
+            source = self.source(fname)
+            self.described[key] = (False, set(), {fname: source.stamp})
+            self.described[key] = self._describe(fname, class_name)
+        return self.described[key]
+
+
+    def _describe(self, fname, class_name):
+        source = self.source(fname)
+        node = source.classes[class_name]
+        is_testcase = False
+        methods = set()
+        depends = {fname: source.stamp}
+        for base in node.bases:
+            dotted = _dotted_name(base)
+            if dotted is None:
+                continue
+            target = self.resolve_in(source, dotted.split('.'))
+            if isinstance(target, tuple):
+                base_is_testcase, base_methods, base_depends = \
+                    self.describe(*target)
+                is_testcase = is_testcase or base_is_testcase
+                methods.update(base_methods)
+                depends.update(base_depends)
+            elif target is not None:
+                is_testcase = is_testcase or _is_testcase_name(target)
+
+        for child in node.body:
+            if (
+                isinstance(child, ast.FunctionDef) and
+                child.name.startswith(self.prefix)
+            ):
+                methods.add(child.name)
+        return is_testcase, methods, depends
+
+
+    def scan(self, fname):
+        '''
+        Return the same things as all_dirs_runner._scan_by_import, but
+        without importing the module.
+        '''
+        source = self.source(fname)
+        classes = {}
+        depends = {fname: source.stamp}
+        for class_name in source.classes:
+            is_testcase, methods, class_depends = \
+                self.describe(fname, class_name)
+            if is_testcase:
+                classes[class_name] = sorted(methods)
+                depends.update(class_depends)
+        return classes, depends
+
+
+
+class StaticDiscoveryTestRunner(AllDirsTestRunner):
+
+    index_name = 'static_discovery_index.json'
+
+    def scan_module(self, fname, loader):
+        '''
+        Scan the module's source code, rather than importing it.
+        '''
+        scanner = getattr(self, 'static_scanner', None)
+        if scanner is None:
+            scanner = self.static_scanner = StaticScanner(
+                loader.testMethodPrefix
+            )
+        return scanner.scan(fname)
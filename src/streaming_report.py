@@ -0,0 +1,249 @@
+'''
+A test result listener which writes the outcome of each test to disk as soon
+as the test finishes, as JUnit XML, as read by Jenkins and other CI servers,
+and/or as JSON Lines, with one JSON object per test.
+
+Nothing is kept in memory once a test's outcome has been written. The files
+are flushed after every test, and the XML file is kept well-formed by
+rewriting its closing tags after each test, so a run which crashes or is
+interrupted still leaves a usable report of the tests which did finish.
+
+See also tests.utils.testrunner, which uses this.
+'''
+
+import json
+import re
+from xml.sax.saxutils import escape, quoteattr
+
+from .durations_result import wall_clock
+from .listening_result import ResultListener
+
+
+# characters which are not allowed anywhere in an XML document
+XML_INVALID = re.compile(u'[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+HOLDER_ID = re.compile(r'^(?P<name>\w+) \((?P<target>.*)\)$')
+
+XML_HEADER = '<?xml version="1.0" encoding="utf-8"?>\n<testsuites>\n'
+XML_FOOTER = '</testsuite>\n</testsuites>\n'
+
+
+def _text(value):
+    '''
+    Return the given text, or bytes, as unicode
+    '''
+    if isinstance(value, str):
+        return value.decode('utf-8', 'replace')
+    return unicode(value)
+
+
+def _xml_text(value):
+    return XML_INVALID.sub(u'\ufffd', _text(value))
+
+
+def split_id(test):
+    '''
+    Return the (class name, method name) of the given test, as JUnit wants
+    them, for test methods, and for the errors in setUpClass and friends
+    which unittest reports using stand-in objects.
+    '''
+    test_id = test.id()
+    # stand-ins are named like 'setUpClass (package.module.ClassName)'
+    match = HOLDER_ID.match(test_id)
+    if match:
+        return match.group('target'), match.group('name')
+    if '.' not in test_id:
+        return test_id, test_id
+    classname, _, name = test_id.rpartition('.')
+    return classname, name
+
+
+def exception_summary(traceback):
+    '''
+    Return the (exception type, message) from the last line of a formatted
+    traceback
+    '''
+    lines = [line for line in traceback.splitlines() if line.strip()]
+    if not lines:
+        return '', ''
+    kind, _, message = lines[-1].partition(': ')
+    return kind, message
+
+
+
+class JUnitXmlWriter(object):
+    '''
+    Writes test outcomes to a JUnit XML file, keeping it well-formed
+    '''
+
+    def __init__(self, path, name):
+        self.stream = open(path, 'w')
+        self.stream.write(XML_HEADER)
+        self.stream.write('<testsuite name=%s>\n' % (quoteattr(name),))
+        self.end = self.stream.tell()
+        self.stream.write(XML_FOOTER)
+        self.stream.flush()
+
+
+    def write(self, record):
+        attrs = ' '.join(
+            '%s=%s' % (key, quoteattr(_xml_text(record[key])))
+            for key in ['classname', 'name']
+        )
+        xml = [u'<testcase %s time="%.3f"' % (attrs, record['time'])]
+        outcome = record['outcome']
+        if outcome in ['success', 'expected_failure']:
+            xml.append(u'/>\n')
+        else:
+            tag = {
+                'error': 'error',
+                'failure': 'failure',
+                'unexpected_success': 'failure',
+                'skip': 'skipped',
+            }[outcome]
+            attrs = ''.join(
+                ' %s=%s' % (key, quoteattr(_xml_text(record[key])))
+                for key in ['type', 'message']
+                if record.get(key)
+            )
+            xml.append(u'>\n  <%s%s>' % (tag, attrs))
+            xml.append(escape(_xml_text(record.get('traceback', ''))))
+            xml.append(u'</%s>\n</testcase>\n' % (tag,))
+
+        self.stream.seek(self.end)
+        self.stream.write(u''.join(xml).encode('utf-8'))
+        self.end = self.stream.tell()
+        self.stream.write(XML_FOOTER)
+        self.stream.truncate()
+        self.stream.flush()
+
+
+    def close(self):
+        self.stream.close()
+
+
+
+class JsonLinesWriter(object):
+    '''
+    Writes each test outcome as a line of JSON
+    '''
+
+    def __init__(self, path, name):
+        self.stream = open(path, 'w')
+
+
+    def write(self, record):
+        # json.dumps would decode any bytes, such as a latin-1 failure
+        # message, strictly as utf-8
+        record = dict(
+            (key, _text(value) if isinstance(value, basestring) else value)
+            for key, value in record.items()
+        )
+        self.stream.write(json.dumps(record) + '\n')
+        self.stream.flush()
+
+
+    def close(self):
+        self.stream.close()
+
+
+
+class StreamingReportListener(ResultListener):
+
+    # filenames to write reports to, set by testrunner.main
+    junit_xml = None
+    jsonl = None
+
+    # the name of the test suite in the XML report
+    suite_name = 'tests'
+
+    def __init__(self, result):
+        ResultListener.__init__(self, result)
+        self.writers = None
+        self.record = None
+        self.started = None
+
+
+    def _open(self):
+        self.writers = []
+        for path, writer in [
+            (self.junit_xml, JUnitXmlWriter),
+            (self.jsonl, JsonLinesWriter),
+        ]:
+            if path:
+                self.writers.append(writer(path, self.suite_name))
+
+
+    def _write(self, record):
+        if self.writers is None:
+            self._open()
+        for writer in self.writers:
+            writer.write(record)
+
+
+    def _outcome(self, test, outcome, err=None, reason=None):
+        classname, name = split_id(test)
+        record = dict(
+            classname=classname, name=name, id=test.id(), outcome=outcome,
+            time=0.0,
+        )
+        if err is not None:
+            traceback = self.result._exc_info_to_string(err, test)
+            record['type'], record['message'] = exception_summary(traceback)
+            record['traceback'] = traceback
+        if reason is not None:
+            record['message'] = _text(reason)
+
+        if self.record is None or self.record['id'] != record['id']:
+            # errors in setUpClass etc happen outside of any test
+            self._write(record)
+        else:
+            self.record.update(record)
+
+
+    def startTest(self, test):
+        self.started = wall_clock()
+        classname, name = split_id(test)
+        self.record = dict(
+            classname=classname, name=name, id=test.id(), outcome='success',
+        )
+
+
+    def stopTest(self, test):
+        if self.record is None:
+            return
+        # tests run in another process are timed there instead
+        timing = getattr(self.result, 'worker_timing', None)
+        if timing is None:
+            self.record['time'] = wall_clock() - self.started
+        else:
+            self.record['time'] = timing[0]
+        self._write(self.record)
+        self.record = None
+
+
+    def addSuccess(self, test):
+        self._outcome(test, 'success')
+
+    def addError(self, test, err):
+        self._outcome(test, 'error', err=err)
+
+    def addFailure(self, test, err):
+        self._outcome(test, 'failure', err=err)
+
+    def addSkip(self, test, reason):
+        self._outcome(test, 'skip', reason=reason)
+
+    def addExpectedFailure(self, test, err):
+        self._outcome(test, 'expected_failure', err=err)
+
+    def addUnexpectedSuccess(self, test):
+        self._outcome(test, 'unexpected_success')
+
+
+    def stopTestRun(self):
+        if self.writers is None:
+            self._open()
+        for writer in self.writers:
+            writer.close()
+        self.writers = []
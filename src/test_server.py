@@ -0,0 +1,202 @@
+'''
+A test server, which sets up Django, imports all the test modules and creates
+the test databases just once, and then waits for requests to run tests. Each
+request is run in a freshly forked child process, which inherits all of that
+set-up, and whose output is sent back to the client requesting it.
+
+A matching test runner forwards 'manage.py test <labels>' to the server,
+rather than running the tests itself, and relays the output to the terminal.
+
+See also tests.utils.testrunner, which uses this.
+'''
+
+import json
+import os
+from os.path import dirname, isdir, relpath
+import socket
+import sys
+import traceback
+
+from django.test.simple import DjangoTestSuiteRunner
+
+from .cache import cache_path
+from .worker_databases import close_connections
+
+
+SOCKET_NAME = 'test_server.sock'
+
+# separates the test output sent back to the client from the exit status
+END_OF_OUTPUT = '\0'
+
+# what each request gives, as sent by TestClientRunner
+REQUEST_KEYS = frozenset(['labels', 'verbosity', 'failfast', 'tty'])
+
+
+def socket_path():
+    '''
+    Return the filename of the server's Unix socket. It is relative, since
+    socket filenames are limited to about 100 characters.
+    '''
+    return relpath(cache_path(SOCKET_NAME))
+
+
+
+def read_request(connection):
+    '''
+    Return the request sent on the given connection, a dict of the labels
+    and options to run the tests with. Raises ValueError if it's malformed.
+    '''
+    request = json.loads(connection.makefile().readline())
+    if not isinstance(request, dict):
+        raise ValueError('expected an object, got %r' % (request,))
+    missing = REQUEST_KEYS.difference(request)
+    if missing:
+        raise ValueError('missing %s' % (', '.join(sorted(missing)),))
+    return request
+
+
+def reply(connection, output, status):
+    '''
+    Send the given output and exit status to the client, unless it has
+    gone away
+    '''
+    try:
+        connection.sendall('%s%s%d\n' % (output, END_OF_OUTPUT, status))
+    except socket.error:
+        pass
+
+
+class TestServerRunner(DjangoTestSuiteRunner):
+
+    def run_tests(self, test_labels, extra_tests=None, **kwargs):
+        '''
+        Set up the test environment and databases, then serve requests to
+        run tests until interrupted by Ctrl-C.
+        '''
+        self.setup_test_environment()
+        # import all the test modules now, rather than in every child
+        self.build_suite(test_labels, extra_tests)
+        old_config = self.setup_databases()
+
+        path = socket_path()
+        if not isdir(dirname(path)):
+            os.makedirs(dirname(path))
+        if os.path.exists(path):
+            os.remove(path)
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        listener.bind(path)
+        listener.listen(5)
+        print 'Test server listening on %s. Ctrl-C to stop.' % (path,)
+        try:
+            while True:
+                connection, _ = listener.accept()
+                try:
+                    self.handle(connection)
+                finally:
+                    connection.close()
+        except KeyboardInterrupt:
+            print
+        finally:
+            listener.close()
+            os.remove(path)
+            self.teardown_databases(old_config)
+            self.teardown_test_environment()
+        return 0
+
+
+    def handle(self, connection):
+        '''
+        Run the tests requested on the given connection in a child process,
+        and then send the child's exit status. A request which can't be
+        read is answered with an error instead, leaving the server running.
+        '''
+        try:
+            request = read_request(connection)
+        except (ValueError, socket.error) as error:
+            reply(connection, 'test server: bad request (%s)\n' % (error,), 1)
+            return
+        # the child gets its own database connections
+        close_connections()
+        sys.stdout.flush()
+        pid = os.fork()
+        if pid == 0:
+            status = 1
+            try:
+                status = self.run_request(connection, request)
+            except BaseException:
+                traceback.print_exc()
+            finally:
+                sys.stdout.flush()
+                os._exit(status)
+
+        _, status = os.waitpid(pid, 0)
+        status = os.WEXITSTATUS(status) if os.WIFEXITED(status) else 1
+        reply(connection, '', status)
+
+
+    def run_request(self, connection, request):
+        '''
+        Runs in the child process. Send all output to the client, run the
+        requested tests, and return the exit status, the number of tests
+        which failed.
+        '''
+        os.dup2(connection.fileno(), sys.stdout.fileno())
+        os.dup2(connection.fileno(), sys.stderr.fileno())
+        if request['tty']:
+            colored = sys.modules.get(
+                __name__.rpartition('.')[0] + '.colored_runner'
+            )
+            if colored is not None:
+                colored.remote_tty = True
+
+        self.verbosity = request['verbosity']
+        self.failfast = request['failfast']
+        suite = self.build_suite(request['labels'])
+        result = self.run_suite(suite)
+        return min(self.suite_result(suite, result), 255)
+
+
+
+class TestClientRunner(DjangoTestSuiteRunner):
+
+    def run_tests(self, test_labels, extra_tests=None, **kwargs):
+        '''
+        Ask the test server to run the tests, and print its output. Returns
+        the server's exit status, which is non-zero if any tests failed.
+        '''
+        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            client.connect(socket_path())
+        except socket.error as error:
+            sys.exit(
+                "can't connect to the test server (%s). Start one with "
+                "TEST_RUNNER_OPTIONS=--serve" % (error,)
+            )
+
+        request = dict(
+            labels=list(test_labels),
+            verbosity=self.verbosity,
+            failfast=self.failfast,
+            tty=sys.stderr.isatty(),
+        )
+        client.sendall(json.dumps(request) + '\n')
+
+        received = ''
+        while True:
+            data = client.recv(65536)
+            if not data:
+                break
+            output, end, received = (received + data).partition(END_OF_OUTPUT)
+            sys.stderr.write(output)
+            if end:
+                break
+        while True:
+            data = client.recv(64)
+            if not data:
+                break
+            received += data
+        client.close()
+        try:
+            return int(received)
+        except ValueError:
+            return 1
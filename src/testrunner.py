@@ -30,7 +30,22 @@ a testname, of the form:
     package.subpackage.module.ClassName.method_name
 
 If <pattern> is a substring of this testname, then that test method is added to
-the suite of tests to be run.
+the suite of tests to be run. A <pattern> containing '*', '?' or '[...]' is
+a glob instead, e.g. 'orders.*Cancel*', and one starting with 're:' is a
+regular expression, e.g. 're:test_(create|delete)$'. Either may match
+anywhere within the testname. All the patterns given are compiled into a
+single regular expression, so matching stays fast for large suites.
+
+The classes and test method names found in each module are remembered between
+runs, in .testrunner_cache/discovery_index.json, so that modules which haven't
+changed since the last run are neither imported nor scanned again. Only
+modules which contain tests that are going to be run get imported. Delete the
+.testrunner_cache directory to force a full rescan.
+
+Adding '--static-discovery' to TEST_RUNNER_OPTIONS finds the TestCase
+subclasses in changed modules by parsing their source code, rather than by
+importing them, so that discovery doesn't import (and trigger the side-effects
+of) every model, migration and script in the project.
 
 This modification to the test runner is always turned on.
 
@@ -55,6 +70,12 @@ TEST_RUNNER_OPTIONS, where X is:
 
 Alternatively, '--quiet' without specifying X defaults to 3.
 
+The regular expressions for each level are combined into a single one, so
+each fragment of output is only matched once. 'python -m tests.utils.benchmark'
+measures this. Whatever gets through is written out at once, so that prompts,
+such as Django's offer to delete a test database left over from an earlier
+run, are seen before it waits for an answer.
+
 
 3) READABLE TEST NAMES
 
@@ -81,6 +102,12 @@ with 'verbosity=2'
 
 Enable with '--color' or '--colour' in TEST_RUNNER_OPTIONS.
 
+Colors are only used when the output is a terminal, so logs such as those
+kept by Jenkins don't fill up with escape sequences. When only a dot is
+printed for each test, the dots are batched up, and written to the terminal
+at most ten times a second. With 'verbosity=2', each test's name is written
+out as soon as it starts, so a slow or stuck test can be seen.
+
 
 5) SHOW SKIPPED TEST REPORT
 
@@ -97,6 +124,219 @@ via Ned Batchelder's code coverage python tools.  Type "coverage report" or
 
 Enable by adding "--coverage"" to TEST_RUNNER_OPTIONS.
 
+Only the project's own source files are measured, excluding tests and
+migrations, and this test runner itself. To measure a different set of files
+or packages, add '--coverage-source=<dir or package>,...' to
+TEST_RUNNER_OPTIONS. The coverage
+recorded during each test is labelled with the test's name, so that
+"coverage html --show-contexts" shows which tests ran each line.
+
+When combined with '--parallel=N', each worker writes its own coverage data
+file, and these are merged into .coverage at the end of the test run.
+
+Adding '--footprints' to TEST_RUNNER_OPTIONS measures coverage as above, but
+also records which lines of which project files each test executes, in
+.testrunner_cache/footprints.json. Then '--changed-since=<git revision>' runs
+only the tests which executed lines which have changed since that revision,
+plus any tests with no recorded footprint (eg. new ones.) For example, before
+committing:
+
+  export TEST_RUNNER_OPTIONS="--footprints --changed-since=HEAD"
+
+
+6) PARALLEL TEST RUNS
+
+Runs the tests in N worker processes. Tests are handed out to the workers one
+TestCase class at a time, so setUpClass and tearDownClass are only run once
+for each class. The outcome of every test is sent back to this process, so
+all the other options which change the test output still work as usual.
+
+Each worker runs its tests against its own copies of the test databases,
+cloned from the ones set up as usual by this process. The workers create
+their clones concurrently as they start up, and destroy them when they finish.
+Cloning is supported for PostgreSQL, MySQL and SQLite.
+
+Enable with '--parallel=N' in TEST_RUNNER_OPTIONS.
+
+
+7) TEST DURATIONS
+
+Records the wall clock and CPU time taken by every test, and at the end of the
+test run prints the N slowest tests, and the N slowest TestCase classes.
+
+Enable with '--durations=N' in TEST_RUNNER_OPTIONS.
+
+
+8) SCHEDULE LONGEST TESTS FIRST
+
+Remembers how long each test took, in .testrunner_cache/test_durations.json,
+and uses that to run the TestCase classes expected to take longest first.
+Tests with no recorded duration are assumed to take the average time.
+
+Combined with '--parallel=N', this means the long-running classes are spread
+across the workers early on, and the short ones fill in the gaps at the end,
+so that all the workers finish at about the same time.
+
+Enable with '--schedule' in TEST_RUNNER_OPTIONS.
+
+
+9) RERUN FAILED TESTS
+
+The names of the tests which fail or error are always remembered, in
+.testrunner_cache/last_failed.json. A failure stays remembered until the test
+is run again. An error in setUpClass is remembered as the name of the class,
+which matches all of its tests.
+
+With '--last-failed' in TEST_RUNNER_OPTIONS, only the remembered failures are
+run (or all tests, if there aren't any.) Only the modules containing those
+tests get imported. Any <pattern> given on the command line further narrows
+down which of them are run. It can't be combined with '--changed-since'.
+
+With '--failed-first' in TEST_RUNNER_OPTIONS, the remembered failures are run
+first, followed by all the other tests.
+
+
+10) WATCH FOR CHANGES
+
+After running the tests, keeps Django set up and the test databases in place,
+and waits for the project's modules to change. Whenever they do, the changed
+modules, and any project modules which import them, are reloaded, and the
+tests in all of those modules are run again. Only changed modules are scanned
+for tests again. Stop watching with Ctrl-C.
+
+Changes are noticed using inotify on Linux, and by polling file modification
+times elsewhere. Changes to models can't be reloaded, and need a restart.
+
+Enable with '--watch' in TEST_RUNNER_OPTIONS.
+
+
+11) TEST SERVER
+
+Starts a server which sets up Django, imports all the test modules, creates
+the test databases, and then waits for requests to run tests. Each request
+is run in a freshly forked child process, which inherits all of that set-up,
+so running a single test takes a fraction of a second. The output is sent back
+to the terminal the request came from, and uses the options the server was
+started with, eg. --color or --readable.
+
+Start the server with '--serve' in TEST_RUNNER_OPTIONS, then in another
+terminal, run tests using the server with '--use-server':
+
+  TEST_RUNNER_OPTIONS="--serve --color" ./manage.py test
+  TEST_RUNNER_OPTIONS="--use-server" ./manage.py test <pattern>
+
+The server must be restarted to pick up changes to the project's code.
+
+Only one of '--coverage', '--watch', '--serve' or '--use-server' can be used
+at once.
+
+
+12) REUSE TEST DATABASES
+
+Saves a copy of each newly created test database as a template, and on later
+runs restores the test database from the template, rather than creating all
+its tables, indexes, permissions and initial data again. A template is only
+used while a fingerprint of the installed apps' models, migrations, custom SQL
+and fixtures, the database settings and the Django version is unchanged.
+
+Supported for PostgreSQL, MySQL, and SQLite with a TEST_NAME. Delete
+.testrunner_cache/test_databases.json to force the templates to be rebuilt.
+
+Enable with '--reuse-db' in TEST_RUNNER_OPTIONS.
+
+
+13) CACHE FIXTURES
+
+Keeps a snapshot of the objects loaded from each set of fixtures, including
+initial_data, in .testrunner_cache/fixtures/, so that loading them again
+doesn't need to find and parse the fixture files. Snapshots are discarded when
+the models or fixtures change.
+
+Also, on databases which support savepoints (eg. PostgreSQL), the fixtures of
+each django.test.TestCase class are loaded only once, before its first test.
+Each test is then rolled back to a savepoint, instead of reloading the
+fixtures for every test. The fixtures are rolled back as soon as a test of any
+other class starts, so tests which aren't Django TestCases never see them.
+
+Enable with '--cache-fixtures' in TEST_RUNNER_OPTIONS.
+
+
+14) STREAMING REPORTS
+
+Writes the outcome of each test to a file as soon as the test finishes, as
+JUnit XML and/or as JSON Lines (one JSON object per test, with its id,
+outcome, duration and any traceback). The files are flushed after every test,
+and the XML is kept well-formed throughout, so a run which crashes or is
+interrupted still leaves a report of the tests which finished. Jenkins can
+publish the XML file with its 'Publish JUnit test result report' step.
+
+Enable with '--junit-xml=<filename>' and/or '--jsonl=<filename>' in
+TEST_RUNNER_OPTIONS.
+
+
+15) COMPACT RESULTS AND RELEASING TESTS
+
+Errors, failures and skipped tests are kept as compact records of the test's
+name, duration and traceback or reason, rather than keeping the tests
+themselves until the end of the run. Once the tracebacks add up to more than
+a megabyte, further ones are written to a temporary file, and read back as
+they are printed, so a run in which thousands of tests fail doesn't run out
+of memory.
+
+Likewise, each test is let go of as soon as it has finished, along with any
+attributes its class's setUpClass added, so that whatever the tests keep on
+themselves can be freed while the run goes on. 'python -m
+tests.utils.benchmark' shows the peak memory use for suites of different
+sizes, which stays flat.
+
+This modification to the test runner is always turned on.
+
+
+16) MEMORY GROWTH
+
+Measures how much each test grows the test process, by comparing its resident
+set size before and after the test (collecting garbage first), and at the end
+of the run prints the tests and TestCase classes which grew it most. This
+finds tests which leak memory into caches, signal receivers or module
+globals.
+
+Enable with '--memory' or '--memory=N' (to show the N largest) in
+TEST_RUNNER_OPTIONS. Adding '--memory-trace' also compares tracemalloc
+snapshots around each test, which measures Python allocations precisely and
+shows the lines which made them, at the cost of a much slower run. This needs
+tracemalloc, which is included in Python 3, and available for Python 2 as
+pytracemalloc. Can't be used with '--parallel'.
+
+
+17) PROFILING
+
+Profiles each phase of the test run separately: finding the tests, setting up
+the test databases, and running the tests (each test's setUp, test method and
+tearDown.) The profiles are saved as pstats files in
+.testrunner_cache/profile/, merged across parallel workers, and the functions
+with the largest cumulative times in each phase are printed at the end of the
+run. Explore them further with 'python -m pstats <file>'.
+
+Enable with '--profile' in TEST_RUNNER_OPTIONS, or '--profile=<directory>' to
+save the profiles elsewhere. Adding '--profile-tests' also saves each test's
+own profile, in the 'tests' subdirectory.
+
+
+18) SHARDING
+
+Runs just one of several shards of the test suite, so that it can be split
+across CI nodes. Every test is in exactly one shard, and each TestCase class
+is kept whole, so setUpClass only runs once. The classes are spread over the
+shards so they have about the same number of tests or, given a file of
+recorded test durations, so they take about the same time.
+
+Enable with '--shard=i/n' in TEST_RUNNER_OPTIONS, to run shard i of n, from
+1/n to n/n. Give every node the same labels. To balance by duration, add
+'--shard-durations=<filename>', naming a copy of
+.testrunner_cache/test_durations.json as recorded by a run with '--schedule'.
+Every node must use the same copy, eg. one committed to the repository, or
+the shards will overlap.
+
 '''
 
 import os
@@ -106,16 +346,26 @@ from unittest import TextTestResult
 from django.test.simple import DjangoTestRunner
 from django_jenkins.runner import CITestSuiteRunner
 
-from .all_dirs_runner import AllDirsTestRunner
-from .code_coverage import CodeCoverageMeasuringTestRunner
-from .colored_runner import ColoredTextTestResult, ColoredTextTestRunner
-from .filtered_runner import FilteredTestRunner
-from .human_readable_result import HumanReadableTextTestResult
-from .show_skipped_result import ShowSkippedResult
+# The modules implementing each option are only imported by main() if the
+# option is enabled, so that running without options starts up quickly.
+from .cache import cache_path
+from .listening_result import ListeningResult
+from .releasing_suite import ReleasingTestSuite, take_tests
 
 
 ENV_VAR = 'TEST_RUNNER_OPTIONS'
 
+# the options understood, as listed when given one which isn't
+OPTION_NAMES = [
+    '--quiet[=X]', '--readable', '--color', '--show-skip', '--coverage',
+    '--coverage-source=<dirs>', '--footprints', '--changed-since=<rev>',
+    '--static-discovery', '--parallel=N', '--durations=N', '--schedule',
+    '--last-failed', '--failed-first', '--watch', '--serve', '--use-server',
+    '--junit-xml=<file>', '--jsonl=<file>', '--memory[=N]', '--memory-trace',
+    '--profile[=<dir>]', '--profile-tests', '--cache-fixtures', '--reuse-db',
+    '--shard=i/n', '--shard-durations=<file>',
+]
+
 
 # Django uses three classes to run tests. The following three classes
 # inherit from them and are empty except for references to each other.
@@ -125,20 +375,54 @@ ENV_VAR = 'TEST_RUNNER_OPTIONS'
 # dynamically, by mixing in the class-level attributes from other testrunner
 # and testresult subclasses.
 
-class ComposedTestResult(TextTestResult):
-    pass
+# Options which only need to observe the test results are instead added to
+# ComposedTestResult.listener_classes. See listening_result.
+
+class ComposedTestResult(TextTestResult, ListeningResult):
+    listener_classes = []
 
 class ComposedTestRunner(DjangoTestRunner):
     resultclass = ComposedTestResult
 
 class TestRunner(CITestSuiteRunner):
 
+    failed_first = False
+    parallel = 1
+    schedule = False
+    # (i, n) to run shard i of n, and the file of durations to balance by
+    shard = None
+    shard_durations = None
+
     def __init__(self, *args, **kwargs):
+        # the options are only read, and the classes composed, once Django
+        # asks for a test runner, rather than whenever this module is imported
+        main()
         if "verbosity" in kwargs and kwargs["verbosity"] >= 2:
             print "Using " + type(self).__module__ + '.' + type(self).__name__
         super(TestRunner, self).__init__('.', *args, **kwargs)
 
     def run_suite(self, suite):
+        # the tests are taken out of the suite we were given, so that only
+        # the suite being run holds them, and it lets go of each test as
+        # soon as it has finished
+        tests = take_tests(suite)
+        if self.shard:
+            from .sharding import load_durations, select_shard
+            history = None
+            if self.shard_durations:
+                history = load_durations(self.shard_durations)
+            tests = select_shard(tests, self.shard, history, self.verbosity)
+        if self.schedule:
+            from .scheduling import schedule_suite
+            tests = schedule_suite(tests)
+        if self.failed_first:
+            from .last_failed import failed_first
+            tests = failed_first(tests)
+        suite = ReleasingTestSuite(tests)
+        del tests
+        if self.parallel > 1:
+            from .parallel_runner import ParallelTestSuite
+            suite = ParallelTestSuite(suite, self.parallel, self.verbosity)
         runner = ComposedTestRunner(
             verbosity=self.verbosity, failfast=self.failfast,
         )
@@ -151,11 +435,33 @@ class Options(object):
     '''
     def __init__(self, options_str):
         self.all_dirs = True
+        self.cache_fixtures = False
+        self.changed_since = None
         self.code_coverage = False
         self.color = False
-        self.quiet = False
+        self.coverage_source = None
+        self.durations = 0
+        self.failed_first = False
+        self.footprints = False
+        self.jsonl = None
+        self.junit_xml = None
+        self.last_failed = False
+        self.memory = 0
+        self.memory_trace = False
+        self.parallel = 1
+        self.profile = None
+        self.profile_tests = False
+        self.quiet = 0
         self.readable = False
+        self.reuse_db = False
+        self.schedule = False
         self.show_skip = False
+        self.static_discovery = False
+        self.serve = False
+        self.shard = None
+        self.shard_durations = None
+        self.use_server = False
+        self.watch = False
 
         if options_str:
             self.parse(options_str)
@@ -164,8 +470,10 @@ class Options(object):
     def parse(self, options_str):
         options = options_str.split()
         for word in options:
-            if word.startswith('--quiet'):
-                self.quiet = True
+            if word == '--quiet':
+                self.quiet = 3
+            elif word.startswith('--quiet='):
+                self.quiet = self.parse_int(word)
             elif word in ["--code_coverage", "--code-coverage", "--coverage"]:
                 self.code_coverage = True
             elif word == '--readable':
@@ -174,13 +482,123 @@ class Options(object):
                 self.color = True
             elif word in ['--show_skip', '--show-skip']:
                 self.show_skip = True
+            elif word in ['--static_discovery', '--static-discovery']:
+                self.static_discovery = True
+            elif word.startswith('--parallel='):
+                self.parallel = self.parse_int(word)
+            elif word.startswith('--durations='):
+                self.durations = self.parse_int(word)
+            elif word == '--schedule':
+                self.schedule = True
+            elif word in ['--last_failed', '--last-failed']:
+                self.last_failed = True
+            elif word in ['--failed_first', '--failed-first']:
+                self.failed_first = True
+            elif word == '--footprints':
+                self.code_coverage = True
+                self.footprints = True
+            elif word.startswith('--coverage-source='):
+                self.code_coverage = True
+                _, _, value = word.partition('=')
+                self.coverage_source = value.split(',')
+            elif word.startswith('--changed-since='):
+                _, _, self.changed_since = word.partition('=')
+            elif word == '--watch':
+                self.watch = True
+            elif word.startswith(('--junit_xml=', '--junit-xml=')):
+                _, _, self.junit_xml = word.partition('=')
+            elif word.startswith('--jsonl='):
+                _, _, self.jsonl = word.partition('=')
+            elif word == '--memory':
+                self.memory = self.memory or 10
+            elif word.startswith('--memory='):
+                self.memory = self.parse_int(word)
+            elif word in ['--memory_trace', '--memory-trace']:
+                self.memory = self.memory or 10
+                self.memory_trace = True
+            elif word == '--profile':
+                self.profile = self.profile or cache_path('profile')
+            elif word.startswith('--profile='):
+                _, _, self.profile = word.partition('=')
+            elif word in ['--profile_tests', '--profile-tests']:
+                self.profile = self.profile or cache_path('profile')
+                self.profile_tests = True
+            elif word in ['--cache_fixtures', '--cache-fixtures']:
+                self.cache_fixtures = True
+            elif word in ['--reuse_db', '--reuse-db']:
+                self.reuse_db = True
+            elif word == '--serve':
+                self.serve = True
+            elif word.startswith('--shard='):
+                self.shard = self.parse_shard(word)
+            elif word.startswith(('--shard_durations=', '--shard-durations=')):
+                _, _, self.shard_durations = word.partition('=')
+            elif word in ['--use_server', '--use-server']:
+                self.use_server = True
             else:
                 sys.exit(
-                    'bad entry in %s: %s.'
-                    '(expect --quiet=X, --readable, --color or --show-skip)'
-                    % (ENV_VAR, word)
+                    'bad entry in %s: %s. (expected one of %s)'
+                    % (ENV_VAR, word, ', '.join(OPTION_NAMES))
                 )
 
+        # each of these replaces the test runner's run_tests
+        self.check_exclusive([
+            ('--coverage', self.code_coverage),
+            ('--watch', self.watch),
+            ('--serve', self.serve),
+            ('--use-server', self.use_server),
+        ])
+        # and each of these chooses which tests to run
+        self.check_exclusive([
+            ('--last-failed', self.last_failed),
+            ('--changed-since', self.changed_since),
+        ])
+        # memory is measured in the process running the tests
+        if self.memory and self.parallel > 1:
+            sys.exit("bad entry in %s: --memory can't be used with --parallel"
+                % (ENV_VAR,))
+
+
+    def check_exclusive(self, options):
+        '''
+        Exit if more than one of the given (option, enabled) is enabled
+        '''
+        exclusive = [word for word, enabled in options if enabled]
+        if len(exclusive) > 1:
+            sys.exit("bad entry in %s: %s can't be used together"
+                % (ENV_VAR, ' and '.join(exclusive)))
+
+
+    def parse_int(self, word):
+        '''
+        Return the value of an option like '--name=N' as an int
+        '''
+        _, _, value = word.partition('=')
+        try:
+            return int(value)
+        except ValueError:
+            sys.exit(
+                'bad entry in %s: %s. (expected a number)' % (ENV_VAR, word)
+            )
+
+
+    def parse_shard(self, word):
+        '''
+        Return the value of '--shard=i/n' as a tuple of ints (i, n)
+        '''
+        _, _, value = word.partition('=')
+        number, _, count = value.partition('/')
+        try:
+            number, count = int(number), int(count)
+        except ValueError:
+            number = count = 0
+        if not 1 <= number <= count:
+            sys.exit(
+                'bad entry in %s: %s. (expected --shard=i/n, with i from 1 '
+                'to n)' % (ENV_VAR, word)
+            )
+        return number, count
+
 
 def update_class(klass, update):
     '''Copies all class-level attributes from 'update' onto 'klass'.'''
@@ -189,32 +607,155 @@ def update_class(klass, update):
             setattr(klass, attr, value)
 
 
+# True once main() has composed the classes, which only needs doing once per
+# process, however many test runners are created
+composed = False
+
+
 def main():
     '''
     Uses the boolean attributes from Options to decide which mixins to merge
     into our test runner and test result classes.
     '''
+    global composed
+    if composed:
+        return
+    composed = True
+
     options = Options(os.environ.get(ENV_VAR, None))
 
     if options.all_dirs:
+        from .all_dirs_runner import AllDirsTestRunner
         update_class(TestRunner, AllDirsTestRunner)
 
+    if options.static_discovery:
+        from .static_discovery import StaticDiscoveryTestRunner
+        update_class(TestRunner, StaticDiscoveryTestRunner)
+
+    if options.last_failed:
+        from .last_failed import LastFailedTestRunner
+        update_class(TestRunner, LastFailedTestRunner)
+
+    if options.failed_first:
+        TestRunner.failed_first = True
+
+    if options.changed_since:
+        from .affected_tests import ChangedSinceTestRunner
+        ChangedSinceTestRunner.changed_since = options.changed_since
+        update_class(TestRunner, ChangedSinceTestRunner)
+
+    from .compact_result import CompactResultListener, CompactTextTestResult
+    update_class(ComposedTestResult, CompactTextTestResult)
+    ComposedTestResult.listener_classes.append(CompactResultListener)
+
+    from .last_failed import FailureRecordingListener
+    ComposedTestResult.listener_classes.append(FailureRecordingListener)
+
     if options.color:
+        from .colored_runner import (
+            ColoredTextTestResult, ColoredTextTestRunner,
+        )
         update_class(ComposedTestRunner, ColoredTextTestRunner)
         update_class(ComposedTestResult, ColoredTextTestResult)
 
     if options.readable:
+        from .human_readable_result import HumanReadableTextTestResult
         update_class(ComposedTestResult, HumanReadableTextTestResult)
 
     if options.quiet:
+        from .filtered_runner import FilteredStream, FilteredTestRunner
+        FilteredStream.quiet = options.quiet
         update_class(TestRunner, FilteredTestRunner)
 
+    if options.reuse_db:
+        from .reusable_databases import ReusableDatabaseTestRunner
+        update_class(TestRunner, ReusableDatabaseTestRunner)
+
+    if options.cache_fixtures:
+        from django.core.management.commands.loaddata import Command
+        from django.test.testcases import TestCase, TransactionTestCase
+        from .fixture_cache import (
+            ClassFixturesTestCase, EndClassFixturesListener,
+            EndClassFixturesTestCase, FixtureCacheTestRunner,
+            SnapshotLoaddata,
+        )
+        update_class(Command, SnapshotLoaddata)
+        update_class(TestCase, ClassFixturesTestCase)
+        update_class(TransactionTestCase, EndClassFixturesTestCase)
+        update_class(TestRunner, FixtureCacheTestRunner)
+        ComposedTestResult.listener_classes.append(EndClassFixturesListener)
+
     if options.show_skip:
+        from .show_skipped_result import ShowSkippedResult
         update_class(ComposedTestResult, ShowSkippedResult)
 
     if options.code_coverage:
+        from .code_coverage import (
+            CodeCoverageMeasuringTestRunner, CoverageContextListener,
+        )
         update_class(TestRunner, CodeCoverageMeasuringTestRunner)
+        TestRunner.coverage_source = options.coverage_source
+        ComposedTestResult.listener_classes.append(CoverageContextListener)
+
+    if options.footprints:
+        TestRunner.record_footprints = True
+
+    if options.parallel > 1:
+        from .parallel_runner import ParallelTestResult
+        TestRunner.parallel = options.parallel
+        update_class(ComposedTestResult, ParallelTestResult)
+
+    if options.durations:
+        from .durations_result import DurationsListener
+        DurationsListener.count = options.durations
+        ComposedTestResult.listener_classes.append(DurationsListener)
+
+    if options.memory:
+        from . import memory_result
+        if options.memory_trace and memory_result.tracemalloc is None:
+            sys.exit(
+                'bad entry in %s: --memory-trace needs tracemalloc, eg. '
+                "'pip install pytracemalloc'" % (ENV_VAR,)
+            )
+        memory_result.MemoryListener.count = options.memory
+        memory_result.MemoryListener.trace = options.memory_trace
+        ComposedTestResult.listener_classes.append(
+            memory_result.MemoryListener
+        )
 
-
-main()
-
+    if options.shard:
+        TestRunner.shard = options.shard
+        TestRunner.shard_durations = options.shard_durations
+
+    if options.schedule:
+        from .scheduling import DurationHistoryListener
+        TestRunner.schedule = True
+        ComposedTestResult.listener_classes.append(DurationHistoryListener)
+
+    if options.junit_xml or options.jsonl:
+        from .streaming_report import StreamingReportListener
+        StreamingReportListener.junit_xml = options.junit_xml
+        StreamingReportListener.jsonl = options.jsonl
+        ComposedTestResult.listener_classes.append(StreamingReportListener)
+
+    if options.watch:
+        from .watch import WatchTestRunner
+        update_class(TestRunner, WatchTestRunner)
+
+    if options.serve:
+        from .test_server import TestServerRunner
+        update_class(TestRunner, TestServerRunner)
+
+    if options.use_server:
+        from .test_server import TestClientRunner
+        update_class(TestRunner, TestClientRunner)
+
+    # this wraps the methods composed above, so must come last. Its listener
+    # is last too, so that it stops profiling each test before the other
+    # listeners' stopTest, and starts after their startTest
+    if options.profile:
+        from .profiling import ProfilingListener, profile_phases
+        ProfilingListener.directory = options.profile
+        ProfilingListener.per_test = options.profile_tests
+        ComposedTestResult.listener_classes.append(ProfilingListener)
+        profile_phases(TestRunner)
@@ -0,0 +1,24 @@
+'''
+Tests of the test runner's own parts. From the directory containing this
+package's parent, eg. the root of this repository, run them with:
+
+    python -m unittest discover -s src/tests -t .
+
+Django needs to be importable. When these aren't run as part of a project's
+own tests, which have Django's settings already, Django is given just enough
+settings to import the parts of it used here.
+'''
+
+import os
+
+from django.conf import settings
+
+
+if not settings.configured and 'DJANGO_SETTINGS_MODULE' not in os.environ:
+    settings.configure(
+        DATABASES={
+            'default': {
+                'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:',
+            },
+        },
+    )
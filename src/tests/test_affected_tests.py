@@ -0,0 +1,76 @@
+import os
+import shutil
+import subprocess
+import tempfile
+from unittest import TestCase
+
+from ..affected_tests import changed_lines, parse_diff
+
+
+DIFF = '''\
+diff --git a/app/schema.sql b/app/schema.sql
+index 1111111..2222222 100644
+--- a/app/schema.sql
++++ b/app/schema.sql
+@@ -3,2 +3 @@ create table
+--- the old comment
+-select 1;
++select 2;
+@@ -10 +8,0 @@
+-drop table old;
+@@ -20,0 +18,2 @@
++--- a/not/a/header.py
++-- nor this
+diff --git a/app/models.py b/app/models.py
+index 3333333..4444444 100644
+--- a/app/models.py
++++ b/app/models.py
+@@ -7 +7 @@ class Order(Model):
+-    total = 1
+\\ No newline at end of file
++    total = 2
+\\ No newline at end of file
+diff --git a/app/new.py b/app/new.py
+new file mode 100644
+index 0000000..5555555
+--- /dev/null
++++ b/app/new.py
+@@ -0,0 +1 @@
++new = True
+'''
+
+
+class ParseDiffTest(TestCase):
+
+    def test_changed_lines_are_numbered_as_before_the_change(self):
+        changed = parse_diff(DIFF)
+        self.assertEqual(changed['app/models.py'], set([7]))
+
+    def test_removed_lines_which_look_like_headers(self):
+        # a removed '-- comment' line reads as '--- comment'
+        changed = parse_diff(DIFF)
+        self.assertEqual(changed['app/schema.sql'], set([3, 4, 10, 20, 21]))
+
+    def test_new_files_have_no_old_lines(self):
+        self.assertEqual(
+            sorted(parse_diff(DIFF)), ['app/models.py', 'app/schema.sql'],
+        )
+
+
+
+class ChangedLinesTest(TestCase):
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.repo = tempfile.mkdtemp()
+        subprocess.check_call(['git', 'init', '-q', self.repo])
+        os.chdir(self.repo)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.repo)
+
+    def test_bad_revision_exits(self):
+        with self.assertRaises(SystemExit) as context:
+            changed_lines('no-such-revision')
+        self.assertIn('no-such-revision', str(context.exception))
@@ -0,0 +1,175 @@
+import os
+import shutil
+import sys
+import tempfile
+from unittest import TestCase, TestLoader
+
+from .. import cache
+from ..all_dirs_runner import (
+    AllDirsTestRunner, DiscoveryIndex, _file_stamp, _label_matches,
+    _reloaded, _scan_by_import,
+)
+from ..watch import reload_changed
+
+
+TESTS = '''\
+from unittest import TestCase
+
+class OrderTest(TestCase):
+    def test_order(self):
+        pass
+'''
+
+
+class LabelMatchingTest(TestCase):
+
+    NAME = 'shop.orders.tests.OrderTest.test_cancel_order'
+
+    def matches(self, *labels):
+        return _label_matches(self.NAME, list(labels))
+
+    def test_no_labels_match_everything(self):
+        self.assertTrue(self.matches())
+
+    def test_substring(self):
+        self.assertTrue(self.matches('orders.tests'))
+        self.assertFalse(self.matches('orders.*tests.Refund'))
+        # characters special in regexes are matched literally
+        self.assertFalse(self.matches('orders.tests+'))
+
+    def test_glob(self):
+        self.assertTrue(self.matches('shop.*.test_cancel_?rder'))
+        self.assertTrue(self.matches('Order[TX]est'))
+        self.assertFalse(self.matches('Order[!T]est'))
+
+    def test_regex(self):
+        self.assertTrue(self.matches('re:test_(cancel|create)_order$'))
+        self.assertFalse(self.matches('re:^orders'))
+
+    def test_any_label_of_any_kind_matches(self):
+        self.assertTrue(self.matches('Refund', 're:^shop\\.', 'nothing*'))
+        self.assertFalse(self.matches('Refund', 're:^orders', 'nothing*'))
+
+    def test_bad_regex_exits(self):
+        self.assertRaises(SystemExit, self.matches, 're:(unclosed')
+
+
+
+class ProjectTestCase(TestCase):
+    '''
+    Runs each test in a new project directory, importable as package 'shop'
+    '''
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.project = tempfile.mkdtemp()
+        os.chdir(self.project)
+        sys.path.insert(0, self.project)
+        os.mkdir('shop')
+        self.write('shop/__init__.py', '')
+        self.write('shop/tests.py', TESTS)
+
+    def tearDown(self):
+        for modname in ['shop', 'shop.tests']:
+            sys.modules.pop(modname, None)
+            _reloaded.pop(modname, None)
+        sys.path.remove(self.project)
+        os.chdir(self.cwd)
+        shutil.rmtree(self.project)
+
+    def write(self, fname, text):
+        with open(fname, 'w') as stream:
+            stream.write(text)
+        # pyc files from modules written in the same second would be reused
+        if os.path.exists(fname + 'c'):
+            os.remove(fname + 'c')
+
+
+
+class BuildSuiteTest(ProjectTestCase):
+
+    def test_labels_select_test_methods(self):
+        self.write('shop/tests.py', TESTS + (
+            '    def test_refund(self):\n'
+            '        pass\n'
+        ))
+        suite = AllDirsTestRunner().build_suite(['re:OrderTest.test_ref'])
+        self.assertEqual(
+            [test.id() for test in suite],
+            ['shop.tests.OrderTest.test_refund'],
+        )
+
+    def test_unchanged_modules_are_not_imported_again(self):
+        AllDirsTestRunner().build_suite(['NoSuchTest'])
+        self.assertIn('shop/tests.py', cache.load('discovery_index.json'))
+        del sys.modules['shop.tests']
+        AllDirsTestRunner().build_suite(['NoSuchTest'])
+        self.assertFalse('shop.tests' in sys.modules)
+
+
+
+class DiscoveryIndexTest(ProjectTestCase):
+
+    def test_fresh_until_module_changes(self):
+        index = DiscoveryIndex('index.json')
+        index.update('shop/tests.py', {'OrderTest': ['test_order']}, {
+            'shop/tests.py': _file_stamp('shop/tests.py'),
+        })
+        self.assertTrue(index.is_fresh('shop/tests.py'))
+        self.write('shop/tests.py', TESTS + '\n# changed\n')
+        self.assertFalse(index.is_fresh('shop/tests.py'))
+
+    def test_deleted_dependency_is_not_fresh(self):
+        self.write('shop/base.py', '')
+        index = DiscoveryIndex('index.json')
+        index.update('shop/tests.py', {}, {
+            'shop/tests.py': _file_stamp('shop/tests.py'),
+            'shop/base.py': _file_stamp('shop/base.py'),
+        })
+        os.remove('shop/base.py')
+        self.assertFalse(index.is_fresh('shop/tests.py'))
+
+    def test_saves_only_modules_still_present(self):
+        index = DiscoveryIndex('index.json')
+        stamp = _file_stamp('shop/tests.py')
+        index.update('shop/tests.py', {}, {'shop/tests.py': stamp})
+        index.update('shop/gone.py', {}, {'shop/gone.py': stamp})
+        index.save(['shop/tests.py'])
+        self.assertEqual(sorted(cache.load('index.json')), ['shop/tests.py'])
+
+
+
+class ScanByImportTest(ProjectTestCase):
+
+    def test_scan_of_new_import_is_trusted(self):
+        classes, depends = _scan_by_import('shop/tests.py', TestLoader())
+        self.assertEqual(classes, {'OrderTest': ['test_order']})
+        self.assertEqual(
+            depends, {'shop/tests.py': _file_stamp('shop/tests.py')},
+        )
+
+    def test_scan_of_stale_module_is_not_kept(self):
+        # eg. a test server's child, whose module was imported at start up
+        __import__('shop.tests')
+        self.write('shop/tests.py', TESTS + (
+            '    def test_refund(self):\n'
+            '        pass\n'
+        ))
+        classes, depends = _scan_by_import('shop/tests.py', TestLoader())
+        self.assertEqual(classes, {'OrderTest': ['test_order']})
+        self.assertEqual(depends, {'shop/tests.py': None})
+
+        index = DiscoveryIndex('index.json')
+        index.update('shop/tests.py', classes, depends)
+        self.assertFalse(index.is_fresh('shop/tests.py'))
+        index.save(['shop/tests.py'])
+        self.assertEqual(cache.load('index.json'), {})
+
+    def test_scan_after_reload_is_trusted(self):
+        __import__('shop.tests')
+        self.write('shop/tests.py', TESTS + '\n# changed\n')
+        reload_changed(['shop/tests.py'])
+        _, depends = _scan_by_import('shop/tests.py', TestLoader())
+        self.assertEqual(
+            depends, {'shop/tests.py': _file_stamp('shop/tests.py')},
+        )
@@ -0,0 +1,32 @@
+import os
+from os.path import dirname, join, relpath
+from unittest import TestCase
+
+from .. import benchmark
+from ..all_dirs_runner import _get_testcases
+from ..static_discovery import StaticScanner
+
+
+class BenchmarkTest(TestCase):
+    '''
+    The runner lives inside the project, so its modules are searched for
+    tests along with the project's own
+    '''
+
+    def test_no_tests_found_by_import(self):
+        self.assertEqual(list(_get_testcases(benchmark)), [])
+
+    def test_no_tests_found_by_parsing(self):
+        fname = benchmark.__file__.replace('.pyc', '.py')
+        package = benchmark.__name__.rpartition('.')[0]
+        top = join(dirname(fname), *['..'] * (package.count('.') + 1))
+        cwd = os.getcwd()
+        os.chdir(top)
+        try:
+            classes, _ = StaticScanner('test').scan(relpath(fname))
+        finally:
+            os.chdir(cwd)
+        self.assertEqual(classes, {})
+
+    def test_dispatch(self):
+        self.assertTrue(benchmark.bench_dispatch(None, [], tests=5) > 0)
@@ -0,0 +1,100 @@
+import os
+from os.path import dirname, join
+import shutil
+import tempfile
+from unittest import TestCase, skipIf
+
+try:
+    from .. import code_coverage
+except ImportError:
+    # coverage is only needed by '--coverage'
+    code_coverage = None
+
+
+PROJECT = [
+    'manage.py',
+    'settings.py',
+    'shop/__init__.py',
+    'shop/models.py',
+    'shop/tests.py',
+    'shop/test_views.py',
+    'shop/views/__init__.py',
+    'shop/views/orders.py',
+    'shop/migrations/__init__.py',
+    'shop/migrations/0001_initial.py',
+    'tests/__init__.py',
+    'tests/test_checkout.py',
+    'tests/utils/__init__.py',
+    'tests/utils/testrunner.py',
+    '.git/hooks/pre-commit.py',
+]
+
+
+@skipIf(code_coverage is None, 'needs coverage')
+class ProjectSourcesTest(TestCase):
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.project = tempfile.mkdtemp()
+        os.chdir(self.project)
+        for fname in PROJECT:
+            if not os.path.isdir(dirname(fname) or '.'):
+                os.makedirs(dirname(fname))
+            open(fname, 'w').close()
+        self.runner_dir = code_coverage.RUNNER_DIR
+        code_coverage.RUNNER_DIR = join(self.project, 'tests', 'utils')
+
+    def tearDown(self):
+        code_coverage.RUNNER_DIR = self.runner_dir
+        os.chdir(self.cwd)
+        shutil.rmtree(self.project)
+
+    def test_tests_migrations_and_runner_left_out(self):
+        self.assertEqual(code_coverage.project_sources(), [
+            'manage', 'settings', 'shop.models', 'shop/views',
+        ])
+
+    def test_tests_included_for_footprints(self):
+        self.assertEqual(code_coverage.project_sources(include_tests=True), [
+            'manage', 'settings', 'shop', 'tests.test_checkout',
+        ])
+
+    def test_whole_project(self):
+        shutil.rmtree('tests')
+        self.assertEqual(
+            code_coverage.project_sources(include_tests=True), [os.getcwd()],
+        )
+
+
+
+@skipIf(code_coverage is None, 'needs coverage')
+class CombineDataFilesTest(TestCase):
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.directory = tempfile.mkdtemp()
+        os.chdir(self.directory)
+        self.source = join(self.directory, 'shop.py')
+        self.args = dict(data_file=join(self.directory, '.coverage'))
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.directory)
+
+    def write_worker_data(self, number, lines):
+        data = code_coverage.CoverageData(
+            '%s.worker%d' % (self.args['data_file'], number)
+        )
+        data.set_context('test_%d' % (number,))
+        data.add_lines({self.source: lines})
+        data.write()
+
+    def test_workers_data_is_merged(self):
+        for number in range(5):
+            self.write_worker_data(number, [number + 1, 10])
+        data = code_coverage.combine_data_files(self.args, 2).get_data()
+        self.assertEqual(sorted(data.lines(self.source)), [1, 2, 3, 4, 5, 10])
+        self.assertEqual(
+            data.measured_contexts(), set('test_%d' % n for n in range(5)),
+        )
+        self.assertEqual(os.listdir('.'), ['.coverage'])
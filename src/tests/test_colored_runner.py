@@ -0,0 +1,52 @@
+from unittest import TestCase, TestSuite
+
+from ..colored_runner import ColoredTextTestRunner, ConsoleStream
+from .test_filtered_runner import Terminal
+
+
+class ConsoleStreamTest(TestCase):
+
+    def test_dots_are_batched(self):
+        terminal = Terminal()
+        stream = ConsoleStream(terminal, batch=True)
+        stream.flush_all()
+        stream.write('.')
+        stream.flush()
+        self.assertEqual(terminal.shown, '')
+        stream.flush_all()
+        self.assertEqual(terminal.shown, '.')
+
+    def test_unbatched_output_is_flushed_at_once(self):
+        terminal = Terminal()
+        stream = ConsoleStream(terminal, batch=False)
+        stream.write('test_slow (app.tests.SlowTest) ... ')
+        stream.flush()
+        self.assertEqual(terminal.shown, 'test_slow (app.tests.SlowTest) ... ')
+
+
+
+class ColoredTextTestRunnerTest(TestCase):
+
+    def run_watched(self, verbosity):
+        terminal = Terminal()
+        shown = []
+
+        class WatchedTest(TestCase):
+            def runTest(self):
+                shown.append(terminal.shown)
+
+        ColoredTextTestRunner(stream=terminal, verbosity=verbosity).run(
+            TestSuite([WatchedTest(), WatchedTest()]),
+        )
+        return shown, terminal
+
+    def test_running_test_is_shown_when_verbose(self):
+        shown, _ = self.run_watched(verbosity=2)
+        name = 'runTest (%s.WatchedTest) ... ' % (__name__,)
+        self.assertEqual(shown[0], name)
+        self.assertEqual(shown[1], name + 'ok\n' + name)
+
+    def test_everything_is_shown_at_the_end(self):
+        _, terminal = self.run_watched(verbosity=1)
+        self.assertEqual(terminal.unflushed, '')
+        self.assertTrue(terminal.shown.startswith('..\n'))
@@ -0,0 +1,54 @@
+from unittest import TestCase, TestResult
+
+from ..compact_result import (
+    CompactResultListener, CompactTest, TracebackStore,
+)
+
+
+class TracebackStoreTest(TestCase):
+
+    def test_text_past_the_limit_is_spilled_to_disk(self):
+        store = TracebackStore(10)
+        texts = ['first', 'second', u'caf\xe9 au lait', 'last one']
+        keys = [store.add(text) for text in texts]
+        self.assertEqual(keys[0], 'first')
+        self.assertTrue(all(isinstance(key, tuple) for key in keys[1:]))
+        self.assertEqual(store.size, 5)
+        # read back in any order, keeping their type
+        for index in [3, 1, 2, 0]:
+            text = store.get(keys[index])
+            self.assertEqual(text, texts[index])
+            self.assertEqual(type(text), type(texts[index]))
+
+    def test_nothing_spilled_within_the_limit(self):
+        store = TracebackStore(100)
+        self.assertEqual(store.add('short'), 'short')
+        self.assertEqual(store.spill, None)
+
+    def test_reasons_are_interned(self):
+        store = TracebackStore(0)
+        reason = store.intern(''.join(['needs ', 'postgres']))
+        self.assertIs(store.intern('needs postgres'), reason)
+
+
+
+class CompactResultListenerTest(TestCase):
+
+    def test_results_keep_compact_records(self):
+        result = TestResult()
+        result.getDescription = str
+        listener = CompactResultListener(result)
+        listener.memory_limit = 0
+        listener.startTestRun()
+
+        listener.startTest(self)
+        result.failures.append((self, 'Traceback: broken'))
+        result.skipped.append((self, 'not today'))
+        listener.stopTest(self)
+
+        [(test, text)] = list(result.failures)
+        self.assertTrue(isinstance(test, CompactTest))
+        self.assertEqual(test.id(), self.id())
+        self.assertEqual(text, 'Traceback: broken')
+        self.assertEqual(list(result.skipped)[0][1], 'not today')
+        self.assertEqual(len(result.failures), 1)
@@ -0,0 +1,37 @@
+import sys
+import time
+from unittest import TestCase, skipUnless
+
+from ..durations_result import (
+    DurationsListener, _monotonic_clock, _never_backwards, wall_clock,
+)
+
+
+class ClockTest(TestCase):
+
+    @skipUnless(sys.platform.startswith('linux'), 'needs clock_gettime')
+    def test_monotonic_clock_is_used(self):
+        monotonic = _monotonic_clock()
+        self.assertNotEqual(monotonic, None)
+        self.assertIsNot(wall_clock, time.time)
+        before = monotonic()
+        self.assertTrue(monotonic() >= before)
+
+    def test_fallback_never_goes_backwards(self):
+        readings = iter([100.0, 101.0, 40.0, 41.0])
+        clock = _never_backwards(lambda: next(readings))
+        self.assertEqual([clock(), clock(), clock()], [101.0, 101.0, 101.0])
+
+
+
+class DurationsListenerTest(TestCase):
+
+    def test_records_test_and_class_durations(self):
+        listener = DurationsListener(None)
+        listener.startTest(self)
+        listener.stopTest(self)
+        wall, cpu = listener.durations[self.id()]
+        self.assertTrue(wall >= 0 and cpu >= 0)
+        self.assertEqual(
+            list(listener.class_durations), [self.id().rpartition('.')[0]],
+        )
@@ -0,0 +1,71 @@
+import sys
+from unittest import TestCase
+
+from ..filtered_runner import FilteredStream
+
+
+class Terminal(object):
+    '''
+    Stands in for stdout, keeping what has been flushed as 'shown'
+    '''
+
+    def __init__(self):
+        self.unflushed = ''
+        self.shown = ''
+
+    def write(self, text):
+        self.unflushed += text
+
+    def flush(self):
+        self.shown += self.unflushed
+        self.unflushed = ''
+
+
+
+class Keyboard(object):
+    '''
+    Stands in for stdin, typing 'yes', and noting what was shown beforehand
+    '''
+
+    def __init__(self, terminal):
+        self.terminal = terminal
+        self.shown_before_reading = None
+
+    def readline(self, *args):
+        self.shown_before_reading = self.terminal.shown
+        return 'yes\n'
+
+
+
+class FilteredStreamTest(TestCase):
+
+    def setUp(self):
+        self.quiet = FilteredStream.quiet
+        FilteredStream.quiet = 3
+        self.terminal = Terminal()
+        self.stream = FilteredStream(self.terminal)
+
+    def tearDown(self):
+        FilteredStream.quiet = self.quiet
+
+    def test_filtered_lines_are_dropped_with_their_newline(self):
+        for text in ['Creating table shop_item', '\n', 'Unfiltered', '\n']:
+            self.stream.write(text)
+        self.assertEqual(self.terminal.shown, 'Unfiltered\n')
+
+    def test_partial_lines_are_shown_at_once(self):
+        self.stream.write('Installing fixtures... ')
+        self.assertEqual(self.terminal.shown, 'Installing fixtures... ')
+
+    def test_prompt_is_shown_before_waiting_for_an_answer(self):
+        keyboard = Keyboard(self.terminal)
+        stdin, stdout = sys.stdin, sys.stdout
+        sys.stdin, sys.stdout = keyboard, self.stream
+        try:
+            answer = raw_input("Type 'yes' to delete it: ")
+        finally:
+            sys.stdin, sys.stdout = stdin, stdout
+        self.assertEqual(answer, 'yes')
+        self.assertEqual(
+            keyboard.shown_before_reading, "Type 'yes' to delete it: ",
+        )
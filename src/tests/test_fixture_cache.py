@@ -0,0 +1,32 @@
+from unittest import TestCase
+
+from .. import fixture_cache
+from ..fixture_cache import EndClassFixturesListener
+
+
+class ShopTest(TestCase):
+    def test_shop(self): pass
+
+
+class PlainTest(TestCase):
+    def test_plain(self): pass
+
+
+
+class EndClassFixturesListenerTest(TestCase):
+
+    def setUp(self):
+        # as if ShopTest's fixtures were loaded, into no databases
+        fixture_cache._loaded = (ShopTest, [])
+        self.listener = EndClassFixturesListener(None)
+
+    def tearDown(self):
+        fixture_cache._loaded = None
+
+    def test_kept_for_the_same_class(self):
+        self.listener.startTest(ShopTest('test_shop'))
+        self.assertEqual(fixture_cache._loaded, (ShopTest, []))
+
+    def test_ended_when_another_class_starts(self):
+        self.listener.startTest(PlainTest('test_plain'))
+        self.assertEqual(fixture_cache._loaded, None)
@@ -0,0 +1,91 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase, TestResult, TestSuite
+
+from .. import cache
+from ..last_failed import (
+    FAILED_NAME, FailureRecordingListener, LastFailedTestRunner,
+    failed_first, has_failed,
+)
+
+
+class Passing(TestCase):
+    def test_a(self): pass
+    def test_b(self): pass
+
+
+class Failing(TestCase):
+    def test_c(self): pass
+    def test_d(self): pass
+
+
+
+class CacheTestCase(TestCase):
+    '''
+    Runs each test in a new directory, so it has its own cache
+    '''
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.directory = tempfile.mkdtemp()
+        os.chdir(self.directory)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.directory)
+
+
+
+class FailedFirstTest(TestCase):
+
+    def test_failed_tests_and_their_classes_first(self):
+        a, b = Passing('test_a'), Passing('test_b')
+        c, d = Failing('test_c'), Failing('test_d')
+        ordered = failed_first(TestSuite([a, b, c, d]), set([d.id()]))
+        self.assertEqual(list(ordered), [d, c, a, b])
+
+    def test_failures_of_a_class_or_module_match_its_tests(self):
+        test_id = Failing('test_c').id()
+        module, klass = test_id.rpartition('.')[0].rpartition('.')[::2]
+        self.assertTrue(has_failed(test_id, set([module + '.' + klass])))
+        self.assertTrue(has_failed(test_id, set([module])))
+        self.assertFalse(has_failed(test_id, set([module + '.Other'])))
+
+
+
+class FailureRecordingListenerTest(CacheTestCase):
+
+    def record(self, *tests):
+        result = TestResult()
+        listener = FailureRecordingListener(result)
+        for test in tests:
+            listener.startTest(test)
+            test.run(result)
+        listener.stopTestRun()
+        return cache.load(FAILED_NAME)
+
+    def test_failures_are_remembered_until_run_again(self):
+        failing = Failing('test_c')
+        failing.test_c = lambda: failing.fail('broken')
+        self.assertEqual(self.record(failing), [failing.id()])
+        # kept while the test isn't run, forgotten once it passes
+        self.assertEqual(self.record(Passing('test_a')), [failing.id()])
+        self.assertEqual(self.record(Failing('test_c')), [])
+
+
+
+class LastFailedTestRunnerTest(CacheTestCase):
+
+    def test_only_failed_tests_match(self):
+        cache.save(FAILED_NAME, [Failing('test_c').id()])
+        runner = LastFailedTestRunner()
+        labels = runner._select_labels([])
+        self.assertEqual(labels, [Failing('test_c').id()])
+        self.assertTrue(runner._test_matches(Failing('test_c').id(), labels))
+        self.assertFalse(runner._test_matches(Failing('test_d').id(), labels))
+
+    def test_everything_matches_when_nothing_failed(self):
+        runner = LastFailedTestRunner()
+        self.assertEqual(runner._select_labels([]), [])
+        self.assertTrue(runner._test_matches(Passing('test_a').id(), []))
@@ -0,0 +1,70 @@
+from StringIO import StringIO
+from unittest import TestCase, TextTestResult
+from unittest.runner import _WritelnDecorator
+
+from .. import memory_result
+from ..memory_result import MemoryListener, format_size
+
+
+# kept alive, so the growth is still there after collecting garbage
+kept = []
+
+
+def make_test(name):
+    # defined here, so it isn't found as one of these tests
+    return type('MemoryTest', (TestCase,), dict(
+        test_small=lambda self: None, test_large=lambda self: None,
+    ))(name)
+
+
+
+class MemoryListenerTest(TestCase):
+
+    def setUp(self):
+        self.stream = StringIO()
+        result = TextTestResult(_WritelnDecorator(self.stream), False, 1)
+        self.listener = MemoryListener(result)
+
+    def run_test(self, test, before, after):
+        readings = iter([before, after])
+        current_rss = memory_result.current_rss
+        memory_result.current_rss = lambda: next(readings)
+        try:
+            self.listener.startTest(test)
+            self.listener.stopTest(test)
+        finally:
+            memory_result.current_rss = current_rss
+
+    def test_what_a_test_keeps_is_measured(self):
+        test = make_test('test_large')
+        self.listener.startTest(test)
+        kept.append(bytearray(32 * 1024 * 1024))
+        try:
+            self.listener.stopTest(test)
+        finally:
+            del kept[:]
+        [(growth, test_id, _)] = self.listener.largest
+        self.assertEqual(test_id, test.id())
+        self.assertTrue(growth >= 16 * 1024 * 1024)
+
+    def test_largest_growth_is_reported_first(self):
+        small, large = make_test('test_small'), make_test('test_large')
+        self.run_test(small, 1000, 3048)
+        self.run_test(large, 1000, 5 * 1024 * 1024)
+        self.listener.printReport(self.listener.result.stream)
+        lines = self.stream.getvalue().splitlines()
+        self.assertEqual(lines[1:4], [
+            'MEMORY: +5.0MB %s' % (large.id(),),
+            'MEMORY: +2.0KB %s' % (small.id(),),
+            'MEMORY CLASS: +5.0MB %s' % (large.id().rpartition('.')[0],),
+        ])
+
+    def test_tests_which_shrink_are_not_reported(self):
+        self.run_test(make_test('test_small'), 3048, 1000)
+        self.assertEqual(self.listener.largest, [])
+
+    def test_format_size(self):
+        self.assertEqual(
+            [format_size(size) for size in [512, -2048, 3 * 1024 ** 3]],
+            ['+512.0B', '-2.0KB', '+3.0GB'],
+        )
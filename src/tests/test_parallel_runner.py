@@ -0,0 +1,94 @@
+import os
+import shutil
+import sys
+import tempfile
+from unittest import TestCase, TestLoader, TestResult, TestSuite
+
+from ..parallel_runner import ParallelTestSuite
+
+
+# a module of tests, which notes each time its fixtures run
+FIXTURES = '''\
+import os
+from unittest import TestCase
+
+def note(text):
+    with open(os.environ['FIXTURE_LOG'], 'a') as stream:
+        stream.write('%%d %%s\\n' %% (os.getpid(), text))
+
+def setUpModule():
+    note('setUpModule')
+
+def tearDownModule():
+    note('tearDownModule')
+
+%s
+'''
+
+CLASS = '''
+class Fixture%dTest(TestCase):
+    def test_one(self):
+        pass
+    def test_two(self):
+        pass
+'''
+
+CRASH = '''
+class CrashTest(TestCase):
+    def test_crash(self):
+        os._exit(3)
+'''
+
+
+
+class ParallelTestSuiteTest(TestCase):
+
+    def setUp(self):
+        self.project = tempfile.mkdtemp()
+        sys.path.insert(0, self.project)
+        self.log = os.path.join(self.project, 'fixtures.log')
+        os.environ['FIXTURE_LOG'] = self.log
+
+    def tearDown(self):
+        del os.environ['FIXTURE_LOG']
+        sys.modules.pop('parallel_fixtures', None)
+        sys.path.remove(self.project)
+        shutil.rmtree(self.project)
+
+    def run_module(self, classes, processes):
+        fname = os.path.join(self.project, 'parallel_fixtures.py')
+        with open(fname, 'w') as stream:
+            stream.write(FIXTURES % (classes,))
+        __import__('parallel_fixtures')
+        suite = TestLoader().loadTestsFromModule(
+            sys.modules['parallel_fixtures']
+        )
+        result = TestResult()
+        ParallelTestSuite(TestSuite(suite), processes, verbosity=0).run(result)
+        return result
+
+    def fixture_calls(self):
+        calls = {}
+        with open(self.log) as stream:
+            for line in stream:
+                pid, text = line.split()
+                calls.setdefault(pid, []).append(text)
+        return calls
+
+    def test_module_fixtures_run_once_per_worker(self):
+        classes = ''.join(CLASS % number for number in range(4))
+        for processes in [1, 2]:
+            open(self.log, 'w').close()
+            result = self.run_module(classes, processes)
+            self.assertEqual(result.testsRun, 8)
+            self.assertTrue(result.wasSuccessful())
+            for calls in self.fixture_calls().values():
+                self.assertEqual(calls, ['setUpModule', 'tearDownModule'])
+
+    def test_crashed_worker_reports_its_tests(self):
+        result = self.run_module(CRASH + CLASS % 0, 1)
+        self.assertEqual(result.testsRun, 3)
+        self.assertEqual(len(result.errors), 3)
+        messages = [text for _, text in result.errors]
+        self.assertIn('died with exit code 3', messages[0])
+        self.assertIn('not run', messages[-1])
@@ -0,0 +1,80 @@
+import pstats
+import shutil
+import tempfile
+from os.path import exists, join
+from unittest import TestCase
+
+from ..listening_result import ListeningResult, ResultListener
+from ..profiling import ProfilingListener, TESTS, UNSAFE, profile_path
+
+
+def listener_start():
+    pass
+
+
+def listener_stop():
+    pass
+
+
+def in_test():
+    pass
+
+
+class BusyListener(ResultListener):
+    '''
+    Does some work of its own as each test starts and stops
+    '''
+
+    def startTest(self, test):
+        listener_start()
+
+    def stopTest(self, test):
+        listener_stop()
+
+
+def make_test():
+    # defined here, so it isn't found as one of these tests
+    return type('ProfiledTest', (TestCase,), dict(
+        test_it=lambda self: in_test(),
+    ))('test_it')
+
+
+def profiled_functions(path):
+    return set(name for _, _, name in pstats.Stats(path).stats)
+
+
+
+class ProfilingListenerTest(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.old = ProfilingListener.directory, ProfilingListener.per_test
+        ProfilingListener.directory = self.directory
+
+    def tearDown(self):
+        ProfilingListener.directory, ProfilingListener.per_test = self.old
+        shutil.rmtree(self.directory)
+
+    def run_test(self):
+        result = type('Result', (ListeningResult,), dict(
+            listener_classes=[BusyListener, ProfilingListener],
+        ))()
+        result.startTestRun()
+        make_test().run(result)
+        result.stopTestRun()
+
+    def test_other_listeners_work_is_not_profiled(self):
+        self.run_test()
+        functions = profiled_functions(profile_path(self.directory, TESTS))
+        self.assertIn('in_test', functions)
+        self.assertNotIn('listener_start', functions)
+        self.assertNotIn('listener_stop', functions)
+
+    def test_each_tests_profile_is_saved(self):
+        ProfilingListener.per_test = True
+        self.run_test()
+        path = profile_path(
+            join(self.directory, TESTS), UNSAFE.sub('_', make_test().id()),
+        )
+        self.assertTrue(exists(profile_path(self.directory, TESTS)))
+        self.assertIn('in_test', profiled_functions(path))
@@ -0,0 +1,115 @@
+import gc
+import os
+import subprocess
+import sys
+from unittest import TestCase, TestResult, TestSuite
+import weakref
+
+from ..releasing_suite import (
+    ReleasingTestSuite, flatten, group_by_class, group_indexes_by_class,
+)
+
+
+class First(TestCase):
+    def test_a(self): pass
+    def test_b(self): pass
+
+
+class Second(TestCase):
+    def test_c(self): pass
+
+
+
+class GroupingTest(TestCase):
+
+    def setUp(self):
+        self.a, self.b = First('test_a'), First('test_b')
+        self.c = Second('test_c')
+        self.tests = [self.a, self.c, self.b]
+
+    def test_flatten(self):
+        suite = TestSuite([self.a, TestSuite([self.c, TestSuite([self.b])])])
+        self.assertEqual(list(flatten(suite)), self.tests)
+
+    def test_group_by_class(self):
+        groups = group_by_class(self.tests)
+        self.assertEqual(list(groups), [First, Second])
+        self.assertEqual(groups[First], [self.a, self.b])
+
+    def test_group_indexes_by_class(self):
+        self.assertEqual(group_indexes_by_class(self.tests), [[0, 2], [1]])
+
+    def test_reordering_does_not_import_the_parallel_runner(self):
+        package = __name__.rpartition('.tests.')[0]
+        top = os.path.join(os.path.dirname(__file__), '..', '..')
+        top = os.path.join(top, *['..'] * package.count('.'))
+        code = (
+            'import sys; import %(package)s.scheduling; '
+            'sys.exit("%(package)s.parallel_runner" in sys.modules)'
+        ) % {'package': package}
+        self.assertEqual(
+            subprocess.call([sys.executable, '-c', code], cwd=top), 0,
+        )
+
+
+
+def make_classes(ran):
+    '''
+    Return two TestCase classes, the first of which adds an attribute in
+    setUpClass, and both of which note in 'ran' what each test could see.
+    Defined here, so they aren't found as tests themselves.
+    '''
+    def setUpClass(cls):
+        cls.shared = object()
+
+    def test(self):
+        ran.append((self.id(), hasattr(type(self), 'shared')))
+
+    def failing(self):
+        self.fail('fails')
+
+    return (
+        type('WithSetUpClass', (TestCase,), dict(
+            setUpClass=classmethod(setUpClass), test_a=test, test_b=test,
+        )),
+        type('Plain', (TestCase,), dict(test_c=test, test_d=failing)),
+    )
+
+
+
+class ReleasingTestSuiteTest(TestCase):
+
+    def setUp(self):
+        self.ran = []
+        self.first, self.second = make_classes(self.ran)
+        self.tests = [
+            self.first('test_a'), self.first('test_b'),
+            self.second('test_c'), self.second('test_d'),
+        ]
+
+    def test_tests_are_released_as_they_run(self):
+        # the failing test is kept by the result, so is left out
+        suite = ReleasingTestSuite(TestSuite([
+            TestSuite(self.tests[:2]), TestSuite(self.tests[2:3]),
+        ]))
+        refs = map(weakref.ref, self.tests[:3])
+        del self.tests
+        suite.run(TestResult())
+        gc.collect()
+        self.assertEqual([ref() for ref in refs], [None] * 3)
+        self.assertEqual(list(suite), [])
+
+    def test_class_attributes_are_removed_after_its_tests(self):
+        ReleasingTestSuite(self.tests).run(TestResult())
+        self.assertEqual(
+            [shared for _, shared in self.ran], [True, True, False],
+        )
+        self.assertFalse(hasattr(self.first, 'shared'))
+
+    def test_unrun_tests_are_kept_after_failfast(self):
+        result = TestResult()
+        result.failfast = True
+        tests = [self.second('test_d'), self.second('test_c')]
+        suite = ReleasingTestSuite(tests)
+        suite.run(result)
+        self.assertEqual(list(suite), tests[1:])
@@ -0,0 +1,60 @@
+import os
+import shutil
+import sys
+import tempfile
+from unittest import TestCase
+
+from django.conf import settings
+from django.db import connections
+
+from .. import reusable_databases
+
+
+class SchemaFingerprintTest(TestCase):
+
+    def setUp(self):
+        self.project = tempfile.mkdtemp()
+        sys.path.insert(0, self.project)
+        self.installed_apps = settings.INSTALLED_APPS
+        settings.INSTALLED_APPS = ['shop']
+        os.makedirs(os.path.join(self.project, 'shop', 'fixtures'))
+        self.write('shop/__init__.py', '')
+        self.write('shop/models.py', 'class Item(Model): pass\n')
+        self.write('shop/fixtures/items.json', '[]')
+
+    def tearDown(self):
+        settings.INSTALLED_APPS = self.installed_apps
+        sys.modules.pop('shop', None)
+        sys.path.remove(self.project)
+        shutil.rmtree(self.project)
+        reusable_databases._files_digest = None
+
+    def write(self, fname, text):
+        with open(os.path.join(self.project, fname), 'w') as stream:
+            stream.write(text)
+
+    def fingerprint(self):
+        # the files are only read once per run
+        reusable_databases._files_digest = None
+        return reusable_databases.schema_fingerprint(connections['default'])
+
+    def test_unchanged(self):
+        self.assertEqual(self.fingerprint(), self.fingerprint())
+
+    def test_changes_with_models(self):
+        before = self.fingerprint()
+        self.write('shop/models.py', 'class Item(Model): price = 1\n')
+        self.assertNotEqual(self.fingerprint(), before)
+
+    def test_changes_with_fixtures(self):
+        before = self.fingerprint()
+        self.write('shop/fixtures/items.json', '[{}]')
+        self.assertNotEqual(self.fingerprint(), before)
+        self.write('shop/fixtures/more.json', '[]')
+        self.assertNotEqual(self.fingerprint(), before)
+
+    def test_other_files_are_ignored(self):
+        before = self.fingerprint()
+        self.write('shop/views.py', 'def index(request): pass\n')
+        self.write('shop/fixtures/items.pyc', 'compiled')
+        self.assertEqual(self.fingerprint(), before)
@@ -0,0 +1,56 @@
+from unittest import TestCase, TestSuite
+
+from ..scheduling import _estimator, schedule_suite
+
+
+def make_class(name, count):
+    methods = dict(
+        ('test_%d' % number, lambda self: None) for number in range(count)
+    )
+    klass = type(name, (TestCase,), methods)
+    return [klass(method) for method in sorted(methods)]
+
+
+def class_order(suite):
+    order = []
+    for test in suite:
+        if type(test).__name__ not in order:
+            order.append(type(test).__name__)
+    return order
+
+
+
+class ScheduleSuiteTest(TestCase):
+
+    def setUp(self):
+        self.quick = make_class('QuickTest', 3)
+        self.slow = make_class('SlowTest', 2)
+        self.new = make_class('NewTest', 1)
+        self.suite = TestSuite(self.quick + self.slow + self.new)
+
+    def test_longest_classes_first(self):
+        history = dict((test.id(), 0.1) for test in self.quick)
+        history.update((test.id(), 5.0) for test in self.slow)
+        self.assertEqual(
+            class_order(schedule_suite(self.suite, history)),
+            ['SlowTest', 'NewTest', 'QuickTest'],
+        )
+
+    def test_tests_of_a_class_keep_their_order(self):
+        history = dict((test.id(), 1.0) for test in self.quick)
+        history[self.quick[2].id()] = 9.0
+        scheduled = list(schedule_suite(self.suite, history))
+        self.assertEqual(scheduled[:3], self.quick)
+
+    def test_unknown_tests_take_the_average(self):
+        history = {self.quick[0].id(): 1.0, self.slow[0].id(): 3.0}
+        estimate = _estimator(history)
+        self.assertEqual(estimate(self.new[0]), 2.0)
+        self.assertEqual(estimate(self.slow[0]), 3.0)
+
+    def test_without_history_classes_with_most_tests_first(self):
+        # every test is assumed to take the same time
+        self.assertEqual(
+            class_order(schedule_suite(self.suite, {})),
+            ['QuickTest', 'SlowTest', 'NewTest'],
+        )
@@ -0,0 +1,99 @@
+from unittest import TestCase
+
+from ..sharding import select_shard
+from ..testrunner import Options
+
+
+def make_tests():
+    '''
+    Return tests of several classes, of differing sizes
+    '''
+    tests = []
+    for number in range(7):
+        methods = dict(
+            ('test_%d' % method, lambda self: None)
+            for method in range(number + 1)
+        )
+        klass = type('Shard%dTest' % number, (TestCase,), methods)
+        tests.extend(klass(name) for name in sorted(methods))
+    return tests
+
+
+def shard_ids(tests, count, history=None):
+    return [
+        [test.id() for test in select_shard(
+            tests, (number, count), history, verbosity=0,
+        )]
+        for number in range(1, count + 1)
+    ]
+
+
+
+class SelectShardTest(TestCase):
+
+    def setUp(self):
+        self.tests = make_tests()
+        self.ids = [test.id() for test in self.tests]
+        self.history = dict(
+            (test_id, 0.5 if 'Shard1Test' in test_id else 0.01)
+            for test_id in self.ids
+        )
+
+    def test_every_test_is_in_exactly_one_shard(self):
+        for history in [None, self.history]:
+            shards = shard_ids(self.tests, 3, history)
+            self.assertEqual(sorted(sum(shards, [])), sorted(self.ids))
+            self.assertTrue(all(shards))
+
+    def test_classes_are_not_split(self):
+        for history in [None, self.history]:
+            owners = {}
+            for number, ids in enumerate(shard_ids(self.tests, 3, history)):
+                for test_id in ids:
+                    klass = test_id.rpartition('.')[0]
+                    self.assertEqual(owners.setdefault(klass, number), number)
+
+    def test_tests_keep_their_order(self):
+        for ids in shard_ids(self.tests, 3):
+            self.assertEqual(ids, sorted(ids, key=self.ids.index))
+
+    def test_same_shards_whatever_the_order_of_the_tests(self):
+        for history in [None, self.history]:
+            forwards = shard_ids(self.tests, 3, history)
+            backwards = shard_ids(self.tests[::-1], 3, history)
+            self.assertEqual(
+                [sorted(ids) for ids in forwards],
+                [sorted(ids) for ids in backwards],
+            )
+
+    def test_tests_missing_from_history(self):
+        partial = dict(list(self.history.items())[:5])
+        shards = shard_ids(self.tests, 3, partial)
+        self.assertEqual(sorted(sum(shards, [])), sorted(self.ids))
+        self.assertEqual(
+            [sorted(ids) for ids in shards],
+            [sorted(ids) for ids in shard_ids(self.tests[::-1], 3, partial)],
+        )
+
+    def test_balanced_by_duration(self):
+        # the slow class takes longer than all the others, so has a shard
+        # to itself
+        shards = shard_ids(self.tests, 3, self.history)
+        slow = [ids for ids in shards if any('Shard1Test' in i for i in ids)]
+        self.assertEqual(
+            set(test_id.rpartition('.')[0] for test_id in slow[0]),
+            set([__name__ + '.Shard1Test']),
+        )
+
+
+
+class ShardOptionTest(TestCase):
+
+    def test_shard(self):
+        self.assertEqual(Options('--shard=2/3').shard, (2, 3))
+
+    def test_bad_shards(self):
+        for shard in ['0/3', '4/3', 'a/b', '3']:
+            with self.assertRaises(SystemExit) as context:
+                Options('--shard=' + shard)
+            self.assertIn('--shard=' + shard, str(context.exception))
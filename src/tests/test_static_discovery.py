@@ -0,0 +1,73 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from ..static_discovery import StaticScanner
+
+
+BASE = '''\
+from django.test import TestCase
+
+class ShopTestCase(TestCase):
+    def test_shop_opens(self):
+        pass
+'''
+
+TESTS = '''\
+from shop.base import ShopTestCase
+
+class OrderTest(ShopTestCase):
+    def test_order(self):
+        pass
+
+class Helper(object):
+    def test_not_a_test(self):
+        pass
+'''
+
+
+class StaticScannerTest(TestCase):
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.project = tempfile.mkdtemp()
+        os.chdir(self.project)
+        os.mkdir('shop')
+        self.write('shop/__init__.py', '')
+        self.write('shop/base.py', BASE)
+        self.write('shop/tests.py', TESTS)
+        self.scanner = StaticScanner('test')
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.project)
+
+    def write(self, fname, text):
+        with open(fname, 'w') as stream:
+            stream.write(text)
+
+    def test_finds_inherited_methods(self):
+        classes, depends = self.scanner.scan('shop/tests.py')
+        self.assertEqual(
+            classes, {'OrderTest': ['test_order', 'test_shop_opens']},
+        )
+        self.assertEqual(sorted(depends), ['shop/base.py', 'shop/tests.py'])
+
+    def test_rescans_changed_module(self):
+        self.scanner.scan('shop/tests.py')
+        self.write('shop/tests.py', TESTS.replace('(object)', '(OrderTest)'))
+        classes, _ = self.scanner.scan('shop/tests.py')
+        self.assertEqual(sorted(classes), ['Helper', 'OrderTest'])
+
+    def test_rescans_when_base_class_changes(self):
+        self.scanner.scan('shop/tests.py')
+        self.write('shop/base.py', BASE + (
+            '    def test_shop_closes(self):\n'
+            '        pass\n'
+        ))
+        classes, _ = self.scanner.scan('shop/tests.py')
+        self.assertEqual(
+            classes['OrderTest'],
+            ['test_order', 'test_shop_closes', 'test_shop_opens'],
+        )
@@ -0,0 +1,48 @@
+import json
+import os
+import shutil
+import sys
+import tempfile
+from unittest import TestCase, TestResult
+
+from ..streaming_report import StreamingReportListener
+
+
+class ShopTest(TestCase):
+
+    # not named 'test...', since it's only run by JsonLinesTest
+    def latin1_failure(self):
+        self.fail('caf\xe9')
+
+
+
+class JsonLinesTest(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'report.jsonl')
+        StreamingReportListener.jsonl = self.path
+
+    def tearDown(self):
+        StreamingReportListener.jsonl = None
+        shutil.rmtree(self.directory)
+
+    def test_message_in_bytes_which_are_not_utf8(self):
+        test = ShopTest('latin1_failure')
+        try:
+            test.latin1_failure()
+        except AssertionError:
+            err = sys.exc_info()
+
+        listener = StreamingReportListener(TestResult())
+        listener.startTest(test)
+        listener.addFailure(test, err)
+        listener.stopTest(test)
+        listener.stopTestRun()
+
+        with open(self.path) as stream:
+            records = [json.loads(line) for line in stream]
+        self.assertEqual(len(records), 1)
+        self.assertEqual(records[0]['outcome'], 'failure')
+        self.assertEqual(records[0]['message'], u'caf\ufffd')
+        self.assertIn(u'caf\ufffd', records[0]['traceback'])
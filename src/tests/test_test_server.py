@@ -0,0 +1,48 @@
+import json
+import socket
+from unittest import TestCase
+
+from ..test_server import END_OF_OUTPUT, TestServerRunner, read_request
+
+
+REQUEST = dict(labels=['shop'], verbosity=1, failfast=False, tty=False)
+
+
+def serve(request):
+    '''
+    Have the test server handle the given request, and return its reply
+    '''
+    server, client = socket.socketpair()
+    try:
+        client.sendall(request)
+        client.shutdown(socket.SHUT_WR)
+        TestServerRunner().handle(server)
+        server.close()
+        received = ''
+        while True:
+            data = client.recv(4096)
+            if not data:
+                return received
+            received += data
+    finally:
+        server.close()
+        client.close()
+
+
+
+class RequestTest(TestCase):
+
+    def test_malformed_requests_are_answered_with_an_error(self):
+        for request in ['', 'not json\n', '[1, 2]\n', '{"labels": []}\n']:
+            output, end, status = serve(request).partition(END_OF_OUTPUT)
+            self.assertIn('bad request', output)
+            self.assertEqual((end, status), (END_OF_OUTPUT, '1\n'))
+
+    def test_well_formed_request_is_read(self):
+        server, client = socket.socketpair()
+        try:
+            client.sendall(json.dumps(REQUEST) + '\n')
+            self.assertEqual(read_request(server), REQUEST)
+        finally:
+            server.close()
+            client.close()
@@ -0,0 +1,24 @@
+import os
+from os.path import dirname, join
+import subprocess
+import sys
+from unittest import TestCase
+
+from .. import testrunner
+
+
+class ImportTest(TestCase):
+
+    def test_import_reads_no_options(self):
+        # a bad option would exit, if it were read
+        package = testrunner.__name__.rpartition('.')[0]
+        top = join(dirname(testrunner.__file__), *['..'] * (
+            package.count('.') + 1
+        ))
+        # the tests package gives Django settings, if there are none
+        code = 'import %s.tests, %s.testrunner' % (package, package)
+        env = dict(os.environ, TEST_RUNNER_OPTIONS='--no-such-option')
+        self.assertEqual(
+            subprocess.call([sys.executable, '-c', code], cwd=top, env=env),
+            0,
+        )
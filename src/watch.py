@@ -0,0 +1,294 @@
+'''
+A test runner which, after running the tests, keeps Django set up and the
+test databases in place, and waits for project modules to change. Whenever
+they do, the changed modules, and the project modules which import them, are
+reloaded, and the tests in any of those modules are run again.
+
+Changes are noticed using inotify on Linux, or otherwise by polling the
+modification times of the project's modules.
+
+See also tests.utils.testrunner, which uses this.
+'''
+
+from ctypes import CDLL, get_errno
+from ctypes.util import find_library
+from inspect import ismodule
+import os
+from os.path import exists, join, relpath, splitext
+import select
+import struct
+import sys
+import time
+import traceback
+from unittest import TestSuite
+
+from django.test.simple import DjangoTestSuiteRunner
+
+from .all_dirs_runner import (
+    _file_stamp, _get_module_names, _is_skipped_dir, _reloaded,
+    _to_importable_name,
+)
+from .releasing_suite import flatten
+
+
+# inotify event flags, from <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+
+WATCH_MASK = (
+    IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+)
+
+# struct inotify_event, less the variable length name which follows it
+INOTIFY_EVENT = struct.Struct('iIII')
+
+
+
+class InotifyWatcher(object):
+    '''
+    Watches every directory in the project using Linux's inotify
+    '''
+
+    # seconds to wait for more changes, since saving a file in an editor,
+    # or switching git branches, changes several files in quick succession
+    settle = 0.2
+
+    def __init__(self, root):
+        self.libc = CDLL(find_library('c'), use_errno=True)
+        self.fd = self.libc.inotify_init()
+        if self.fd < 0:
+            raise OSError(get_errno(), 'inotify_init failed')
+        self.root = root
+        self.dirs = {}
+        self._watch_tree(root)
+
+
+    def _watch_tree(self, top):
+        for subdir, dirs, _ in os.walk(top):
+            dirs[:] = [d for d in dirs if not _is_skipped_dir(d)]
+            wd = self.libc.inotify_add_watch(self.fd, subdir, WATCH_MASK)
+            if wd < 0:
+                raise OSError(get_errno(), 'inotify_add_watch failed')
+            self.dirs[wd] = subdir
+
+
+    def _events(self, data):
+        '''
+        Yield (watched directory, event mask, name) for each event in data
+        '''
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = INOTIFY_EVENT.unpack_from(data, offset)
+            offset += INOTIFY_EVENT.size
+            name = data[offset:offset + length].rstrip('\0')
+            offset += length
+            yield self.dirs.get(wd), mask, name
+
+
+    def wait(self):
+        '''
+        Block until project modules change, and return their filenames
+        '''
+        changed = set()
+        timeout = None
+        while True:
+            ready, _, _ = select.select([self.fd], [], [], timeout)
+            if not ready:
+                return changed
+            for subdir, mask, name in self._events(os.read(self.fd, 65536)):
+                if mask & IN_Q_OVERFLOW:
+                    # events were lost, so assume everything changed
+                    changed.update(_get_module_names(self.root))
+                elif subdir is None:
+                    continue
+                elif mask & IN_ISDIR:
+                    if mask & (IN_CREATE | IN_MOVED_TO):
+                        self._watch_tree(join(subdir, name))
+                elif name.endswith('.py'):
+                    changed.add(relpath(join(subdir, name)))
+            if changed:
+                timeout = self.settle
+
+
+
+class PollingWatcher(object):
+    '''
+    Watches the project's modules by checking their modification times
+    every 'interval' seconds
+    '''
+
+    interval = 1.0
+
+    def __init__(self, root):
+        self.root = root
+        self.stamps = self._scan()
+
+
+    def _scan(self):
+        stamps = {}
+        for fname in _get_module_names(self.root):
+            try:
+                stamps[fname] = _file_stamp(fname)
+            except OSError:
+                pass
+        return stamps
+
+
+    def wait(self):
+        '''
+        Block until project modules change, and return their filenames
+        '''
+        while True:
+            time.sleep(self.interval)
+            stamps = self._scan()
+            changed = set(
+                fname for fname in set(stamps) | set(self.stamps)
+                if stamps.get(fname) != self.stamps.get(fname)
+            )
+            self.stamps = stamps
+            if changed:
+                return changed
+
+
+def make_watcher(root):
+    '''
+    Return an InotifyWatcher, or a PollingWatcher where inotify isn't
+    available.
+    '''
+    try:
+        return InotifyWatcher(root)
+    except (OSError, AttributeError):
+        return PollingWatcher(root)
+
+
+def _project_modules():
+    '''
+    Return a dict of {module name: module} for every imported module whose
+    source is within the project.
+    '''
+    modules = {}
+    for name, module in sys.modules.items():
+        fname = getattr(module, '__file__', None)
+        if fname is not None and not relpath(fname).startswith('..'):
+            modules[name] = module
+    return modules
+
+
+def _refers_to(module, names):
+    '''
+    Returns True if the module has imported any of the named modules, or
+    anything defined in them.
+    '''
+    for value in vars(module).values():
+        try:
+            if ismodule(value):
+                if value.__name__ in names:
+                    return True
+            elif getattr(value, '__module__', None) in names:
+                return True
+        except Exception:
+            pass
+    return False
+
+
+def importers(names):
+    '''
+    Return a list of the names of the project modules which import any of
+    the named modules, directly or indirectly, nearest first.
+    '''
+    modules = _project_modules()
+    found = set(names)
+    ordered = []
+    new = set(names)
+    while new:
+        new = set(
+            name for name, module in modules.items()
+            if name not in found and _refers_to(module, new)
+        )
+        found.update(new)
+        ordered.extend(sorted(new))
+    return ordered
+
+
+def _is_models(modname):
+    return modname.endswith('.models') or '.models.' in modname
+
+
+def reload_changed(fnames):
+    '''
+    Reload the given changed modules, and all the modules which import them.
+    Returns the names of all the modules which might contain tests affected
+    by the changes, or None if reloading one of them failed.
+    '''
+    changed = [_to_importable_name(fname) for fname in sorted(fnames)]
+    affected = changed + importers(changed)
+    for modname in affected:
+        module = sys.modules.get(modname)
+        # skip modules not imported yet, and those which have been deleted
+        if module is None or not exists(splitext(module.__file__)[0] + '.py'):
+            continue
+        if _is_models(modname):
+            # Django's model registry can't cope with models being redefined
+            print 'Not reloading %s. Restart to pick up model changes.' % (
+                modname,
+            )
+            continue
+        try:
+            reloaded = time.time()
+            reload(module)
+            _reloaded[modname] = reloaded
+        except Exception:
+            traceback.print_exc()
+            return None
+    return set(affected)
+
+
+
+class WatchTestRunner(DjangoTestSuiteRunner):
+
+    def run_tests(self, test_labels, extra_tests=None, **kwargs):
+        '''
+        Run the tests, and then run the tests affected by each change to
+        the project's modules, until interrupted by Ctrl-C.
+        '''
+        self.setup_test_environment()
+        suite = self.build_suite(test_labels, extra_tests)
+        old_config = self.setup_databases()
+        try:
+            result = self.run_suite(suite)
+            watcher = make_watcher(os.getcwd())
+            try:
+                while True:
+                    print 'Watching for changes (%s). Ctrl-C to stop.' % (
+                        type(watcher).__name__,
+                    )
+                    affected = reload_changed(watcher.wait())
+                    if affected is None:
+                        continue
+                    suite = self.affected_suite(
+                        self.build_suite(test_labels, extra_tests), affected
+                    )
+                    if suite.countTestCases():
+                        result = self.run_suite(suite)
+            except KeyboardInterrupt:
+                print
+        finally:
+            self.teardown_databases(old_config)
+            self.teardown_test_environment()
+        return self.suite_result(suite, result)
+
+
+    def affected_suite(self, suite, modnames):
+        '''
+        Return a suite of the tests from the given suite which are defined
+        in the named modules
+        '''
+        return TestSuite(
+            test for test in flatten(suite)
+            if test.__class__.__module__ in modnames
+        )
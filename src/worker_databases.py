@@ -0,0 +1,190 @@
+'''
+Gives each parallel worker process its own copy of the test databases, by
+cloning the test databases the parent process has already set up. Each worker
+clones its own copies when it starts, so the clones are all created
+concurrently, and it destroys them again when it is done.
+
+Output produced while cloning goes through the same filter as that produced
+while setting up the original test databases.
+
+See also tests.utils.parallel_runner, which uses this.
+'''
+
+import os
+import shutil
+import subprocess
+import sys
+
+from django.db import connections
+
+from .filtered_runner import FilteredStream
+
+
+def _engine(connection):
+    return connection.settings_dict['ENGINE'].split('.')[-1]
+
+
+def _is_memory(connection):
+    return connection.settings_dict['NAME'] in ['', ':memory:']
+
+
+def _execute_without_database(connection, sql):
+    '''
+    Execute SQL that creates or drops databases, on a connection which isn't
+    using any of the test databases.
+    '''
+    settings = connection.settings_dict
+    name = settings['NAME']
+    settings['NAME'] = 'postgres' if 'postgres' in _engine(connection) else ''
+    try:
+        cursor = connection.cursor()
+        connection.creation.set_autocommit()
+        cursor.execute(sql)
+    finally:
+        connection.close()
+        settings['NAME'] = name
+
+
+def _mysql_args(settings):
+    args = []
+    for option, key in [
+        ('--user=%s', 'USER'), ('--password=%s', 'PASSWORD'),
+        ('--host=%s', 'HOST'), ('--port=%s', 'PORT'),
+    ]:
+        if settings[key]:
+            args.append(option % settings[key])
+    return args
+
+
+def _clone_postgresql(connection, source, target):
+    qn = connection.ops.quote_name
+    _execute_without_database(
+        connection, 'DROP DATABASE IF EXISTS %s' % qn(target)
+    )
+    _execute_without_database(
+        connection,
+        'CREATE DATABASE %s WITH TEMPLATE %s' % (qn(target), qn(source)),
+    )
+
+
+def _clone_mysql(connection, source, target):
+    qn = connection.ops.quote_name
+    _execute_without_database(
+        connection, 'DROP DATABASE IF EXISTS %s' % qn(target)
+    )
+    _execute_without_database(connection, 'CREATE DATABASE %s' % qn(target))
+    args = _mysql_args(connection.settings_dict)
+    dump = subprocess.Popen(
+        ['mysqldump', '--routines', '--triggers'] + args + [source],
+        stdout=subprocess.PIPE,
+    )
+    load = subprocess.Popen(['mysql'] + args + [target], stdin=dump.stdout)
+    dump.stdout.close()
+    if load.wait() != 0 or dump.wait() != 0:
+        raise RuntimeError('failed to clone database %s' % source)
+
+
+def _clone_sqlite3(connection, source, target):
+    shutil.copyfile(source, target)
+
+
+def _destroy_server_database(connection, target):
+    _execute_without_database(
+        connection,
+        'DROP DATABASE %s' % connection.ops.quote_name(target),
+    )
+
+
+def _destroy_sqlite3(connection, target):
+    os.remove(target)
+
+
+CLONERS = {
+    'postgresql': (_clone_postgresql, _destroy_server_database),
+    'postgresql_psycopg2': (_clone_postgresql, _destroy_server_database),
+    'mysql': (_clone_mysql, _destroy_server_database),
+    'sqlite3': (_clone_sqlite3, _destroy_sqlite3),
+}
+
+
+def _clonable():
+    '''
+    Yield the connections which need cloning for each worker. In-memory
+    SQLite databases don't, since each forked worker already has its own
+    private copy.
+    '''
+    names = set()
+    for connection in connections.all():
+        settings = connection.settings_dict
+        if (
+            settings.get('TEST_MIRROR') or
+            _is_memory(connection) or
+            settings['NAME'] in names
+        ):
+            continue
+        names.add(settings['NAME'])
+        yield connection
+
+
+def check_clonable():
+    '''
+    Exit with an error message if any of the test databases can't be cloned
+    '''
+    for connection in _clonable():
+        if _engine(connection) not in CLONERS:
+            sys.exit(
+                "can't run tests in parallel using the %s database backend"
+                % connection.settings_dict['ENGINE']
+            )
+
+
+def close_connections():
+    '''
+    Close the parent's database connections before forking workers, so they
+    aren't shared, and so that nothing is using the test databases while they
+    are being cloned.
+    '''
+    for connection in connections.all():
+        if not _is_memory(connection):
+            connection.close()
+
+
+def clone_databases(number, verbosity):
+    '''
+    Create worker 'number's own copies of the test databases, and point the
+    worker's connections at them. Returns a list of the clones to pass to
+    'destroy_databases' afterwards.
+    '''
+    clones = []
+    orig = sys.stdout
+    sys.stdout = FilteredStream(sys.stdout)
+    try:
+        for connection in _clonable():
+            source = connection.settings_dict['NAME']
+            target = '%s_%d' % (source, number + 1)
+            if verbosity >= 1:
+                print "Cloning test database '%s' for worker %d..." % (
+                    connection.alias, number + 1,
+                )
+            clone, _ = CLONERS[_engine(connection)]
+            clone(connection, source, target)
+            clones.append((connection, source, target))
+    finally:
+        sys.stdout.flush()
+        sys.stdout = orig
+
+    for connection, source, target in clones:
+        for other in connections.all():
+            if other.settings_dict['NAME'] == source:
+                other.settings_dict['NAME'] = target
+    return clones
+
+
+def destroy_databases(clones):
+    '''
+    Destroy the databases created by 'clone_databases'
+    '''
+    for connection, source, target in clones:
+        connection.close()
+        _, destroy = CLONERS[_engine(connection)]
+        destroy(connection, target)